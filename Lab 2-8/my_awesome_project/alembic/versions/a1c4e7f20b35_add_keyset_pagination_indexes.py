@@ -0,0 +1,31 @@
+"""Add composite indexes for keyset pagination
+
+Revision ID: a1c4e7f20b35
+Revises: e5f4c3b7d123
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a1c4e7f20b35"
+down_revision: Union[str, Sequence[str], None] = "e5f4c3b7d123"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the ``(sort_key, id)`` indexes used by cursor pagination."""
+    op.create_index("ix_products_name_id", "products", ["name", "id"])
+    op.create_index("ix_orders_created_at_id", "orders", ["created_at", "id"])
+    op.create_index("ix_users_created_at_id", "users", ["created_at", "id"])
+
+
+def downgrade() -> None:
+    """Drop the cursor pagination indexes."""
+    op.drop_index("ix_users_created_at_id", table_name="users")
+    op.drop_index("ix_orders_created_at_id", table_name="orders")
+    op.drop_index("ix_products_name_id", table_name="products")
@@ -0,0 +1,49 @@
+"""Add indexes for product filters and sort keys
+
+Revision ID: b7e2d9c41f08
+Revises: a1c4e7f20b35
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e2d9c41f08"
+down_revision: Union[str, Sequence[str], None] = "a1c4e7f20b35"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the ``(sort_key, id)`` and filter indexes for product lists."""
+    op.create_index("ix_products_price_id", "products", ["price", "id"])
+    op.create_index("ix_products_created_at_id", "products", ["created_at", "id"])
+    op.create_index("ix_products_updated_at_id", "products", ["updated_at", "id"])
+    op.create_index(
+        "ix_products_in_stock_name_id",
+        "products",
+        ["name", "id"],
+        sqlite_where=sa.text("stock_quantity > 0"),
+        postgresql_where=sa.text("stock_quantity > 0"),
+    )
+    if op.get_bind().dialect.name == "postgresql":
+        op.create_index(
+            "ix_products_name_pattern",
+            "products",
+            ["name"],
+            postgresql_ops={"name": "text_pattern_ops"},
+        )
+
+
+def downgrade() -> None:
+    """Drop the product filter indexes."""
+    if op.get_bind().dialect.name == "postgresql":
+        op.drop_index("ix_products_name_pattern", table_name="products")
+    op.drop_index("ix_products_in_stock_name_id", table_name="products")
+    op.drop_index("ix_products_updated_at_id", table_name="products")
+    op.drop_index("ix_products_created_at_id", table_name="products")
+    op.drop_index("ix_products_price_id", table_name="products")
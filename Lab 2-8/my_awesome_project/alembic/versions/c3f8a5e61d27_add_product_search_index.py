@@ -0,0 +1,67 @@
+"""Add full-text search index for products
+
+Revision ID: c3f8a5e61d27
+Revises: b7e2d9c41f08
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+from uuid import UUID
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c3f8a5e61d27"
+down_revision: Union[str, Sequence[str], None] = "b7e2d9c41f08"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# must match app.models.product.SEARCH_DOCUMENT
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    """Create the GIN index (PostgreSQL) or the FTS5 table (SQLite)."""
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.create_index(
+            "ix_products_search",
+            "products",
+            [sa.text(f"({SEARCH_DOCUMENT})")],
+            postgresql_using="gin",
+        )
+    elif bind.dialect.name == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts "
+            "USING fts5(product_id UNINDEXED, name, description)"
+        )
+        rows = bind.execute(sa.text("SELECT id, name, description FROM products"))
+        for product_id, name, description in rows.all():
+            # rowid as in ProductRepository._fts_rowid
+            rowid = UUID(product_id).int & (2**63 - 1)
+            bind.execute(
+                sa.text(
+                    "INSERT INTO products_fts (rowid, product_id, name, description) "
+                    "VALUES (:rowid, :product_id, :name, :description)"
+                ),
+                {
+                    "rowid": rowid,
+                    "product_id": product_id,
+                    "name": name,
+                    "description": description,
+                },
+            )
+
+
+def downgrade() -> None:
+    """Drop the product search index."""
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.drop_index("ix_products_search", table_name="products")
+    elif bind.dialect.name == "sqlite":
+        op.execute("DROP TABLE IF EXISTS products_fts")
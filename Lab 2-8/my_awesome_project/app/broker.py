@@ -0,0 +1,78 @@
+"""Publishing to the RabbitMQ queues consumed by ``scripts/check_rabbit.py``.
+
+``get_order_publisher`` returns a publisher for the ``order`` queue when
+``RABBITMQ_URL`` is set, or ``None`` so callers do the work in-process.
+The broker connection is opened on first publish and reused for the
+process lifetime; ``close_publishers`` closes it on shutdown.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Optional, Protocol
+
+from pydantic import BaseModel
+
+# FastStream is only needed when the API hands work to the queue; without it
+# (or without RABBITMQ_URL) orders are created synchronously.
+try:
+    from faststream.rabbit import RabbitBroker
+except Exception:  # pragma: no cover - runtime environment may not have faststream
+    RabbitBroker = None  # type: ignore
+
+ORDER_QUEUE = "order"
+
+
+class Publisher(Protocol):
+    async def publish(self, message: BaseModel) -> None: ...
+
+
+class RabbitPublisher:
+    """Publishes JSON messages to one queue over a shared connection."""
+
+    def __init__(self, url: str, queue: str):
+        self.broker = RabbitBroker(url)
+        self.queue = queue
+        self._connected = False
+        self._lock = asyncio.Lock()
+
+    async def publish(self, message: BaseModel) -> None:
+        if not self._connected:
+            async with self._lock:
+                if not self._connected:
+                    await self.broker.connect()
+                    self._connected = True
+        await self.broker.publish(message.model_dump(mode="json"), queue=self.queue)
+
+    async def close(self) -> None:
+        if self._connected:
+            await self.broker.close()
+            self._connected = False
+
+
+_order_publisher: Optional[Publisher] = None
+
+
+def get_order_publisher() -> Optional[Publisher]:
+    """Return the ``order`` queue publisher, or ``None`` if not configured."""
+
+    global _order_publisher
+    url = os.getenv("RABBITMQ_URL")
+    if _order_publisher is None and url and RabbitBroker is not None:
+        _order_publisher = RabbitPublisher(url, ORDER_QUEUE)
+    return _order_publisher
+
+
+def configure_order_publisher(publisher: Optional[Publisher]) -> None:
+    """Replace the ``order`` queue publisher (``None`` resets it)."""
+
+    global _order_publisher
+    _order_publisher = publisher
+
+
+async def close_publishers() -> None:
+    """Close the broker connection, if one was opened."""
+
+    if isinstance(_order_publisher, RabbitPublisher):
+        await _order_publisher.close()
@@ -1,74 +1,1525 @@
-"""Async Redis cache helpers.
+"""Async cache helpers.
 
-Provides a small wrapper around `redis.asyncio.Redis` to set/get/delete
-JSON-serialised values. The Redis connection is created lazily and
-reused for the process lifetime.
+Provides small helpers to set/get/delete serialised values in a pluggable
+backend chosen with ``CACHE_BACKEND``: ``redis`` (the default) or
+``memory`` for tests and single-process deployments. The backend is
+created lazily and reused for the process lifetime.
+``get_many``/``set_many``/``delete_many`` batch several keys into a single
+round trip (``MGET`` and pipelines).
+
+The Redis backend uses a bounded connection pool with short timeouts
+(``CACHE_REDIS_MAX_CONNECTIONS``, ``CACHE_REDIS_SOCKET_TIMEOUT``,
+``CACHE_REDIS_CONNECT_TIMEOUT``, ``CACHE_REDIS_POOL_TIMEOUT``) and a
+circuit breaker: after ``CACHE_BREAKER_THRESHOLD`` consecutive failures the
+cache is skipped for ``CACHE_BREAKER_RESET`` seconds, so reads cost plain
+database latency instead of database latency plus a timeout.
+
+An optional in-process L1 cache (bounded LRU with a TTL) can sit in front
+of Redis so hot keys are served without a network round trip. It is
+enabled with ``CACHE_L1_MAXSIZE`` (number of entries, ``0`` disables it)
+and ``CACHE_L1_TTL`` (seconds). Writes and deletes publish the key on a
+Redis pub/sub channel (``CACHE_INVALIDATION_CHANNEL``, empty to disable)
+so other processes drop their local copy.
+
+Values go through a pluggable codec (``CACHE_CODEC``): ``msgpack`` (the
+default) writes a compact binary form with native Decimal/UUID/datetime
+handling, ``json`` keeps the plain ``json.dumps(default=str)`` format.
+Passing ``model=`` to the read helpers returns entries as that pydantic
+response model, so callers do not validate the payload again.
+
+``get_or_load`` reads a key and, on a miss, coalesces concurrent loads of
+that key into one call (single-flight). With ``CACHE_LOCK_TIMEOUT`` set it
+also takes a short Redis lock so only one process queries the database.
+
+Entries can carry a soft TTL next to the Redis (hard) TTL: ``get_or_load``
+then serves stale values immediately and refreshes them in the background.
+
+List pages and counts are cached under a per-entity namespace version
+(``namespaced_key``); ``bump_namespace`` invalidates all of them in O(1).
+
+Every operation is recorded per key prefix (``product``, ``user``, ...):
+hits, misses, errors, payload sizes and latency histograms, available from
+``metrics_snapshot()``. ``cache_ttl`` reads TTL overrides from
+``CACHE_TTL_<NAME>`` so they can be tuned from those numbers.
+
+``invalidate_on_commit`` ties invalidation to a database transaction: keys
+and namespaces queued on a session are dropped in one batch after it
+commits and forgotten if it rolls back.
 """
 
 from __future__ import annotations
 
 import asyncio
+import bisect
 import json
 import os
-from typing import Any, Optional
+import struct as pystruct
+import time
+import types
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Protocol,
+    TypeVar,
+    Union,
+    get_args,
+    get_origin,
+)
+from urllib.parse import urlencode
 import logging
 
+import msgspec
+from pydantic import BaseModel
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
 # `redis.asyncio` may be unavailable in some environments (ModuleNotFoundError).
 # Import lazily and provide a clear runtime error if it's missing so callers
 # know how to fix their environment (install `redis>=4.6.0`).
 try:
     import redis.asyncio as aioredis  # type: ignore
+    from redis.asyncio.retry import Retry
+    from redis.backoff import NoBackoff
 except Exception:  # pragma: no cover - runtime environment may not have redis
     aioredis = None  # type: ignore
 
-_redis: Optional["aioredis.Redis"] = None
-_lock = asyncio.Lock()
 _log = logging.getLogger(__name__)
 
+# Channel used to broadcast invalidations to the L1 caches of other
+# processes. An empty value disables publishing and listening.
+INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+# Identifies this process so it can ignore its own invalidation messages.
+_INSTANCE_ID = uuid.uuid4().hex
+
+# Seconds a cross-process load lock is held; 0 keeps coalescing in-process.
+LOCK_TIMEOUT = float(os.getenv("CACHE_LOCK_TIMEOUT", "0"))
+_LOCK_POLL_INTERVAL = 0.05
+
+_MISSING = object()
+# Decoded form of a negative entry ("known not to exist").
+_NOT_FOUND = object()
+T = TypeVar("T")
+M = TypeVar("M", bound=BaseModel)
+
+
+class LocalCache:
+    """Bounded in-process cache with LRU eviction and per-entry TTL.
+
+    Values are stored already decoded, so callers must treat what they get
+    back as read-only. Counters are plain integers and are read through
+    :meth:`stats` to size the cache per worker.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the value for ``key`` or ``default`` when absent/expired."""
+
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store ``value`` evicting the least recently used entries if full."""
+
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        """Drop ``key`` if present."""
+
+        if self._data.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return a snapshot of the counters and current occupancy."""
+
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+def _local_cache_from_env() -> Optional[LocalCache]:
+    maxsize = int(os.getenv("CACHE_L1_MAXSIZE", "0"))
+    if maxsize <= 0:
+        return None
+    return LocalCache(maxsize=maxsize, ttl=float(os.getenv("CACHE_L1_TTL", "5")))
+
+
+_local: Optional[LocalCache] = _local_cache_from_env()
+_listener_task: Optional[asyncio.Task] = None
+
+
+def configure_local_cache(maxsize: int, ttl: float = 5.0) -> Optional[LocalCache]:
+    """Replace the process L1 cache; ``maxsize <= 0`` disables it."""
+
+    global _local
+    _local = LocalCache(maxsize=maxsize, ttl=ttl) if maxsize > 0 else None
+    return _local
+
+
+def local_cache_stats() -> Optional[dict[str, Any]]:
+    """Return L1 counters or ``None`` when the L1 cache is disabled."""
+
+    return _local.stats() if _local is not None else None
+
+
+class CacheUnavailableError(RuntimeError):
+    """Raised instead of calling the cache backend while its circuit is open."""
+
+
+class CircuitBreaker:
+    """Stop calling a failing backend for ``reset_timeout`` seconds.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail immediately with :class:`CacheUnavailableError`. Once the
+    cool-down has passed a single trial call is let through: success closes
+    the circuit again, failure re-opens it for another cool-down.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                _log.warning(
+                    "Cache circuit opened after %d failures, skipping the cache "
+                    "for %.0fs",
+                    self.failures,
+                    self.reset_timeout,
+                )
+            self.opened_at = time.monotonic()
+        self._trial = False
+
+    async def __aenter__(self) -> "CircuitBreaker":
+        if not self.allow():
+            raise CacheUnavailableError("cache circuit is open")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            self.record_success()
+        elif issubclass(exc_type, asyncio.CancelledError):
+            # an interrupted trial says nothing about the backend's health
+            self._trial = False
+        else:
+            self.record_failure()
+        return False
+
+
+# (encoded value, TTL in seconds or ``None`` for no expiry)
+Entry = tuple[Union[str, bytes], Optional[int]]
+
+
+class CacheBackend(Protocol):
+    """Storage behind the cache helpers; values are already encoded.
+
+    Batched methods are expected to cost one round trip. ``local`` backends
+    keep entries in this process, so there are no other L1 caches to notify.
+    """
+
+    local: bool
+
+    async def get(self, key: str) -> Optional[bytes]: ...
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]: ...
+
+    async def set_many(self, items: Mapping[str, Entry]) -> None: ...
+
+    async def delete_many(self, keys: list[str]) -> None: ...
+
+    async def incr_many(self, keys: list[str]) -> None: ...
+
+    async def acquire_lock(self, key: str, token: str, ttl: float) -> bool: ...
+
+    async def release_lock(self, key: str, token: str) -> None: ...
+
+    def invalidations(self) -> AsyncIterator[list[str]]: ...
+
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisBackend:
+    """Redis backend with a bounded connection pool and a circuit breaker.
+
+    Commands do not retry and time out quickly: a cache that does not answer
+    within ``socket_timeout`` is treated as a miss by the callers.
+    """
+
+    local = False
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        *,
+        host: str = "localhost",
+        port: int = 6379,
+        max_connections: int = 50,
+        socket_timeout: Optional[float] = 0.5,
+        connect_timeout: Optional[float] = 0.5,
+        pool_timeout: Optional[float] = 0.5,
+        retries: int = 0,
+        channel: str = INVALIDATION_CHANNEL,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        if aioredis is None:
+            # Fail fast with an actionable message when `redis` package is missing.
+            raise RuntimeError(
+                "Missing dependency: package 'redis' is not installed.\n"
+                "Install it with: pip install 'redis>=4.6.0' or rebuild your "
+                "Docker image."
+            )
+        self._url, self._host, self._port = url, host, port
+        self._options = {
+            "socket_connect_timeout": connect_timeout,
+            "retry": Retry(NoBackoff(), retries),
+        }
+        pool_options = {
+            "max_connections": max_connections,
+            "timeout": pool_timeout,
+            "socket_timeout": socket_timeout,
+            **self._options,
+        }
+        if url:
+            pool = aioredis.BlockingConnectionPool.from_url(url, **pool_options)
+        else:
+            pool = aioredis.BlockingConnectionPool(host=host, port=port, **pool_options)
+        self.client = aioredis.Redis(connection_pool=pool)
+        self.channel = channel
+        self.breaker = breaker or CircuitBreaker()
+        self._subscriber: Optional["aioredis.Redis"] = None
+
+    @classmethod
+    def from_env(cls) -> "RedisBackend":
+        return cls(
+            os.getenv("REDIS_URL") or None,
+            host=os.getenv("REDIS_HOST", "localhost"),
+            port=int(os.getenv("REDIS_PORT", "6379")),
+            max_connections=int(os.getenv("CACHE_REDIS_MAX_CONNECTIONS", "50")),
+            socket_timeout=float(os.getenv("CACHE_REDIS_SOCKET_TIMEOUT", "0.5")),
+            connect_timeout=float(os.getenv("CACHE_REDIS_CONNECT_TIMEOUT", "0.5")),
+            pool_timeout=float(os.getenv("CACHE_REDIS_POOL_TIMEOUT", "0.5")),
+            retries=int(os.getenv("CACHE_REDIS_RETRIES", "0")),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("CACHE_BREAKER_THRESHOLD", "5")),
+                reset_timeout=float(os.getenv("CACHE_BREAKER_RESET", "30")),
+            ),
+        )
+
+    async def get(self, key: str) -> Optional[bytes]:
+        async with self.breaker:
+            return await self.client.get(key)
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        async with self.breaker:
+            return await self.client.mget(keys)
+
+    async def set_many(self, items: Mapping[str, Entry]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for key, (value, ex) in items.items():
+            pipe.set(key, value, ex=ex)
+        self._announce(pipe, items)
+        async with self.breaker:
+            await pipe.execute()
+
+    async def delete_many(self, keys: list[str]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.delete(*keys)
+        self._announce(pipe, keys)
+        async with self.breaker:
+            await pipe.execute()
+
+    async def incr_many(self, keys: list[str]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.incr(key)
+        self._announce(pipe, keys)
+        async with self.breaker:
+            await pipe.execute()
+
+    async def acquire_lock(self, key: str, token: str, ttl: float) -> bool:
+        async with self.breaker:
+            return bool(await self.client.set(key, token, nx=True, px=int(ttl * 1000)))
+
+    async def release_lock(self, key: str, token: str) -> None:
+        async with self.breaker:
+            await self.client.eval(_RELEASE_LOCK_SCRIPT, 1, key, token)
+
+    def _announce(self, pipe: Any, keys: Iterable[str]) -> None:
+        """Add a single pub/sub message announcing ``keys`` to ``pipe``.
+
+        Published even without a local L1 cache: the message is for the
+        other processes (e.g. API workers behind a queue worker). Set
+        ``CACHE_INVALIDATION_CHANNEL`` to an empty value to turn it off.
+        """
+
+        if self.channel:
+            pipe.publish(self.channel, f"{_INSTANCE_ID}|" + "\n".join(keys))
+
+    async def invalidations(self) -> AsyncIterator[list[str]]:
+        """Yield keys written or deleted by other processes."""
+
+        if self._subscriber is None:
+            # a subscriber idles between messages, so no read timeout here
+            options = {**self._options, "socket_timeout": None}
+            if self._url:
+                self._subscriber = aioredis.from_url(self._url, **options)
+            else:
+                self._subscriber = aioredis.Redis(
+                    host=self._host, port=self._port, **options
+                )
+        pubsub = self._subscriber.pubsub()
+        await pubsub.subscribe(self.channel)
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                data = message["data"]
+                if isinstance(data, bytes):
+                    data = data.decode()
+                origin, _, keys = data.partition("|")
+                if origin != _INSTANCE_ID:
+                    yield keys.split("\n")
+        finally:
+            await pubsub.reset()
+
+
+class MemoryBackend:
+    """Process-local backend for tests and single-process deployments.
+
+    Holds at most ``maxsize`` entries; expired entries are dropped first,
+    then the oldest ones.
+    """
+
+    local = True
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._data: dict[str, tuple[Optional[float], Union[str, bytes]]] = {}
+
+    def _get(self, key: str) -> Optional[Union[str, bytes]]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def _put(self, key: str, value: Union[str, bytes], ex: Optional[float]) -> None:
+        self._data.pop(key, None)
+        self._data[key] = (time.monotonic() + ex if ex else None, value)
+        if len(self._data) > self.maxsize:
+            now = time.monotonic()
+            for stale in [
+                k
+                for k, (exp, _) in self._data.items()
+                if exp is not None and exp <= now
+            ]:
+                del self._data[stale]
+            while len(self._data) > self.maxsize:
+                del self._data[next(iter(self._data))]
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._get(key)
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        return [self._get(key) for key in keys]
+
+    async def set_many(self, items: Mapping[str, Entry]) -> None:
+        for key, (value, ex) in items.items():
+            self._put(key, value, ex)
+
+    async def delete_many(self, keys: list[str]) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def incr_many(self, keys: list[str]) -> None:
+        for key in keys:
+            current = self._get(key)
+            expires_at = self._data[key][0] if current is not None else None
+            self._data[key] = (expires_at, str(int(current or 0) + 1).encode())
+
+    async def acquire_lock(self, key: str, token: str, ttl: float) -> bool:
+        if self._get(key) is not None:
+            return False
+        self._put(key, token, ttl)
+        return True
+
+    async def release_lock(self, key: str, token: str) -> None:
+        if self._get(key) == token:
+            del self._data[key]
+
+    async def invalidations(self) -> AsyncIterator[list[str]]:
+        return
+        yield
+
+
+def _backend_from_env() -> CacheBackend:
+    name = os.getenv("CACHE_BACKEND", "redis").lower()
+    if name == "memory":
+        return MemoryBackend(maxsize=int(os.getenv("CACHE_MEMORY_MAXSIZE", "10000")))
+    if name == "redis":
+        return RedisBackend.from_env()
+    raise ValueError(f"Unknown cache backend: {name!r}")
+
+
+_backend: Optional[CacheBackend] = None
+
+
+def get_backend() -> CacheBackend:
+    """Return the process cache backend, creating it on first use."""
+
+    global _backend
+    if _backend is None:
+        _backend = _backend_from_env()
+    return _backend
+
+
+def configure_backend(backend: Union[str, CacheBackend]) -> CacheBackend:
+    """Replace the process cache backend (``"redis"``, ``"memory"`` or an object)."""
+
+    global _backend
+    if isinstance(backend, str):
+        backend = {"redis": RedisBackend.from_env, "memory": MemoryBackend}[backend]()
+    _backend = backend
+    if _local is not None:
+        _local.clear()
+    return _backend
+
 
 async def get_redis() -> "aioredis.Redis":
-    global _redis
-    if aioredis is None:
-        # Fail fast with an actionable message when `redis` package is missing.
-        raise RuntimeError(
-            "Missing dependency: package 'redis' is not installed.\n"
-            "Install it with: pip install 'redis>=4.6.0' or rebuild your Docker image."
+    """Return the Redis client of the configured backend."""
+
+    backend = get_backend()
+    if not isinstance(backend, RedisBackend):
+        raise RuntimeError("The configured cache backend is not Redis")
+    return backend.client
+
+
+async def _listen_for_invalidations(backend: CacheBackend) -> None:
+    """Evict keys announced by other processes from the local cache."""
+
+    while True:
+        try:
+            async for keys in backend.invalidations():
+                if _local is not None:
+                    for key in keys:
+                        _local.invalidate(key)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            _log.warning("Cache invalidation listener failed, retrying", exc_info=True)
+            # Messages may have been missed while disconnected.
+            if _local is not None:
+                _local.clear()
+            await asyncio.sleep(1.0)
+
+
+def _ensure_invalidation_listener() -> None:
+    global _listener_task
+    backend = get_backend()
+    if not INVALIDATION_CHANNEL or backend.local:
+        return
+    loop = asyncio.get_running_loop()
+    if (
+        _listener_task is None
+        or _listener_task.done()
+        or _listener_task.get_loop() is not loop
+    ):
+        _listener_task = loop.create_task(_listen_for_invalidations(backend))
+
+
+def cache_ttl(name: str, default: int) -> int:
+    """Return the TTL for ``name``, overridable with ``CACHE_TTL_<NAME>``."""
+
+    return int(os.getenv(f"CACHE_TTL_{name.upper()}", default))
+
+
+# Upper bounds of the histogram buckets (seconds and bytes).
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    """Fixed-bucket histogram; a value falls into the first bound >= it."""
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def snapshot(self) -> dict[str, Any]:
+        buckets = {str(bound): n for bound, n in zip(self.bounds, self.counts)}
+        buckets["+Inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "buckets": buckets,
+        }
+
+
+class PrefixMetrics:
+    """Counters for the keys sharing one prefix.
+
+    ``hits`` includes L1 hits and negative ("not found") hits, which are
+    also counted separately. ``bypassed`` counts calls skipped by an open
+    circuit breaker.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.l1_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+        self.bypassed = 0
+        self.read_bytes = Histogram(SIZE_BUCKETS)
+        self.write_bytes = Histogram(SIZE_BUCKETS)
+        self.latency: dict[str, Histogram] = {}
+
+    def snapshot(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "l1_hits": self.l1_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "errors": self.errors,
+            "bypassed": self.bypassed,
+            "payload_bytes": {
+                "read": self.read_bytes.snapshot(),
+                "write": self.write_bytes.snapshot(),
+            },
+            "latency_seconds": {op: h.snapshot() for op, h in self.latency.items()},
+        }
+
+
+def _key_prefix(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+class CacheMetrics:
+    """Per-prefix cache metrics for this process."""
+
+    def __init__(self) -> None:
+        self.prefixes: dict[str, PrefixMetrics] = {}
+
+    def _for(self, key: str) -> PrefixMetrics:
+        prefix = _key_prefix(key)
+        metrics = self.prefixes.get(prefix)
+        if metrics is None:
+            metrics = self.prefixes[prefix] = PrefixMetrics()
+        return metrics
+
+    def hit(
+        self,
+        key: str,
+        size: Optional[int] = None,
+        l1: bool = False,
+        negative: bool = False,
+    ) -> None:
+        metrics = self._for(key)
+        metrics.hits += 1
+        metrics.l1_hits += l1
+        metrics.negative_hits += negative
+        if size is not None:
+            metrics.read_bytes.observe(size)
+
+    def miss(self, key: str) -> None:
+        self._for(key).misses += 1
+
+    def write(self, key: str, size: int) -> None:
+        metrics = self._for(key)
+        metrics.writes += 1
+        metrics.write_bytes.observe(size)
+
+    @contextmanager
+    def timed(self, op: str, keys: Iterable[str]) -> Iterator[None]:
+        """Time a backend call made for ``keys``, once per distinct prefix."""
+
+        start = time.perf_counter()
+        try:
+            yield
+        except CacheUnavailableError:
+            for key in _prefix_keys(keys):
+                self._for(key).bypassed += 1
+            raise
+        except Exception:
+            for key in _prefix_keys(keys):
+                self._for(key).errors += 1
+            raise
+        elapsed = time.perf_counter() - start
+        for key in _prefix_keys(keys):
+            latency = self._for(key).latency
+            if op not in latency:
+                latency[op] = Histogram(LATENCY_BUCKETS)
+            latency[op].observe(elapsed)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {prefix: m.snapshot() for prefix, m in sorted(self.prefixes.items())}
+
+    def reset(self) -> None:
+        self.prefixes.clear()
+
+
+def _prefix_keys(keys: Iterable[str]) -> list[str]:
+    """One representative key per prefix."""
+
+    return list({_key_prefix(key): key for key in keys}.values())
+
+
+_metrics = CacheMetrics()
+
+
+def metrics_snapshot() -> dict[str, Any]:
+    """Return cache metrics per key prefix plus L1 and circuit state."""
+
+    breaker = getattr(_backend, "breaker", None)
+    return {
+        "backend": type(_backend).__name__ if _backend is not None else None,
+        "circuit": breaker.state if breaker is not None else None,
+        "l1": local_cache_stats(),
+        "prefixes": _metrics.snapshot(),
+    }
+
+
+def reset_metrics() -> None:
+    _metrics.reset()
+
+
+class Codec(Protocol):
+    """Serialises cache values to the bytes stored in Redis and back."""
+
+    def encode(self, value: Any) -> Union[str, bytes]: ...
+
+    def decode(
+        self, raw: Union[str, bytes], model: Optional[type[M]] = None
+    ) -> Any: ...
+
+
+def _rehydrate(model: type[M], value: Any) -> Any:
+    """Turn a decoded value (or list of them) into ``model`` instances."""
+
+    if model is None or isinstance(value, model):
+        return value
+    if isinstance(value, list):
+        return [_rehydrate(model, item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return model.model_validate(value)
+
+
+def _is_model_value(value: Any) -> bool:
+    if isinstance(value, BaseModel):
+        return True
+    return isinstance(value, list) and all(isinstance(v, BaseModel) for v in value)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+class JsonCodec:
+    """Plain JSON, compatible with the historical ``json.dumps(default=str)``."""
+
+    name = "json"
+
+    def encode(self, value: Any) -> Union[str, bytes]:
+        # always JSON-serialise complex objects
+        if isinstance(value, (str, bytes)):
+            return value
+        if isinstance(value, BaseModel):
+            return value.model_dump_json()
+        return json.dumps(value, default=_json_default)
+
+    def decode(self, raw: Union[str, bytes], model: Optional[type[M]] = None) -> Any:
+        if model is not None:
+            try:
+                return model.model_validate_json(raw)
+            except Exception:
+                pass
+        try:
+            return _rehydrate(model, json.loads(raw))
+        except Exception:
+            return raw.decode() if isinstance(raw, bytes) else raw
+
+
+class MsgpackCodec:
+    """Compact msgpack encoding built on :mod:`msgspec`.
+
+    Payloads are prefixed with a marker byte so entries written by
+    :class:`JsonCodec` (which always start with a printable character) are
+    still readable during a rollout. For a response model the decoder is
+    derived from the model's fields, so msgspec converts UUID, Decimal and
+    datetime values in C and pydantic receives native values instead of
+    parsing strings.
+    """
+
+    name = "msgpack"
+    MARKER = b"\x01"
+    # first byte of a msgpack array (fixarray, array 16, array 32)
+    _ARRAY_HEADERS = frozenset([*range(0x90, 0xA0), 0xDC, 0xDD])
+
+    def __init__(self) -> None:
+        self._encoder = msgspec.msgpack.Encoder(
+            enc_hook=self._enc_hook, uuid_format="bytes"
         )
+        self._decoder = msgspec.msgpack.Decoder()
+        self._typed: dict[type, Optional[tuple[Any, Any]]] = {}
+        self._json = JsonCodec()
+
+    @staticmethod
+    def _enc_hook(value: Any) -> Any:
+        if isinstance(value, BaseModel):
+            return value.model_dump()
+        raise NotImplementedError(f"Cannot cache objects of type {type(value)!r}")
+
+    def encode(self, value: Any) -> Union[str, bytes]:
+        if isinstance(value, (str, bytes)):
+            return value
+        return self.MARKER + self._encoder.encode(value)
+
+    def decode(self, raw: Union[str, bytes], model: Optional[type[M]] = None) -> Any:
+        if isinstance(raw, str) or raw[:1] != self.MARKER:
+            return self._json.decode(raw, model)
+        body = memoryview(raw)[1:]
+        decoders = self._typed_decoders(model) if model is not None else None
+        if decoders is None:
+            return _rehydrate(model, self._decoder.decode(body))
+        is_list = raw[1] in self._ARRAY_HEADERS
+        try:
+            decoded = decoders[is_list].decode(body)
+        except msgspec.ValidationError:
+            # the cached shape no longer matches the model; validate instead
+            return _rehydrate(model, self._decoder.decode(body))
+        # values are already native types, so this is a cheap type check
+        # (measured faster than ``model_construct``) rather than parsing
+        if is_list:
+            return [model.model_validate(msgspec.structs.asdict(s)) for s in decoded]
+        return model.model_validate(msgspec.structs.asdict(decoded))
+
+    def _typed_decoders(self, model: type[M]) -> Optional[tuple[Any, Any]]:
+        if model not in self._typed:
+            struct = _struct_for(model)
+            self._typed[model] = (
+                None
+                if struct is None
+                else (
+                    msgspec.msgpack.Decoder(type=struct),
+                    msgspec.msgpack.Decoder(type=list[struct]),
+                )
+            )
+        return self._typed[model]
+
+
+# Field types msgspec can decode natively; nested models fall back to
+# pydantic validation.
+_SCALAR_TYPES = (str, int, float, bool, bytes, Decimal, uuid.UUID, datetime, date)
+
+
+def _is_plain_type(annotation: Any) -> bool:
+    if annotation in _SCALAR_TYPES or annotation is type(None):
+        return True
+    origin = get_origin(annotation)
+    if origin in (Union, types.UnionType, list, tuple, dict):
+        return all(
+            _is_plain_type(arg) for arg in get_args(annotation) if arg is not ...
+        )
+    return False
+
+
+def _struct_for(model: type[M]) -> Optional[type[msgspec.Struct]]:
+    """Build a msgspec struct mirroring the flat fields of ``model``."""
+
+    fields = []
+    for name, info in model.model_fields.items():
+        if not _is_plain_type(info.annotation):
+            return None
+        if info.is_required():
+            fields.append((name, info.annotation))
+        else:
+            fields.append(
+                (name, info.annotation, info.get_default(call_default_factory=True))
+            )
+    # msgspec requires required fields before optional ones
+    fields.sort(key=len)
+    return msgspec.defstruct(f"{model.__name__}CacheStruct", fields)
+
+
+_CODECS: dict[str, Codec] = {"json": JsonCodec(), "msgpack": MsgpackCodec()}
+_codec: Codec = _CODECS[os.getenv("CACHE_CODEC", "msgpack")]
+
+
+def configure_codec(codec: Union[str, Codec]) -> Codec:
+    """Select the codec used for values written from now on."""
+
+    global _codec
+    _codec = _CODECS[codec] if isinstance(codec, str) else codec
+    return _codec
+
+
+def _encode(value: Any) -> Union[str, bytes]:
+    return _codec.encode(value)
+
+
+def _decode(raw: Any, model: Optional[type[M]] = None) -> Any:
+    return _codec.decode(raw, model)
+
+
+# Entries written with a soft TTL carry a header: this marker followed by
+# the wall-clock time (big-endian double) after which they count as stale.
+_STALE_MARKER = b"\x02"
+_STALE_HEADER = pystruct.Struct(">d")
+
+
+def _with_stale_header(
+    encoded: Union[str, bytes], stale_after: Optional[float]
+) -> Union[str, bytes]:
+    if stale_after is None:
+        return encoded
+    if isinstance(encoded, str):
+        encoded = encoded.encode()
+    return _STALE_MARKER + _STALE_HEADER.pack(time.time() + stale_after) + encoded
+
+
+# Stored for ids known not to exist. No codec output is a single 0x03 byte:
+# msgpack entries start with 0x01 and JSON ones with printable characters.
+_NEGATIVE_ENTRY = b"\x03"
 
-    if _redis is None:
-        async with _lock:
-            if _redis is None:
-                host = os.getenv("REDIS_HOST", "localhost")
-                port = int(os.getenv("REDIS_PORT", "6379"))
-                url = os.getenv("REDIS_URL")
-                if url:
-                    _redis = aioredis.from_url(url)
-                else:
-                    _redis = aioredis.Redis(host=host, port=port, decode_responses=True)
-    return _redis
-
-
-async def get_cached(key: str) -> Optional[Any]:
-    r = await get_redis()
-    raw = await r.get(key)
+
+def _decode_entry(raw: Any, model: Optional[type[M]]) -> tuple[Any, Optional[float]]:
+    """Decode a stored entry, returning ``(value, stale_at)``.
+
+    Negative entries decode to ``_NOT_FOUND``.
+    """
+
+    if raw == _NEGATIVE_ENTRY:
+        return _NOT_FOUND, None
+    if isinstance(raw, bytes) and raw[:1] == _STALE_MARKER:
+        (stale_at,) = _STALE_HEADER.unpack_from(raw, 1)
+        return _decode(raw[1 + _STALE_HEADER.size :], model), stale_at
+    return _decode(raw, model), None
+
+
+def _fresh_ttl(ex: Optional[float], stale_after: Optional[float]) -> Optional[float]:
+    """L1 lifetime for an entry: never beyond the point it turns stale."""
+
+    if stale_after is None:
+        return ex
+    return stale_after if ex is None else min(ex, stale_after)
+
+
+def _local_value(key: str, model: Optional[type[M]]) -> Any:
+    value = _local.get(key, _MISSING)
+    if value is _MISSING:
+        return value
+    return _rehydrate(model, value)
+
+
+def _remember(key: str, value: Any, ttl: Optional[float] = None) -> None:
+    """Keep ``value`` in L1, storing models as-is and the rest decoded."""
+
+    if _local is None or (ttl is not None and ttl <= 0):
+        return
+    if not _is_model_value(value):
+        value = _decode(_encode(value))
+    _local.set(key, value, ttl=ttl)
+
+
+async def _read(key: str, model: Optional[type[M]]) -> tuple[Any, Optional[float]]:
+    """Return ``(value, stale_at)``.
+
+    ``value`` is ``_MISSING`` when absent and ``_NOT_FOUND`` for a negative
+    entry.
+    """
+
+    if _local is not None:
+        _ensure_invalidation_listener()
+        value = _local_value(key, model)
+        if value is not _MISSING:
+            _metrics.hit(key, l1=True, negative=value is _NOT_FOUND)
+            return value, None
+
+    with _metrics.timed("get", [key]):
+        raw = await get_backend().get(key)
     if raw is None:
+        _metrics.miss(key)
+        return _MISSING, None
+    value, stale_at = _decode_entry(raw, model)
+    _metrics.hit(key, len(raw), negative=value is _NOT_FOUND)
+    if _local is not None:
+        ttl = None if stale_at is None else stale_at - time.time()
+        if ttl is None or ttl > 0:
+            _local.set(key, value, ttl=ttl)
+    return value, stale_at
+
+
+async def get_cached(key: str, model: Optional[type[M]] = None) -> Optional[Any]:
+    """Return the value cached under ``key`` or ``None``.
+
+    With ``model`` the entry is returned as an instance of that response
+    model rather than a plain dict. Stale entries are returned as well.
+    """
+
+    value, _ = await _read(key, model)
+    return None if value is _MISSING or value is _NOT_FOUND else value
+
+
+async def set_cached(
+    key: str,
+    value: Any,
+    ex: Optional[int] = None,
+    stale_after: Optional[float] = None,
+) -> None:
+    """Store ``value`` for ``ex`` seconds.
+
+    With ``stale_after`` the entry is considered stale after that many
+    seconds (soft TTL) while staying readable until ``ex`` (hard TTL).
+    """
+
+    await _write({key: (_with_stale_header(_encode(value), stale_after), ex)})
+    _remember(key, value, _fresh_ttl(ex, stale_after))
+
+
+async def _write(entries: Mapping[str, Entry]) -> None:
+    with _metrics.timed("set", entries):
+        await get_backend().set_many(entries)
+    for key, (raw, _) in entries.items():
+        _metrics.write(key, len(raw))
+
+
+async def delete_cached(key: str) -> None:
+    await delete_many([key])
+
+
+async def get_many(
+    keys: Iterable[str], model: Optional[type[M]] = None
+) -> dict[str, Any]:
+    """Return cached values for ``keys`` using a single ``MGET``.
+
+    Keys that are not cached are absent from the returned mapping, which
+    lists the others in the order of ``keys``. Stale entries are returned
+    as well.
+    """
+
+    keys = list(dict.fromkeys(keys))
+    values: dict[str, Any] = {}
+    pending: list[str] = []
+    for key in keys:
+        if _local is not None:
+            value = _local_value(key, model)
+            if value is not _MISSING:
+                _metrics.hit(key, l1=True, negative=value is _NOT_FOUND)
+                values[key] = value
+                continue
+        pending.append(key)
+
+    if pending:
+        if _local is not None:
+            _ensure_invalidation_listener()
+        with _metrics.timed("mget", pending):
+            raws = await get_backend().get_many(pending)
+        for key, raw in zip(pending, raws):
+            if raw is None:
+                _metrics.miss(key)
+                continue
+            value, stale_at = _decode_entry(raw, model)
+            _metrics.hit(key, len(raw), negative=value is _NOT_FOUND)
+            values[key] = value
+            if _local is not None:
+                # as in _read: L1 keeps an entry only until it turns stale
+                ttl = None if stale_at is None else stale_at - time.time()
+                if ttl is None or ttl > 0:
+                    _local.set(key, value, ttl=ttl)
+    return {
+        key: values[key]
+        for key in keys
+        if key in values and values[key] is not _NOT_FOUND
+    }
+
+
+async def set_many(
+    items: Mapping[str, Any],
+    ex: Optional[Union[int, Mapping[str, int]]] = None,
+    stale_after: Optional[float] = None,
+) -> None:
+    """Store several values in one pipelined round trip.
+
+    Args:
+        items: mapping of cache key to value.
+        ex: TTL in seconds applied to every key, or a mapping with a TTL
+            per key (keys missing from it are stored without expiry).
+        stale_after: soft TTL of every entry, as in :func:`set_cached`.
+    """
+
+    if not items:
+        return
+    ttls = {key: ex.get(key) if isinstance(ex, Mapping) else ex for key in items}
+    await _write(
+        {
+            key: (_with_stale_header(_encode(value), stale_after), ttls[key])
+            for key, value in items.items()
+        }
+    )
+    for key, value in items.items():
+        _remember(key, value, _fresh_ttl(ttls[key], stale_after))
+
+
+async def delete_many(keys: Iterable[str]) -> None:
+    """Delete several keys with a single ``DEL``."""
+
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return
+    if _local is not None:
+        for key in keys:
+            _local.invalidate(key)
+    with _metrics.timed("delete", keys):
+        await get_backend().delete_many(keys)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into a single execution.
+
+    The first caller for a key runs the coroutine; callers arriving while it
+    is in flight await the same result (or exception). The call runs in its
+    own task, so a cancelled caller does not cancel the load for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+
+_single_flight = SingleFlight()
+
+
+async def _store_loaded(
+    key: str,
+    value: Any,
+    ex: Optional[int],
+    stale_after: Optional[float] = None,
+    negative_ttl: Optional[int] = None,
+) -> None:
+    if value is None and not negative_ttl:
+        return
+    try:
+        if value is None:
+            await _write({key: (_NEGATIVE_ENTRY, negative_ttl)})
+            if _local is not None:
+                _local.set(key, _NOT_FOUND, ttl=negative_ttl)
+        else:
+            await set_cached(key, value, ex=ex, stale_after=stale_after)
+    except CacheUnavailableError:
+        pass
+    except Exception:
+        _log.warning("Failed to cache %s", key, exc_info=True)
+
+
+async def _load_and_store(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    ex: Optional[int],
+    stale_after: Optional[float] = None,
+    negative_ttl: Optional[int] = None,
+) -> Any:
+    value = await loader()
+    await _store_loaded(key, value, ex, stale_after, negative_ttl)
+    return value
+
+
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _background_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        _log.warning("Background cache task failed", exc_info=task.exception())
+
+
+def _schedule_refresh(
+    key: str,
+    refresher: Callable[[], Awaitable[Any]],
+    ex: Optional[int],
+    stale_after: Optional[float],
+) -> None:
+    """Reload a stale ``key`` in the background, once per key at a time."""
+
+    async def refresh() -> None:
+        value = await refresher()
+        if value is None:
+            await delete_many([key])
+        else:
+            await set_cached(key, value, ex=ex, stale_after=stale_after)
+
+    task = asyncio.ensure_future(_single_flight.do(f"refresh:{key}", refresh))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_done)
+
+
+async def _load_with_lock(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    ex: Optional[int],
+    lock_timeout: float,
+    model: Optional[type[M]] = None,
+    stale_after: Optional[float] = None,
+    negative_ttl: Optional[int] = None,
+) -> Any:
+    """Load ``key`` holding a cache lock so other processes wait for us."""
+
+    lock_key = f"lock:{key}"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + lock_timeout
+    backend = get_backend()
+    try:
+        acquired = await backend.acquire_lock(lock_key, token, lock_timeout)
+        while not acquired:
+            # another process is loading: wait for it to fill the cache
+            await asyncio.sleep(_LOCK_POLL_INTERVAL)
+            cached, _ = await _read(key, model)
+            if cached is _NOT_FOUND:
+                return None
+            if cached is not _MISSING:
+                return cached
+            if time.monotonic() >= deadline:
+                break
+            acquired = await backend.acquire_lock(lock_key, token, lock_timeout)
+    except CacheUnavailableError:
+        acquired = False
+    except Exception:
+        _log.warning("Cache lock unavailable for %s", key, exc_info=True)
+        acquired = False
+
+    if not acquired:
+        # holder is slow or died, or Redis failed: load ourselves
+        return await _load_and_store(key, loader, ex, stale_after, negative_ttl)
+    try:
+        return await _load_and_store(key, loader, ex, stale_after, negative_ttl)
+    finally:
+        try:
+            await backend.release_lock(lock_key, token)
+        except Exception:
+            _log.warning("Failed to release cache lock %s", lock_key, exc_info=True)
+
+
+async def get_or_load(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    ex: Optional[int] = None,
+    lock_timeout: Optional[float] = None,
+    model: Optional[type[M]] = None,
+    stale_after: Optional[float] = None,
+    refresher: Optional[Callable[[], Awaitable[Any]]] = None,
+    negative_ttl: Optional[int] = None,
+) -> Any:
+    """Return the cached value for ``key`` or load and cache it.
+
+    Concurrent misses for the same key within this process share one
+    ``loader`` call. When ``lock_timeout`` (default ``CACHE_LOCK_TIMEOUT``)
+    is positive, a Redis lock additionally limits the load to one process;
+    the others poll the cache until the value appears or the lock expires.
+
+    ``loader`` must return a cacheable value (e.g. a response model) or
+    ``None`` when the entity does not exist. ``None`` is cached only with
+    ``negative_ttl``, as a short-lived "not found" entry; writers clear it
+    by deleting or overwriting the key when the entity is created. All
+    coalesced callers receive the same object and must not mutate it.
+    The shared load outlives a cancelled caller, so ``loader`` should use
+    its own DB session rather than the session of the request that started
+    it. With ``model`` cache hits are returned as instances of that model.
+    A failing cache is treated as a miss so reads fall back to ``loader``.
+
+    Stale-while-revalidate: with ``stale_after`` (soft TTL) and ``ex``
+    (hard TTL), an entry older than the soft TTL is still returned at once
+    while ``refresher`` reloads it in a background task. ``refresher`` must
+    not depend on request-scoped resources such as the request's DB
+    session; without it a stale entry is reloaded synchronously.
+    """
+
+    try:
+        cached, stale_at = await _read(key, model)
+    except CacheUnavailableError:
+        cached, stale_at = _MISSING, None
+    except Exception:
+        _log.warning("Cache read failed for %s", key, exc_info=True)
+        cached, stale_at = _MISSING, None
+    if cached is _NOT_FOUND:
         return None
+    if cached is not _MISSING and cached is not None:
+        if stale_at is None or stale_at > time.time():
+            return cached
+        if refresher is not None:
+            _schedule_refresh(key, refresher, ex, stale_after)
+            return cached
+
+    timeout = LOCK_TIMEOUT if lock_timeout is None else lock_timeout
+
+    async def load() -> Any:
+        if timeout > 0:
+            return await _load_with_lock(
+                key, loader, ex, timeout, model, stale_after, negative_ttl
+            )
+        return await _load_and_store(key, loader, ex, stale_after, negative_ttl)
+
+    return await _single_flight.do(key, load)
+
+
+def _namespace_version_key(namespace: str) -> str:
+    return f"ns:{namespace}:version"
+
+
+def namespaced_key(namespace: str, version: int, *parts: Any) -> str:
+    """Build a key such as ``products:v3:page:50:1`` for a namespace version."""
+
+    return ":".join([namespace, f"v{version}", *(str(p) for p in parts)])
+
+
+def filter_key(filters: dict[str, Any]) -> str:
+    """Return a stable key part for repository filter kwargs.
+
+    ``None`` values are dropped, so omitted and empty filters share a key.
+    """
+
+    return urlencode(sorted((k, str(v)) for k, v in filters.items() if v is not None))
+
+
+async def namespace_version(namespace: str) -> int:
+    """Return the current version of ``namespace`` (``0`` if never bumped)."""
+
+    return int(await get_cached(_namespace_version_key(namespace)) or 0)
+
+
+async def bump_namespace(*namespaces: str) -> None:
+    """Invalidate every key derived from the current version of ``namespaces``.
+
+    Keys are never scanned or deleted: readers simply start using the next
+    version and the old entries expire through their TTL.
+    """
+
+    keys = [_namespace_version_key(ns) for ns in dict.fromkeys(namespaces)]
+    if not keys:
+        return
+    if _local is not None:
+        for key in keys:
+            _local.invalidate(key)
+    with _metrics.timed("incr", keys):
+        await get_backend().incr_many(keys)
+
+
+async def get_or_load_versioned(
+    namespace: str,
+    parts: Iterable[Any],
+    loader: Callable[[], Awaitable[Any]],
+    ex: Optional[int] = None,
+    model: Optional[type[M]] = None,
+) -> Any:
+    """:func:`get_or_load` for a key under the current ``namespace`` version."""
+
     try:
-        return json.loads(raw)
+        version = await namespace_version(namespace)
+    except CacheUnavailableError:
+        return await loader()
     except Exception:
-        return raw
+        # without the version we cannot tell fresh entries from stale ones
+        _log.warning("Cache namespace %s unavailable", namespace, exc_info=True)
+        return await loader()
+    key = namespaced_key(namespace, version, *parts)
+    return await get_or_load(key, loader, ex=ex, model=model)
+
+
+# Session.info keys holding the invalidations queued for the open transaction
+# and those whose transaction has committed but which were not sent yet.
+_PENDING_INVALIDATION = "cache_invalidation"
+_COMMITTED_INVALIDATION = "cache_invalidation_committed"
+
+
+def invalidate_on_commit(
+    session: Any, keys: Iterable[str] = (), namespaces: Iterable[str] = ()
+) -> None:
+    """Delete ``keys`` and bump ``namespaces`` once ``session`` commits.
+
+    Accepts a sync or async session. Everything queued during a transaction
+    is sent as a single batch by :func:`flush_invalidation`, which the
+    caller awaits right after the commit, so readers never re-cache the
+    pre-commit state; a rollback discards the queue.
+    """
+
+    info = getattr(session, "sync_session", session).info
+    pending = info.setdefault(_PENDING_INVALIDATION, {"keys": {}, "namespaces": {}})
+    pending["keys"].update(dict.fromkeys(keys))
+    pending["namespaces"].update(dict.fromkeys(namespaces))
+
+
+async def flush_invalidation(session: Any) -> None:
+    """Send the invalidations of the transactions ``session`` committed.
+
+    Call it right after ``commit()``: once it returns, the cache no longer
+    holds what the transaction changed, so a response sent afterwards
+    cannot be contradicted by a cached read.
+    """
 
+    committed = getattr(session, "sync_session", session).info.pop(
+        _COMMITTED_INVALIDATION, None
+    )
+    if committed:
+        await _send_invalidation(list(committed["keys"]), list(committed["namespaces"]))
 
-async def set_cached(key: str, value: Any, ex: Optional[int] = None) -> None:
-    r = await get_redis()
-    # always JSON-serialise complex objects
-    if isinstance(value, (str, bytes)):
-        to_store = value
+
+async def invalidate_after_commit(
+    session: Optional[Any], keys: Iterable[str] = (), namespaces: Iterable[str] = ()
+) -> None:
+    """Queue ``keys`` and ``namespaces`` like :func:`invalidate_on_commit`.
+
+    Without a session (e.g. repositories faked in tests) there is no commit
+    to wait for, so the cache is invalidated right away.
+    """
+
+    if session is not None:
+        invalidate_on_commit(session, keys=keys, namespaces=namespaces)
     else:
-        to_store = json.dumps(value, default=str)
-    await r.set(key, to_store, ex=ex)
+        await _send_invalidation(list(keys), list(namespaces))
 
 
-async def delete_cached(key: str) -> None:
-    r = await get_redis()
-    await r.delete(key)
+async def _send_invalidation(keys: list[str], namespaces: list[str]) -> None:
+    try:
+        await delete_many(keys)
+        await bump_namespace(*namespaces)
+    except CacheUnavailableError:
+        pass
+    except Exception:
+        _log.warning("Failed to invalidate cache", exc_info=True)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_INVALIDATION, None)
+    if not pending:
+        return
+    committed = session.info.setdefault(
+        _COMMITTED_INVALIDATION, {"keys": {}, "namespaces": {}}
+    )
+    committed["keys"].update(pending["keys"])
+    committed["namespaces"].update(pending["namespaces"])
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_invalidation(session: Session, previous_transaction: Any) -> None:
+    # a rolled back savepoint leaves the outer transaction's queue intact
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_INVALIDATION, None)
@@ -0,0 +1,52 @@
+"""Conditional GET (``ETag`` / ``If-None-Match``) for single resources.
+
+The validator is derived from the resource id and ``updated_at``, which
+every write bumps (``onupdate``), so it is computed from the cached response
+without reading the row again. When the cache holds the current version a
+matching ``If-None-Match`` is answered with an empty 304: no query, no body.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Optional, TypeVar
+
+from litestar import Response
+
+T = TypeVar("T")
+
+
+def etag_for(resource: Any) -> str:
+    """Return a weak ETag for a response model with ``id`` and timestamps."""
+
+    version = resource.updated_at or resource.created_at
+    digest = hashlib.blake2b(
+        f"{resource.id}:{version.isoformat()}".encode(), digest_size=12
+    )
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Return whether an ``If-None-Match`` header value matches ``etag``.
+
+    Uses the weak comparison RFC 9110 prescribes for ``If-None-Match``:
+    ``W/`` prefixes are ignored and ``*`` matches any current resource.
+    """
+
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+def conditional_response(resource: T, if_none_match: Optional[str]) -> Response[T]:
+    """Return ``resource`` with its ETag, or an empty 304 if the client has it."""
+
+    etag = etag_for(resource)
+    if etag_matches(if_none_match, etag):
+        return Response(None, status_code=304, headers={"ETag": etag})
+    return Response(resource, headers={"ETag": etag})
@@ -0,0 +1,19 @@
+"""HTTP controller exposing runtime metrics."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from litestar import Controller, get
+
+from app.cache import metrics_snapshot
+
+
+class MetricsController(Controller):
+    path = "/metrics"
+
+    @get("/cache")
+    async def get_cache_metrics(self) -> dict[str, Any]:
+        """Return cache metrics per key prefix plus L1 and circuit state."""
+
+        return metrics_snapshot()
@@ -2,14 +2,34 @@
 
 from __future__ import annotations
 
+from typing import Optional, Union
 from uuid import UUID
 
-from litestar import Controller, get
+from litestar import Controller, Response, get, post
 from litestar.exceptions import HTTPException
 from litestar.params import Parameter
+from litestar.response import Stream
 
-from app.schemas import OrderListResponse, OrderResponse
+from app.conditional import conditional_response
+from app.database.concurrency import ReadBudgetExceededError
+from app.export import MEDIA_TYPES, ExportFormat
+from app.pagination import InvalidCursorError, TotalMode
+from app.projection import InvalidFieldsError
+from app.repositories.order_request_repository import OrderRequestRepository
+from app.repositories.product_repository import InsufficientStockError
+from app.schemas import (
+    OrderCreateRequest,
+    OrderListResponse,
+    OrderRequestResponse,
+    OrderResponse,
+    PartialOrderListResponse,
+)
+from app.schemas.structs import OrderListStruct
 from app.services.order_service import OrderService
+from app.services.order_submission_service import (
+    OrderQueueUnavailableError,
+    OrderSubmissionService,
+)
 
 
 class OrderController(Controller):
@@ -21,12 +41,139 @@ class OrderController(Controller):
         order_service: OrderService,
         count: int = Parameter(default=50, ge=1),
         page: int = Parameter(default=1, ge=1),
-    ) -> OrderListResponse:
-        orders = await order_service.list(count=count, page=page)
-        total = await order_service.count()
-        return OrderListResponse(
-            orders=[OrderResponse.model_validate(o) for o in orders],
+        cursor: Optional[str] = Parameter(
+            default=None,
+            description="Opaque cursor from next_cursor; empty for the first page",
+        ),
+        include_total: bool = Parameter(
+            default=True, description="Set to false to skip counting rows"
+        ),
+        total_mode: TotalMode = Parameter(
+            default="exact",
+            description="exact (COUNT), window (one query with the page) "
+            "or approx (planner estimate)",
+        ),
+        fields: Optional[str] = Parameter(
+            default=None,
+            description="Comma-separated fields to return, e.g. "
+            "id,status,total_amount; the id and the sort key are always included",
+        ),
+        fast: bool = Parameter(
+            default=False,
+            description="Encode rows straight to JSON, skipping the ORM "
+            "and the page cache",
+        ),
+    ) -> Union[OrderListResponse, PartialOrderListResponse, OrderListStruct]:
+        try:
+            orders, total = await order_service.list_page(
+                count=count,
+                page=page,
+                cursor=cursor,
+                include_total=include_total,
+                total_mode=total_mode,
+                fields=fields,
+                fast=fast,
+            )
+        except (InvalidCursorError, InvalidFieldsError) as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        except ReadBudgetExceededError as exc:
+            raise HTTPException(status_code=503, detail=str(exc)) from exc
+        if fields:
+            response = PartialOrderListResponse
+        elif fast:
+            response = OrderListStruct
+        else:
+            response = OrderListResponse
+        return response(
+            orders=orders,
             total=total,
+            next_cursor=order_service.next_cursor(orders, count),
+        )
+
+    @post()
+    async def create_order(
+        self,
+        order_submission_service: OrderSubmissionService,
+        data: OrderCreateRequest,
+        idempotency_key: str = Parameter(
+            header="Idempotency-Key",
+            min_length=1,
+            max_length=255,
+            # URL-safe so the key can be used as is in the status URL
+            pattern=r"^[A-Za-z0-9._~-]+$",
+            description="Client-chosen unique key, e.g. a UUID; retries with "
+            "the same key never create a second order",
+        ),
+        prefer: Optional[str] = Parameter(
+            header="Prefer",
+            default=None,
+            required=False,
+            description="respond-async to queue the order and get 202 at once",
+        ),
+    ) -> Response[Union[OrderResponse, OrderRequestResponse]]:
+        """Create an order, or queue it and return 202 with a status URL.
+
+        A retry with the same Idempotency-Key answers with the first
+        outcome (``Idempotent-Replayed: true``) instead of a new order.
+        """
+
+        respond_async = _prefers_async(prefer)
+        try:
+            request, order, replayed = await order_submission_service.submit(
+                idempotency_key, data, respond_async=respond_async
+            )
+        except InsufficientStockError as exc:
+            raise HTTPException(status_code=409, detail=str(exc)) from exc
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail=str(exc)) from exc
+        except OrderQueueUnavailableError as exc:
+            raise HTTPException(status_code=503, detail=str(exc)) from exc
+
+        headers = {"Idempotent-Replayed": "true"} if replayed else {}
+        if order is None:
+            headers["Location"] = f"/orders/requests/{request.key}"
+            if respond_async:
+                headers["Preference-Applied"] = "respond-async"
+            return Response(
+                OrderRequestResponse.model_validate(request),
+                status_code=202,
+                headers=headers,
+            )
+        headers["Location"] = f"/orders/{order.id}"
+        return Response(
+            OrderResponse.model_validate(order), status_code=201, headers=headers
+        )
+
+    @get("/requests/{key:str}")
+    async def get_order_request(
+        self, order_request_repository: OrderRequestRepository, key: str
+    ) -> OrderRequestResponse:
+        """Return the state of an order submitted with ``key``."""
+
+        request = await order_request_repository.get(key)
+        if request is None:
+            raise HTTPException(status_code=404, detail="Order request not found")
+        return OrderRequestResponse.model_validate(request)
+
+    @get("/export")
+    async def export_orders(
+        self,
+        order_service: OrderService,
+        fmt: ExportFormat = Parameter(
+            query="format", default="ndjson", description="ndjson or csv"
+        ),
+        fields: Optional[str] = Parameter(
+            default=None, description="Comma-separated fields to export"
+        ),
+    ) -> Stream:
+        try:
+            chunks = order_service.export(fmt, fields=fields)
+        except InvalidFieldsError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        return Stream(
+            chunks,
+            media_type=MEDIA_TYPES[fmt],
+            headers={"Content-Disposition": f'attachment; filename="orders.{fmt}"'},
         )
 
     @get("/{order_id:uuid}")
@@ -34,8 +181,22 @@ class OrderController(Controller):
         self,
         order_service: OrderService,
         order_id: UUID,
-    ) -> OrderResponse:
+        if_none_match: Optional[str] = Parameter(
+            header="If-None-Match", default=None, required=False
+        ),
+    ) -> Response[OrderResponse]:
         order = await order_service.get_by_id(order_id)
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
-        return OrderResponse.model_validate(order)
+        return conditional_response(OrderResponse.model_validate(order), if_none_match)
+
+
+def _prefers_async(prefer: Optional[str]) -> bool:
+    """Return whether a ``Prefer`` header (RFC 7240) asks for respond-async."""
+
+    if not prefer:
+        return False
+    return any(
+        token.split(";")[0].strip().lower() == "respond-async"
+        for token in prefer.split(",")
+    )
@@ -2,13 +2,30 @@
 
 from __future__ import annotations
 
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, Union
 from uuid import UUID
 
-from litestar import Controller, get
+from litestar import Controller, Response, get
 from litestar.exceptions import HTTPException
 from litestar.params import Parameter
+from litestar.response import Stream
 
-from app.schemas import ProductListResponse, ProductResponse
+from app.conditional import conditional_response
+from app.database.concurrency import ReadBudgetExceededError
+from app.export import MEDIA_TYPES, ExportFormat
+from app.pagination import InvalidCursorError, TotalMode
+from app.projection import InvalidFieldsError
+from app.repositories.product_repository import ProductSort
+from app.schemas import (
+    PartialProductListResponse,
+    ProductListResponse,
+    ProductResponse,
+    ProductSearchResponse,
+    ProductWithOrderItemsResponse,
+)
+from app.schemas.structs import ProductListStruct
 from app.services.product_service import ProductService
 
 
@@ -21,12 +38,120 @@ class ProductController(Controller):
         product_service: ProductService,
         count: int = Parameter(default=50, ge=1),
         page: int = Parameter(default=1, ge=1),
-    ) -> ProductListResponse:
-        products = await product_service.list(count=count, page=page)
-        total = await product_service.count()
-        return ProductListResponse(
-            products=[ProductResponse.model_validate(p) for p in products],
+        cursor: Optional[str] = Parameter(
+            default=None,
+            description="Opaque cursor from next_cursor; empty for the first page",
+        ),
+        include_total: bool = Parameter(
+            default=True, description="Set to false to skip counting rows"
+        ),
+        total_mode: TotalMode = Parameter(
+            default="exact",
+            description="exact (COUNT), window (one query with the page) "
+            "or approx (planner estimate)",
+        ),
+        fields: Optional[str] = Parameter(
+            default=None,
+            description="Comma-separated fields to return, e.g. id,name,price; "
+            "the id and the sort key are always included",
+        ),
+        include: Optional[str] = Parameter(
+            default=None, description="Relations to load with each product: order_items"
+        ),
+        fast: bool = Parameter(
+            default=False,
+            description="Encode rows straight to JSON, skipping the ORM "
+            "and the page cache",
+        ),
+        sort: ProductSort = Parameter(
+            default="name",
+            description="name, price, created_at or updated_at; "
+            "prefix with - for descending order",
+        ),
+        min_price: Optional[Decimal] = Parameter(default=None),
+        max_price: Optional[Decimal] = Parameter(default=None),
+        in_stock: bool = Parameter(
+            default=False, description="Only products with stock_quantity > 0"
+        ),
+        name_prefix: Optional[str] = Parameter(
+            default=None, description="Case-sensitive prefix of the name"
+        ),
+        updated_since: Optional[datetime] = Parameter(
+            default=None, description="Only products updated at or after this time"
+        ),
+    ) -> Union[ProductListResponse, PartialProductListResponse, ProductListStruct]:
+        try:
+            products, total = await product_service.list_page(
+                count=count,
+                page=page,
+                cursor=cursor,
+                include_total=include_total,
+                total_mode=total_mode,
+                fields=fields,
+                fast=fast,
+                include=include,
+                sort=sort,
+                min_price=min_price,
+                max_price=max_price,
+                in_stock=in_stock or None,
+                name_prefix=name_prefix,
+                updated_since=updated_since,
+            )
+        except (InvalidCursorError, InvalidFieldsError) as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        except ReadBudgetExceededError as exc:
+            raise HTTPException(status_code=503, detail=str(exc)) from exc
+        if fields:
+            response = PartialProductListResponse
+        elif fast:
+            response = ProductListStruct
+        else:
+            response = ProductListResponse
+        return response(
+            products=products,
             total=total,
+            next_cursor=product_service.next_cursor(products, count, sort),
+        )
+
+    @get("/search")
+    async def search_products(
+        self,
+        product_service: ProductService,
+        q: str = Parameter(
+            min_length=1, description="Words to find in product names and descriptions"
+        ),
+        count: int = Parameter(default=50, ge=1),
+        cursor: Optional[str] = Parameter(
+            default=None, description="Opaque cursor from next_cursor"
+        ),
+    ) -> ProductSearchResponse:
+        try:
+            products, next_cursor = await product_service.search(
+                q, count=count, cursor=cursor
+            )
+        except InvalidCursorError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        return ProductSearchResponse(products=products, next_cursor=next_cursor)
+
+    @get("/export")
+    async def export_products(
+        self,
+        product_service: ProductService,
+        fmt: ExportFormat = Parameter(
+            query="format", default="ndjson", description="ndjson or csv"
+        ),
+        fields: Optional[str] = Parameter(
+            default=None, description="Comma-separated fields to export"
+        ),
+    ) -> Stream:
+        try:
+            chunks = product_service.export(fmt, fields=fields)
+        except InvalidFieldsError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        return Stream(
+            chunks,
+            media_type=MEDIA_TYPES[fmt],
+            headers={"Content-Disposition": f'attachment; filename="products.{fmt}"'},
         )
 
     @get("/{product_id:uuid}")
@@ -34,8 +159,23 @@ class ProductController(Controller):
         self,
         product_service: ProductService,
         product_id: UUID,
-    ) -> ProductResponse:
-        product = await product_service.get_by_id(product_id)
+        include: Optional[str] = Parameter(
+            default=None,
+            description="Relations to load with the product: order_items",
+        ),
+        if_none_match: Optional[str] = Parameter(
+            header="If-None-Match", default=None, required=False
+        ),
+    ) -> Response[Union[ProductResponse, ProductWithOrderItemsResponse]]:
+        try:
+            product = await product_service.get_by_id(product_id, include=include)
+        except InvalidFieldsError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
-        return ProductResponse.model_validate(product)
+        if include:
+            # order items change without bumping the product's updated_at
+            return Response(product)
+        # a ProductResponse, usually from the cache: a matching If-None-Match
+        # is answered without a query
+        return conditional_response(product, if_none_match)
@@ -6,12 +6,23 @@ the :class:`app.services.user_service.UserService`.
 
 from __future__ import annotations
 
+from typing import Optional, Union
 from uuid import UUID
 
-from litestar import Controller, Request, delete, get, post, put
+from litestar import Controller, Request, Response, delete, get, post, put
+from litestar.exceptions import HTTPException
 from litestar.params import Parameter
 
-from app.schemas import UserListResponse, UserResponse
+from app.conditional import conditional_response
+from app.database.concurrency import ReadBudgetExceededError
+from app.pagination import InvalidCursorError, TotalMode
+from app.projection import InvalidFieldsError
+from app.schemas import (
+    PartialUserListResponse,
+    UserListResponse,
+    UserResponse,
+    UserWithOrdersResponse,
+)
 from app.services.user_service import UserService
 
 
@@ -25,13 +36,27 @@ class UserController(Controller):
         self,
         user_service: UserService,
         user_id: UUID,
-    ) -> UserResponse:
-        """Return a single user by id or ``None`` when not found."""
-
-        user = await user_service.get_by_id(user_id)
-        if not user:
-            return None
-        return UserResponse.model_validate(user)
+        include: Optional[str] = Parameter(
+            default=None, description="Relations to load with the user: orders"
+        ),
+        if_none_match: Optional[str] = Parameter(
+            header="If-None-Match", default=None, required=False
+        ),
+    ) -> Response[Optional[Union[UserResponse, UserWithOrdersResponse]]]:
+        """Return a single user by id or ``None`` when not found.
+
+        Plain user responses carry an ``ETag``; a matching ``If-None-Match``
+        gets an empty 304.
+        """
+
+        try:
+            # a UserResponse (cached or fresh), with orders when included
+            user = await user_service.get_by_id(user_id, include=include)
+        except InvalidFieldsError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        if user is None or include:
+            return Response(user)
+        return conditional_response(user, if_none_match)
 
     @get()
     async def get_all_users(
@@ -39,15 +64,55 @@ class UserController(Controller):
         user_service: UserService,
         count: int = Parameter(default=50, ge=1),
         page: int = Parameter(default=1, ge=1),
-    ) -> UserListResponse:
-        """Return paginated list of users and total count."""
-
-        users = await user_service.get_by_filter(count=count, page=page)
-        total = await user_service.count()
-
-        return UserListResponse(
-            users=[UserResponse.model_validate(u) for u in users],
+        cursor: Optional[str] = Parameter(
+            default=None,
+            description="Opaque cursor from next_cursor; empty for the first page",
+        ),
+        include_total: bool = Parameter(
+            default=True, description="Set to false to skip counting rows"
+        ),
+        total_mode: TotalMode = Parameter(
+            default="exact",
+            description="exact (COUNT), window (one query with the page) "
+            "or approx (planner estimate)",
+        ),
+        fields: Optional[str] = Parameter(
+            default=None,
+            description="Comma-separated fields to return, e.g. id,username; "
+            "the id and the sort key are always included",
+        ),
+        include: Optional[str] = Parameter(
+            default=None, description="Relations to load with each user: orders"
+        ),
+    ) -> Union[UserListResponse, PartialUserListResponse]:
+        """Return paginated list of users and total count.
+
+        Pages are addressed by ``page`` or, for keyset pagination, by the
+        ``cursor`` returned as ``next_cursor`` of the previous page.
+        ``total`` is omitted with ``include_total=false``; ``total_mode``
+        selects how it is computed.
+        """
+
+        try:
+            users, total = await user_service.list_page(
+                count=count,
+                page=page,
+                cursor=cursor,
+                include_total=include_total,
+                total_mode=total_mode,
+                fields=fields,
+                include=include,
+            )
+        except (InvalidCursorError, InvalidFieldsError) as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        except ReadBudgetExceededError as exc:
+            raise HTTPException(status_code=503, detail=str(exc)) from exc
+
+        response = PartialUserListResponse if fields else UserListResponse
+        return response(
+            users=users,
             total=total,
+            next_cursor=user_service.next_cursor(users, count),
         )
 
     @post()
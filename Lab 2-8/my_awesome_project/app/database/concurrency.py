@@ -0,0 +1,65 @@
+"""Run independent read queries at the same time.
+
+An ``AsyncSession`` runs one statement at a time, so a page and its count
+issued through the request session take the sum of their latencies.
+:func:`gather_reads` gives every read its own session (and so its own pooled
+connection) and waits for all of them, bounded by ``DB_READ_BUDGET`` seconds
+for the whole group. Each concurrent group holds one connection per read,
+which should be kept in mind when sizing the engine pool.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# time a request may spend waiting for one group of concurrent reads
+READ_BUDGET = float(os.getenv("DB_READ_BUDGET", "5"))
+
+Read = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class ReadBudgetExceededError(TimeoutError):
+    """Raised when concurrent reads do not finish within the budget."""
+
+
+async def gather_reads(
+    session_factory: Callable[[], AsyncSession],
+    *reads: Read,
+    budget: Optional[float] = None,
+) -> list[Any]:
+    """Run each of ``reads`` on its own session and return their results.
+
+    Results keep the order of ``reads``. When one read fails or the budget
+    runs out the others are cancelled, their sessions are closed and the
+    error (or :class:`ReadBudgetExceededError`) is raised.
+    """
+
+    async def run(read: Read) -> Any:
+        async with session_factory() as session:
+            return await read(session)
+
+    budget = READ_BUDGET if budget is None else budget
+    tasks = [asyncio.ensure_future(run(read)) for read in reads]
+    try:
+        done, pending = await asyncio.wait(
+            tasks, timeout=budget, return_when=asyncio.FIRST_EXCEPTION
+        )
+    finally:
+        # also reached when the request itself is cancelled
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    for task in done:
+        if task.exception() is not None:
+            raise task.exception()
+    if pending:
+        raise ReadBudgetExceededError(
+            f"{len(pending)} of {len(tasks)} reads did not finish in {budget}s"
+        )
+    return [task.result() for task in tasks]
@@ -0,0 +1,33 @@
+"""Planner statistics helpers.
+
+Exact ``COUNT(*)`` has to visit every row of a table. PostgreSQL keeps an
+estimate of the row count in ``pg_class.reltuples`` (refreshed by VACUUM,
+ANALYZE and autovacuum), which is good enough for pagination totals on
+large tables and costs a single catalog lookup.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def estimated_row_count(db: AsyncSession, table: str) -> Optional[int]:
+    """Return the planner's row estimate for ``table``.
+
+    Returns ``None`` on databases without such statistics (e.g. SQLite) and
+    for tables PostgreSQL has not analyzed yet.
+    """
+
+    if db.bind is None or db.bind.dialect.name != "postgresql":
+        return None
+    result = await db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:t AS regclass)"),
+        {"t": table},
+    )
+    estimate = result.scalar()
+    if estimate is None or estimate < 0:
+        return None
+    return int(estimate)
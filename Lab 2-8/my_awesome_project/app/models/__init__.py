@@ -2,8 +2,8 @@
 
 from .address import Address
 from .base import Base
-from .order import Order, OrderItem
+from .order import Order, OrderItem, OrderRequest
 from .product import Product
 from .user import User
 
-__all__ = ["Base", "User", "Address", "Product", "Order", "OrderItem"]
+__all__ = ["Base", "User", "Address", "Product", "Order", "OrderItem", "OrderRequest"]
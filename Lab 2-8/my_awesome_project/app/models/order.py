@@ -1,4 +1,4 @@
-"""Order and OrderItem ORM models."""
+"""Order, OrderItem and OrderRequest ORM models."""
 
 # Many ORM model classes are simple data holders without public methods.
 # Disable pylint's "too-few-public-methods" for this module.
@@ -8,7 +8,7 @@ from datetime import datetime
 from decimal import Decimal
 from uuid import UUID, uuid4
 
-from sqlalchemy import ForeignKey, Numeric, String
+from sqlalchemy import ForeignKey, Index, Numeric, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -18,6 +18,8 @@ class Order(Base):
     """Representation of a customer's order."""
 
     __tablename__ = "orders"
+    # keyset pagination reads pages in (created_at, id) desc order
+    __table_args__ = (Index("ix_orders_created_at_id", "created_at", "id"),)
 
     id: Mapped[UUID] = mapped_column(
         primary_key=True,
@@ -91,3 +93,34 @@ class OrderItem(Base):
             f"OrderItem(product_id={self.product_id}, "
             f"quantity={self.quantity}, price={self.unit_price})"
         )
+
+
+class OrderRequest(Base):
+    """An order submitted with ``POST /orders``, keyed by its Idempotency-Key.
+
+    ``fingerprint`` is a hash of the request body, so a key cannot be reused
+    for a different order. ``status`` is ``queued`` while the order waits in
+    the queue, then ``completed`` (with ``order_id``) or ``failed`` (with
+    ``error``).
+    """
+
+    __tablename__ = "order_requests"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
+    status: Mapped[str] = mapped_column(
+        String(20),
+        default="queued",
+    )
+    order_id: Mapped[UUID] = mapped_column(
+        ForeignKey("orders.id"),
+        nullable=True,
+    )
+    error: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.now)
+    updated_at: Mapped[datetime] = mapped_column(
+        default=datetime.now, onupdate=datetime.now
+    )
+
+    def __repr__(self):
+        return f"OrderRequest(key={self.key!r}, status={self.status})"
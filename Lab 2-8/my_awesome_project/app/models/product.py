@@ -9,16 +9,51 @@ from datetime import datetime
 from decimal import Decimal
 from uuid import UUID, uuid4
 
-from sqlalchemy import Numeric, Text
+from sqlalchemy import DDL, Index, Numeric, Text, Uuid, column, event, table, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
 
+# Weighted full-text document of a product: name (A) ranks above description
+# (B). Search queries must repeat this expression verbatim for PostgreSQL to
+# answer them from the GIN index ix_products_search.
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
 
 class Product(Base):
     """ORM model that represents a sellable product."""
 
     __tablename__ = "products"
+    # keyset pagination reads pages in (sort key, id) order, one index per
+    # sort key offered by ProductRepository.list
+    __table_args__ = (
+        Index("ix_products_name_id", "name", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_created_at_id", "created_at", "id"),
+        Index("ix_products_updated_at_id", "updated_at", "id"),
+        # ``in_stock`` listings only read the rows that are in stock
+        Index(
+            "ix_products_in_stock_name_id",
+            "name",
+            "id",
+            sqlite_where=text("stock_quantity > 0"),
+            postgresql_where=text("stock_quantity > 0"),
+        ),
+        # ``name LIKE 'prefix%'`` needs a pattern-ops index on PostgreSQL
+        # unless the database collation is "C"
+        Index(
+            "ix_products_name_pattern",
+            "name",
+            postgresql_ops={"name": "text_pattern_ops"},
+        ).ddl_if(dialect="postgresql"),
+        # full-text search on PostgreSQL; SQLite uses products_fts instead
+        Index(
+            "ix_products_search", text(f"({SEARCH_DOCUMENT})"), postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id: Mapped[UUID] = mapped_column(
         primary_key=True,
@@ -33,11 +68,36 @@ class Product(Base):
         default=datetime.now, onupdate=datetime.now
     )
 
+    # not loaded by default; queries opt in with ``include=("order_items",)``
     order_items: Mapped[list["OrderItem"]] = relationship(
-        "OrderItem",
-        back_populates="product",
-        lazy="selectin",
+        "OrderItem", back_populates="product"
     )
 
     def __repr__(self):
         return f"Product(name={self.name!r}, price={self.price!r})"
+
+
+# SQLite full-text index of product names and descriptions. It is a separate
+# FTS5 table, not a view of ``products``: ProductRepository writes it on every
+# create and update.
+products_fts = table(
+    "products_fts",
+    column("rowid"),
+    column("product_id", Uuid()),
+    column("name"),
+    column("description"),
+)
+
+event.listen(
+    Product.__table__,
+    "after_create",
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts "
+        "USING fts5(product_id UNINDEXED, name, description)"
+    ).execute_if(dialect="sqlite"),
+)
+event.listen(
+    Product.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS products_fts").execute_if(dialect="sqlite"),
+)
@@ -11,7 +11,7 @@ relationships to addresses and orders.
 from datetime import datetime
 from uuid import UUID, uuid4
 
-from sqlalchemy import Text
+from sqlalchemy import Index, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -21,6 +21,8 @@ class User(Base):
     """ORM model for a user record."""
 
     __tablename__ = "users"
+    # keyset pagination reads pages in (created_at, id) order
+    __table_args__ = (Index("ix_users_created_at_id", "created_at", "id"),)
 
     id: Mapped[UUID] = mapped_column(
         primary_key=True,
@@ -36,11 +38,8 @@ class User(Base):
 
     addresses: Mapped[list["Address"]] = relationship("Address", back_populates="user")
 
-    orders: Mapped[list["Order"]] = relationship(
-        "Order",
-        back_populates="user",
-        lazy="selectin",
-    )
+    # not loaded by default; queries opt in with ``include=("orders",)``
+    orders: Mapped[list["Order"]] = relationship("Order", back_populates="user")
 
     def __repr__(self):
         """Return a compact user representation useful for debugging."""
@@ -0,0 +1,94 @@
+"""Opaque cursors for keyset pagination.
+
+A cursor encodes the ``(sort_key, id)`` pair of the last row of a page. The
+next page is read with ``WHERE (sort_key, id) > (:sort_key, :id)`` (or
+``<`` for descending order), which uses the composite index on those
+columns instead of skipping ``OFFSET`` rows.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Literal, Mapping, Optional, Sequence, TypeVar
+from uuid import UUID
+
+T = TypeVar("T")
+
+# How list endpoints compute ``total``: ``exact`` runs a (cached) COUNT,
+# ``window`` returns it with the page from one query (``COUNT(*) OVER ()``)
+# and ``approx`` reads planner statistics, falling back to ``exact`` on
+# databases without them.
+TotalMode = Literal["exact", "window", "approx"]
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor cannot be decoded."""
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return value.hex
+    if isinstance(value, Decimal):
+        # a string keeps the exact value; ``Decimal(v)`` reads it back
+        return str(value)
+    return value
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode key values (str, int, Decimal, datetime, UUID) into a cursor."""
+
+    raw = json.dumps([_to_json(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: Callable[[Any], Any]) -> tuple[Any, ...]:
+    """Decode ``cursor`` converting each value with the matching type.
+
+    ``datetime`` values are parsed from ISO format.
+    """
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("unexpected cursor shape")
+        return tuple(
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for t, v in zip(types, values)
+        )
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursorError(f"Invalid cursor: {cursor!r}") from exc
+
+
+def row_key(*names: str) -> Callable[[Any], tuple[Any, ...]]:
+    """Return a ``key`` for :func:`next_cursor` reading ``names`` from a row.
+
+    Rows may be objects (ORM entities, response models) or mappings, such as
+    the dicts returned for sparse fieldsets.
+    """
+
+    def key(row: Any) -> tuple[Any, ...]:
+        if isinstance(row, Mapping):
+            return tuple(row[name] for name in names)
+        return tuple(getattr(row, name) for name in names)
+
+    return key
+
+
+def next_cursor(
+    rows: Sequence[T], count: int, key: Callable[[T], tuple[Any, ...]]
+) -> Optional[str]:
+    """Return the cursor after the last row of a full page.
+
+    A short page is the last one and gets ``None``. A full page that happens
+    to end on the last row still gets a cursor; it leads to an empty page.
+    """
+
+    if not rows or len(rows) < count:
+        return None
+    return encode_cursor(*key(rows[-1]))
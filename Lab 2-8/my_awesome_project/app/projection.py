@@ -0,0 +1,60 @@
+"""Sparse fieldsets (``fields=id,name,price``) and ``include=`` parameters.
+
+Repositories turn the parsed field names into column-only ``select()``
+statements: columns that were not asked for (e.g. large ``Text``
+descriptions) are never read, and rows come back as plain rows instead of
+ORM instances tracked by the session. Relationships are never loaded by
+default; ``include`` names the ones a query should eager-load.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, Optional, Sequence
+
+
+class InvalidFieldsError(ValueError):
+    """Raised when ``fields`` or ``include`` names something unavailable."""
+
+
+def parse_fields(
+    raw: Optional[str], allowed: Iterable[str], always: Sequence[str] = ("id",)
+) -> Optional[tuple[str, ...]]:
+    """Parse a comma-separated ``fields`` value into column names.
+
+    Returns ``None`` when ``fields`` was not passed at all. ``always`` (the
+    id and the sort key the cursor is built from) lead the result even if
+    they were not requested; duplicates are dropped.
+    """
+
+    if raw is None:
+        return None
+    names = [name.strip() for name in raw.split(",") if name.strip()]
+    if not names:
+        raise InvalidFieldsError("fields must name at least one field")
+    allowed = tuple(allowed)
+    unknown = sorted(set(names) - set(allowed))
+    if unknown:
+        raise InvalidFieldsError(
+            f"Unknown fields: {', '.join(unknown)}; "
+            f"expected some of: {', '.join(allowed)}"
+        )
+    return tuple(dict.fromkeys([*always, *names]))
+
+
+def parse_include(raw: Optional[str], allowed: Iterable[str]) -> tuple[str, ...]:
+    """Parse a comma-separated ``include`` value into relationship names.
+
+    Returns an empty tuple when nothing was requested.
+    """
+
+    names = tuple(
+        dict.fromkeys(name.strip() for name in (raw or "").split(",") if name.strip())
+    )
+    allowed = tuple(allowed)
+    unknown = sorted(set(names) - set(allowed))
+    if unknown:
+        raise InvalidFieldsError(
+            f"Cannot include: {', '.join(unknown)}; "
+            f"expected some of: {', '.join(allowed)}"
+        )
+    return names
@@ -2,8 +2,9 @@
 
 from __future__ import annotations
 
-from typing import Any
+from typing import Any, Sequence
 
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import OrderItem
@@ -16,10 +17,21 @@ class OrderItemRepository:
         self.db = db
 
     async def create(self, data: dict[str, Any]) -> OrderItem:
-        """Create an order item and return it."""
+        """Create an order item with one ``INSERT ... RETURNING``."""
 
-        order_item = OrderItem(**data)
-        self.db.add(order_item)
-        await self.db.flush()
-        await self.db.refresh(order_item)
-        return order_item
+        return await self.db.scalar(
+            insert(OrderItem).values(**data).returning(OrderItem)
+        )
+
+    async def create_many(self, rows: Sequence[dict[str, Any]]) -> list[OrderItem]:
+        """Create order items in one multi-row ``INSERT`` and return them.
+
+        Rows are sent as ``INSERT ... VALUES (...), (...) RETURNING`` (in
+        batches on very large inputs) and the returned items are already
+        loaded, so there is no per-item flush or refresh.
+        """
+
+        if not rows:
+            return []
+        result = await self.db.scalars(insert(OrderItem).returning(OrderItem), rows)
+        return result.all()
@@ -2,14 +2,17 @@
 
 from __future__ import annotations
 
-from typing import Any, Optional
+from datetime import datetime
+from typing import Any, AsyncIterator, Optional, Sequence
 from uuid import UUID
 
-from sqlalchemy import func, select
+from sqlalchemy import Row, func, insert, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import noload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
-from app.models import Order
+from app.database.statistics import estimated_row_count
+from app.models import Order, OrderItem
 
 
 class OrderRepository:
@@ -29,16 +32,130 @@ class OrderRepository:
         result = await self.db.execute(stmt)
         return result.scalars().first()
 
-    async def list(self, count: int = 50, page: int = 1) -> list[Order]:
-        """Return a page of orders ordered by creation time desc."""
+    async def list(
+        self,
+        count: int = 50,
+        page: int = 1,
+        after: Optional[tuple[datetime, UUID]] = None,
+    ) -> list[Order]:
+        """Return a page of orders, newest first (``created_at, id`` desc).
 
-        stmt = select(Order).order_by(Order.created_at.desc())
-        if count and count > 0:
-            stmt = stmt.limit(count).offset(max(page - 1, 0) * count)
+        With ``after`` (the ``(created_at, id)`` of the previous page's last
+        row) the page is read with a keyset condition and ``page`` is ignored.
+        """
+
+        stmt = self._paginate(select(Order), count, page, after)
         stmt = stmt.options(selectinload(Order.order_items))
         result = await self.db.execute(stmt)
         return result.scalars().all()
 
+    async def list_columns(
+        self,
+        columns: Sequence[str],
+        count: int = 50,
+        page: int = 1,
+        after: Optional[tuple[datetime, UUID]] = None,
+    ) -> list[Row]:
+        """Return a page of orders as rows holding only ``columns``.
+
+        Paging works as in :meth:`list`; order items are not loaded.
+        """
+
+        stmt = select(*(getattr(Order, name) for name in columns))
+        result = await self.db.execute(self._paginate(stmt, count, page, after))
+        return result.all()
+
+    async def list_item_columns(
+        self, order_ids: Sequence[UUID], columns: Sequence[str]
+    ) -> list[Row]:
+        """Return ``order_id`` followed by ``columns`` for items of the orders."""
+
+        if not order_ids:
+            return []
+        stmt = select(
+            OrderItem.order_id, *(getattr(OrderItem, name) for name in columns)
+        ).where(OrderItem.order_id.in_(order_ids))
+        result = await self.db.execute(stmt)
+        return result.all()
+
+    async def stream_columns(
+        self, columns: Sequence[str], batch_size: int = 1000
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Yield every order as rows holding only ``columns``, in batches.
+
+        Rows come newest first from a server-side cursor, ``batch_size`` at
+        a time; order items are not read.
+        """
+
+        stmt = (
+            select(*(getattr(Order, name) for name in columns))
+            .order_by(Order.created_at.desc(), Order.id.desc())
+            .execution_options(yield_per=batch_size)
+        )
+        result = await self.db.stream(stmt)
+        async for batch in result.partitions():
+            yield batch
+
+    async def stream_with_items(
+        self,
+        columns: Sequence[str],
+        item_columns: Sequence[str],
+        batch_size: int = 1000,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Yield every order joined with its items, in batches of rows.
+
+        Each row holds ``columns`` of the order followed by ``item_columns``
+        of one item (all ``None`` for an order without items). Rows of one
+        order are adjacent and orders come newest first, so callers can
+        group them while streaming.
+        """
+
+        stmt = (
+            select(
+                *(getattr(Order, name) for name in columns),
+                *(getattr(OrderItem, name) for name in item_columns),
+            )
+            .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+            .order_by(Order.created_at.desc(), Order.id.desc())
+            .execution_options(yield_per=batch_size)
+        )
+        result = await self.db.stream(stmt)
+        async for batch in result.partitions():
+            yield batch
+
+    @staticmethod
+    def _paginate(stmt, count: int, page: int, after: Optional[tuple[datetime, UUID]]):
+        """Order ``stmt`` newest first and restrict it to one page."""
+
+        stmt = stmt.order_by(Order.created_at.desc(), Order.id.desc())
+        if after is not None:
+            stmt = stmt.where(tuple_(Order.created_at, Order.id) < tuple_(*after))
+            page = 1
+        if count and count > 0:
+            stmt = stmt.limit(count).offset(max(page - 1, 0) * count)
+        return stmt
+
+    async def list_with_total(
+        self, count: int = 50, page: int = 1
+    ) -> tuple[list[Order], Optional[int]]:
+        """Return a page of orders and the total in a single query.
+
+        The total comes from ``COUNT(*) OVER ()`` on the page rows, so it is
+        ``None`` when the page is empty (e.g. past the last page).
+        """
+
+        stmt = (
+            select(Order, func.count().over().label("total"))
+            .order_by(Order.created_at.desc(), Order.id.desc())
+            .limit(count)
+            .offset(max(page - 1, 0) * count)
+            .options(selectinload(Order.order_items))
+        )
+        rows = (await self.db.execute(stmt)).all()
+        if not rows:
+            return [], None
+        return [row[0] for row in rows], int(rows[0][1])
+
     async def count(self) -> int:
         """Return total number of orders."""
 
@@ -46,22 +163,43 @@ class OrderRepository:
         result = await self.db.execute(stmt)
         return int(result.scalar() or 0)
 
+    async def estimated_count(self) -> Optional[int]:
+        """Return the planner's estimate of the number of orders, if any."""
+
+        return await estimated_row_count(self.db, Order.__tablename__)
+
     async def create(self, data: dict[str, Any]) -> Order:
-        """Create a new order."""
+        """Create a new order with one ``INSERT ... RETURNING``.
+
+        A new order has no items yet, so the ``order_items`` collection is
+        set to empty instead of being loaded with another query.
+        """
+
+        stmt = (
+            insert(Order)
+            .values(**data)
+            .returning(Order)
+            .options(noload(Order.order_items))
+        )
+        return await self.db.scalar(stmt)
 
-        order = Order(**data)
-        self.db.add(order)
-        await self.db.flush()
-        await self.db.refresh(order)
-        return order
+    def attach_items(self, order: Order, items: Sequence[OrderItem]) -> None:
+        """Set ``order_items`` of a new order to the items just inserted."""
+
+        set_committed_value(order, "order_items", list(items))
 
     async def update_status(self, order_id: UUID, status: str) -> Optional[Order]:
-        """Update status for an order."""
-
-        order = await self.get_by_id(order_id)
-        if not order:
-            return None
-        order.status = status
-        await self.db.flush()
-        await self.db.refresh(order)
-        return order
+        """Update status for an order.
+
+        One ``UPDATE ... RETURNING`` writes the status and returns the order
+        (its items are loaded as usual); ``None`` if there is no such order.
+        """
+
+        stmt = (
+            update(Order)
+            .where(Order.id == order_id)
+            .values(status=status)
+            .returning(Order)
+            .execution_options(populate_existing=True)
+        )
+        return await self.db.scalar(stmt)
@@ -0,0 +1,80 @@
+"""Repository helpers for idempotency records of submitted orders."""
+
+from __future__ import annotations
+
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import OrderRequest
+
+
+class OrderRequestRepository:
+    """Async helper around :class:`app.models.order.OrderRequest`."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get(self, key: str) -> Optional[OrderRequest]:
+        """Return the request recorded under ``key``, if any."""
+
+        return await self.db.get(OrderRequest, key)
+
+    async def create(self, key: str, fingerprint: str, status: str) -> OrderRequest:
+        """Record a request with one ``INSERT ... RETURNING``.
+
+        A concurrent request with the same key waits for this transaction
+        and then fails with ``IntegrityError`` (primary key violation).
+        """
+
+        stmt = (
+            insert(OrderRequest)
+            .values(key=key, fingerprint=fingerprint, status=status)
+            .returning(OrderRequest)
+        )
+        return await self.db.scalar(stmt)
+
+    async def claim(self, key: str) -> Optional[OrderRequest]:
+        """Move a ``queued`` request to ``processing`` and return it.
+
+        Returns ``None`` when the request is unknown or was already taken,
+        e.g. on a redelivered message. The row stays locked until the
+        transaction ends, so a duplicate delivery cannot claim it meanwhile.
+        """
+
+        stmt = (
+            update(OrderRequest)
+            .where(OrderRequest.key == key, OrderRequest.status == "queued")
+            .values(status="processing")
+            .returning(OrderRequest)
+            .execution_options(populate_existing=True)
+        )
+        return await self.db.scalar(stmt)
+
+    async def complete(self, key: str, order_id: UUID) -> Optional[OrderRequest]:
+        """Mark the request as ``completed`` with the created order."""
+
+        stmt = (
+            update(OrderRequest)
+            .where(OrderRequest.key == key)
+            .values(status="completed", order_id=order_id)
+            .returning(OrderRequest)
+            .execution_options(populate_existing=True)
+        )
+        return await self.db.scalar(stmt)
+
+    async def fail(self, key: str, error: str) -> None:
+        """Mark a ``queued`` request as ``failed`` with the reason."""
+
+        await self.db.execute(
+            update(OrderRequest)
+            .where(OrderRequest.key == key, OrderRequest.status == "queued")
+            .values(status="failed", error=error)
+        )
+
+    async def delete(self, key: str) -> None:
+        """Forget the request, so the key can be submitted again."""
+
+        await self.db.execute(delete(OrderRequest).where(OrderRequest.key == key))
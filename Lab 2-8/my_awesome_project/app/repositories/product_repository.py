@@ -2,13 +2,97 @@
 
 from __future__ import annotations
 
-from typing import Any, Optional
+import re
+from datetime import datetime
+from decimal import Decimal
+from typing import (
+    Any,
+    AsyncIterator,
+    Literal,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
 from uuid import UUID
 
-from sqlalchemy import func, select
+from sqlalchemy import (
+    Float,
+    Row,
+    case,
+    delete,
+    func,
+    insert,
+    literal_column,
+    select,
+    tuple_,
+    update,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
 
+from app.database.statistics import estimated_row_count
 from app.models import Product
+from app.models.product import SEARCH_DOCUMENT, products_fts
+
+# sort keys accepted by the list methods; a leading "-" sorts descending.
+# Every key has a ``(column, id)`` index, see Product.__table_args__.
+ProductSort = Literal[
+    "name",
+    "-name",
+    "price",
+    "-price",
+    "created_at",
+    "-created_at",
+    "updated_at",
+    "-updated_at",
+]
+SORT_COLUMNS = {
+    "name": Product.name,
+    "price": Product.price,
+    "created_at": Product.created_at,
+    "updated_at": Product.updated_at,
+}
+# Python type of each sort column, used to decode cursors
+SORT_TYPES = {
+    "name": str,
+    "price": Decimal,
+    "created_at": datetime,
+    "updated_at": datetime,
+}
+
+
+class StockShortage(NamedTuple):
+    """An order line that the stock cannot cover."""
+
+    product_id: UUID
+    requested: int
+    # ``None`` when the product does not exist
+    available: Optional[int]
+
+
+class InsufficientStockError(ValueError):
+    """Raised by :meth:`ProductRepository.decrement_stock`; nothing was taken."""
+
+    def __init__(self, shortages: Sequence[StockShortage]):
+        self.shortages = list(shortages)
+        super().__init__(
+            "Insufficient stock: "
+            + ", ".join(
+                f"product {s.product_id} (requested {s.requested}, "
+                f"available {'none' if s.available is None else s.available})"
+                for s in self.shortages
+            )
+        )
+
+
+# bm25 weights of the products_fts columns: product_id, name, description
+_FTS_SCORE = "bm25(products_fts, 0.0, 10.0, 1.0)"
+
+# keys of ``update`` data that are written; anything else is ignored
+_COLUMNS = frozenset(Product.__table__.columns.keys())
 
 
 class ProductRepository:
@@ -17,54 +101,399 @@ class ProductRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def get_by_id(self, product_id: UUID) -> Optional[Product]:
-        """Return a single product by id."""
+    async def get_by_id(
+        self, product_id: UUID, include: Sequence[str] = ()
+    ) -> Optional[Product]:
+        """Return a single product by id, loading the ``include`` relations."""
 
-        return await self.db.get(Product, product_id)
+        if not include:
+            return await self.db.get(Product, product_id)
+        stmt = (
+            select(Product).where(Product.id == product_id).options(*_loaders(include))
+        )
+        result = await self.db.execute(stmt)
+        return result.scalars().first()
 
-    async def list(self, count: int = 50, page: int = 1) -> list[Product]:
-        """Return a page of products ordered by name."""
+    async def get_many(self, product_ids: Sequence[UUID]) -> list[Product]:
+        """Return the products with the given ids in one query.
 
-        stmt = select(Product).order_by(Product.name)
-        if count and count > 0:
-            stmt = stmt.limit(count).offset(max(page - 1, 0) * count)
+        Unknown ids are skipped and the result is in no particular order.
+        """
+
+        if not product_ids:
+            return []
+        stmt = select(Product).where(Product.id.in_(product_ids))
         result = await self.db.execute(stmt)
         return result.scalars().all()
 
-    async def count(self) -> int:
-        """Return total number of products."""
+    async def list(
+        self,
+        count: int = 50,
+        page: int = 1,
+        after: Optional[tuple[Any, UUID]] = None,
+        include: Sequence[str] = (),
+        sort: ProductSort = "name",
+        **filters,
+    ) -> list[Product]:
+        """Return a page of products ordered by ``(sort, id)``.
+
+        With ``after`` (the ``(sort value, id)`` of the previous page's last
+        row) the page is read with a keyset condition and ``page`` is
+        ignored. Relationships are loaded only when named in ``include``.
+        ``filters`` are described in :meth:`_filtered`.
+        """
+
+        stmt = self._select_page(select(Product), count, page, after, sort, filters)
+        result = await self.db.execute(stmt.options(*_loaders(include)))
+        return result.scalars().all()
 
-        stmt = select(func.count(Product.id)).select_from(Product)
+    async def list_columns(
+        self,
+        columns: Sequence[str],
+        count: int = 50,
+        page: int = 1,
+        after: Optional[tuple[Any, UUID]] = None,
+        sort: ProductSort = "name",
+        **filters,
+    ) -> list[Row]:
+        """Return a page of products as rows holding only ``columns``.
+
+        Paging works as in :meth:`list`; ``columns`` must include the sort
+        column and ``id`` when the caller builds cursors from the rows. Row
+        values come in the order of ``columns``.
+        """
+
+        stmt = select(*(getattr(Product, name) for name in columns))
+        stmt = self._select_page(stmt, count, page, after, sort, filters)
+        result = await self.db.execute(stmt)
+        return result.all()
+
+    async def stream_columns(
+        self, columns: Sequence[str], batch_size: int = 1000
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Yield every product as rows holding only ``columns``, in batches.
+
+        Rows come in ``(name, id)`` order from a server-side cursor,
+        ``batch_size`` at a time, and are not tracked by the session.
+        """
+
+        stmt = (
+            select(*(getattr(Product, name) for name in columns))
+            .order_by(Product.name, Product.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await self.db.stream(stmt)
+        async for batch in result.partitions():
+            yield batch
+
+    async def list_with_total(
+        self, count: int = 50, page: int = 1, sort: ProductSort = "name", **filters
+    ) -> tuple[list[Product], Optional[int]]:
+        """Return a page of products and the total in a single query.
+
+        The total comes from ``COUNT(*) OVER ()`` on the page rows, so it is
+        ``None`` when the page is empty (e.g. past the last page).
+        """
+
+        stmt = select(Product, func.count().over().label("total"))
+        stmt = self._select_page(stmt, count, page, None, sort, filters)
+        rows = (await self.db.execute(stmt)).all()
+        if not rows:
+            return [], None
+        return [row[0] for row in rows], int(rows[0][1])
+
+    async def count(self, **filters) -> int:
+        """Return the number of products matching ``filters``."""
+
+        stmt = self._filtered(
+            select(func.count(Product.id)).select_from(Product), filters
+        )
         result = await self.db.execute(stmt)
         return int(result.scalar() or 0)
 
+    def _select_page(
+        self,
+        stmt,
+        count: int,
+        page: int,
+        after: Optional[tuple[Any, UUID]],
+        sort: ProductSort,
+        filters: dict[str, Any],
+    ):
+        """Filter ``stmt``, order it by ``(sort, id)`` and cut one page."""
+
+        column = SORT_COLUMNS[sort.lstrip("-")]
+        descending = sort.startswith("-")
+        stmt = self._filtered(stmt, filters)
+        if descending:
+            stmt = stmt.order_by(column.desc(), Product.id.desc())
+        else:
+            stmt = stmt.order_by(column, Product.id)
+        if after is not None:
+            key, bound = tuple_(column, Product.id), tuple_(*after)
+            stmt = stmt.where(key < bound if descending else key > bound)
+            page = 1
+        if count and count > 0:
+            stmt = stmt.limit(count).offset(max(page - 1, 0) * count)
+        return stmt
+
+    def _filtered(self, stmt, filters: dict[str, Any]):
+        """Apply product filters; ``None`` values are ignored.
+
+        Supported filters: ``min_price``/``max_price`` (inclusive),
+        ``in_stock`` (``stock_quantity > 0``), ``name_prefix``
+        (case-sensitive) and ``updated_since`` (inclusive).
+        """
+
+        if filters.get("min_price") is not None:
+            stmt = stmt.where(Product.price >= filters["min_price"])
+        if filters.get("max_price") is not None:
+            stmt = stmt.where(Product.price <= filters["max_price"])
+        if filters.get("in_stock"):
+            # a literal, not a bound parameter, so the planner can match the
+            # partial index ix_products_in_stock_name_id
+            stmt = stmt.where(Product.stock_quantity > literal_column("0"))
+        if filters.get("name_prefix"):
+            stmt = stmt.where(self._name_starts_with(filters["name_prefix"]))
+        if filters.get("updated_since") is not None:
+            stmt = stmt.where(Product.updated_at >= filters["updated_since"])
+        return stmt
+
+    async def search(
+        self, query: str, count: int = 50, after: Optional[tuple[float, UUID]] = None
+    ) -> list[Row]:
+        """Return ``(Product, score)`` rows matching ``query``, best first.
+
+        Every word of ``query`` must occur in the name or the description,
+        the last one as a prefix (search as you type); name matches rank
+        higher. ``score`` is lower for better matches and pages are read in
+        ``(score, id)`` order: ``after`` continues after such a pair. The
+        lookup goes through the full-text index (products_fts on SQLite,
+        ix_products_search on PostgreSQL), never a ``LIKE`` scan.
+        """
+
+        words = _search_words(query)
+        if not words:
+            return []
+        if self._is_sqlite():
+            match = " ".join(f'"{word}"' for word in words) + "*"
+            score = literal_column(_FTS_SCORE, Float)
+            stmt = (
+                select(Product, score.label("score"))
+                .join(products_fts, products_fts.c.product_id == Product.id)
+                .where(literal_column("products_fts").op("MATCH")(match))
+            )
+        else:
+            document = literal_column(f"({SEARCH_DOCUMENT})")
+            tsquery = func.to_tsquery(
+                literal_column("'simple'"), " & ".join(words) + ":*"
+            )
+            score = -func.ts_rank(document, tsquery, type_=Float)
+            stmt = select(Product, score.label("score")).where(
+                document.op("@@")(tsquery)
+            )
+        if after is not None:
+            stmt = stmt.where(tuple_(score, Product.id) > tuple_(*after))
+        stmt = stmt.order_by(score, Product.id).limit(count)
+        return (await self.db.execute(stmt)).all()
+
+    async def _index(self, product: Product) -> None:
+        """Write ``product`` to the SQLite full-text table products_fts.
+
+        PostgreSQL maintains the expression index ix_products_search itself.
+        """
+
+        if not self._is_sqlite():
+            return
+        rowid = _fts_rowid(product.id)
+        await self.db.execute(delete(products_fts).where(products_fts.c.rowid == rowid))
+        await self.db.execute(
+            insert(products_fts).values(
+                rowid=rowid,
+                product_id=product.id,
+                name=product.name,
+                description=product.description,
+            )
+        )
+
+    def _is_sqlite(self) -> bool:
+        return self.db.bind is not None and self.db.bind.dialect.name == "sqlite"
+
+    def _name_starts_with(self, prefix: str):
+        """Return an index-friendly prefix condition on ``Product.name``.
+
+        SQLite only uses an index for ``LIKE`` with a NOCASE index, while
+        the case-sensitive ``GLOB`` is served by the plain ``(name, id)``
+        index. PostgreSQL answers ``LIKE 'prefix%'`` from the
+        ``text_pattern_ops`` index ix_products_name_pattern.
+        """
+
+        if self._is_sqlite():
+            escaped = "".join(f"[{c}]" if c in "*?[" else c for c in prefix)
+            return Product.name.op("GLOB")(escaped + "*")
+        return Product.name.startswith(prefix, autoescape=True)
+
+    async def estimated_count(self) -> Optional[int]:
+        """Return the planner's estimate of the number of products, if any."""
+
+        return await estimated_row_count(self.db, Product.__tablename__)
+
     async def create(self, data: dict[str, Any]) -> Product:
-        """Create a product and return it."""
+        """Create a product and return it.
+
+        A single ``INSERT ... RETURNING`` sends the row and reads it back
+        (with the values as stored, e.g. prices rounded to the column scale),
+        so no refresh is needed.
+        """
 
-        product = Product(**data)
-        self.db.add(product)
-        await self.db.flush()
-        await self.db.refresh(product)
+        product = await self.db.scalar(
+            insert(Product).values(**data).returning(Product)
+        )
+        await self._index(product)
         return product
 
     async def update(self, product_id: UUID, data: dict[str, Any]) -> Optional[Product]:
-        """Update fields on a product and return it."""
+        """Update fields on a product and return it.
 
-        product = await self.get_by_id(product_id)
-        if not product:
-            return None
+        ``None`` values and unknown keys are skipped. The change is one
+        ``UPDATE ... RETURNING`` that also refreshes the product already in
+        the session; ``None`` is returned when there is no such product.
+        """
 
-        for key, value in data.items():
-            if value is None:
-                continue
-            if hasattr(product, key):
-                setattr(product, key, value)
-
-        await self.db.flush()
-        await self.db.refresh(product)
+        changes = {
+            key: value
+            for key, value in data.items()
+            if value is not None and key in _COLUMNS
+        }
+        if not changes:
+            return await self.get_by_id(product_id)
+        stmt = (
+            update(Product)
+            .where(Product.id == product_id)
+            .values(**changes)
+            .returning(Product)
+            .execution_options(populate_existing=True)
+        )
+        product = await self.db.scalar(stmt)
+        if product is not None:
+            await self._index(product)
         return product
 
+    async def decrement_stock(self, quantities: Mapping[UUID, int]) -> dict[UUID, int]:
+        """Take ``quantities`` (product id -> amount) off the stock at once.
+
+        A single ``UPDATE ... SET stock_quantity = stock_quantity - amount
+        WHERE id IN (...) AND stock_quantity >= amount RETURNING`` handles
+        every line. The condition is evaluated on the locked row, so
+        concurrent orders cannot oversell. Either every line is applied or
+        none: the WHERE clause also requires every product to exist with
+        enough stock, so a rejected order updates (and locks) no row and
+        leaves ``updated_at`` alone. When a concurrent order takes stock
+        between that check and the row lock (PostgreSQL), the partial
+        update is rolled back to a savepoint. :class:`InsufficientStockError`
+        lists the failed lines. Returns the new stock of each product.
+        """
+
+        if not quantities:
+            return {}
+        ids = list(quantities)
+        stocked = aliased(Product)
+        every_line_in_stock = (
+            select(func.count())
+            .where(
+                stocked.id.in_(ids),
+                stocked.stock_quantity >= case(dict(quantities), value=stocked.id),
+            )
+            .scalar_subquery()
+        ) == len(ids)
+        amount = case(dict(quantities), value=Product.id)
+        stmt = (
+            update(Product)
+            .where(
+                Product.id.in_(ids),
+                Product.stock_quantity >= amount,
+                every_line_in_stock,
+            )
+            .values(stock_quantity=Product.stock_quantity - amount)
+            .returning(Product.id, Product.stock_quantity, Product.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        if self._is_sqlite():
+            # writers are serialised: the check and the update see one state
+            rows = (await self.db.execute(stmt)).all()
+        else:
+            async with self.db.begin_nested() as savepoint:
+                rows = (await self.db.execute(stmt)).all()
+                if rows and len(rows) < len(ids):
+                    await savepoint.rollback()
+        if len(rows) < len(ids):
+            # after a partial update, the rows left out lost the race
+            updated = {row.id for row in rows}
+            failed = [pid for pid in ids if pid not in updated] if rows else None
+            raise InsufficientStockError(await self._shortages(quantities, failed))
+        # keep products already loaded in the session in line with the rows
+        for row in rows:
+            product = self.db.identity_map.get(identity_key(Product, row.id))
+            if product is not None:
+                set_committed_value(product, "stock_quantity", row.stock_quantity)
+                set_committed_value(product, "updated_at", row.updated_at)
+        return {row.id: row.stock_quantity for row in rows}
+
+    async def _shortages(
+        self, quantities: Mapping[UUID, int], failed: Optional[list[UUID]] = None
+    ) -> list[StockShortage]:
+        """Return the lines of ``quantities`` the stock cannot cover.
+
+        ``failed`` names the lines a partial update could not apply; by
+        default the lines short of stock now are returned.
+        """
+
+        available = dict(
+            (
+                await self.db.execute(
+                    select(Product.id, Product.stock_quantity).where(
+                        Product.id.in_(list(quantities))
+                    )
+                )
+            ).all()
+        )
+        if failed is None:
+            failed = [
+                pid
+                for pid, qty in quantities.items()
+                if available.get(pid) is None or available[pid] < qty
+            ]
+        return [
+            StockShortage(pid, quantities[pid], available.get(pid)) for pid in failed
+        ]
+
     async def mark_out_of_stock(self, product_id: UUID) -> Optional[Product]:
         """Mark a product as out of stock by setting quantity to zero."""
 
         return await self.update(product_id, {"stock_quantity": 0})
+
+
+def _loaders(include: Sequence[str]) -> list:
+    """Return eager-load options for the relationships in ``include``."""
+
+    return [selectinload(getattr(Product, name)) for name in include]
+
+
+def _search_words(query: str) -> list[str]:
+    """Split a search query into lower-case words.
+
+    Only letters and digits are kept, so the words can be quoted into FTS5
+    and tsquery syntax without escaping.
+    """
+
+    return re.findall(r"[^\W_]+", query.lower())
+
+
+def _fts_rowid(product_id: UUID) -> int:
+    """Return the products_fts rowid of a product.
+
+    FTS5 can only look rows up by an integer rowid; the low 63 bits of the
+    random UUID make a stable one (``products.rowid`` may change on VACUUM).
+    """
+
+    return product_id.int & (2**63 - 1)
@@ -5,14 +5,20 @@ Contains helper methods to query and modify users in the database.
 
 from __future__ import annotations
 
-from typing import Any, Optional
+from datetime import datetime
+from typing import Any, Optional, Sequence
 from uuid import UUID
 
-from sqlalchemy import func, select
+from sqlalchemy import Row, func, insert, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
+from app.database.statistics import estimated_row_count
 from app.models import User
 
+# keys of ``update`` data that are written; anything else is ignored
+_COLUMNS = frozenset(User.__table__.columns.keys())
+
 
 class UserRepository:
     """Repository providing async CRUD helpers for users."""
@@ -25,76 +31,164 @@ class UserRepository:
         """
         self.db = db
 
-    async def get_by_id(self, user_id: UUID) -> Optional[User]:
-        """Return a single user by its UUID or ``None`` if not found."""
+    async def get_by_id(
+        self, user_id: UUID, include: Sequence[str] = ()
+    ) -> Optional[User]:
+        """Return a single user by its UUID or ``None`` if not found.
 
-        return await self.db.get(User, user_id)
+        Relationships named in ``include`` (e.g. ``"orders"``) are loaded
+        with the user; others stay unloaded.
+        """
 
-    async def get_by_filter(self, count: int, page: int, **kwargs) -> list[User]:
+        if not include:
+            return await self.db.get(User, user_id)
+        stmt = select(User).where(User.id == user_id).options(*_loaders(include))
+        result = await self.db.execute(stmt)
+        return result.scalars().first()
+
+    async def get_by_filter(
+        self,
+        count: int,
+        page: int,
+        after: Optional[tuple[datetime, UUID]] = None,
+        include: Sequence[str] = (),
+        **kwargs,
+    ) -> list[User]:
         """Return a page of users filtered by provided keyword arguments.
 
+        Users are ordered by ``(created_at, id)``.
+
         Args:
             count: number of items per page.
-            page: 1-based page index.
+            page: 1-based page index, ignored when ``after`` is given.
+            after: ``(created_at, id)`` of the previous page's last user;
+                the page is then read with a keyset condition.
+            include: relationships to load with the users.
             **kwargs: attributes to filter on (only attributes present on
                 :class:`app.models.user.User` are applied).
         """
 
-        stmt = select(User)
+        stmt = self._paginate(select(User), count, page, after)
+        stmt = self._filtered(stmt, kwargs).options(*_loaders(include))
+        result = await self.db.execute(stmt)
+        return result.scalars().all()
 
-        for key, value in kwargs.items():
-            if value is None:
-                continue
-            if hasattr(User, key):
-                stmt = stmt.where(getattr(User, key) == value)
+    async def get_columns_by_filter(
+        self,
+        columns: Sequence[str],
+        count: int,
+        page: int,
+        after: Optional[tuple[datetime, UUID]] = None,
+        **kwargs,
+    ) -> list[Row]:
+        """Return a filtered page of users as rows holding only ``columns``.
+
+        Arguments work as in :meth:`get_by_filter`; only the listed columns
+        are read and the rows are not added to the session.
+        """
 
-        if count and count > 0:
-            offset = max(page - 1, 0) * count
-            stmt = stmt.limit(count).offset(offset)
+        stmt = select(*(getattr(User, name) for name in columns))
+        stmt = self._paginate(stmt, count, page, after)
+        result = await self.db.execute(self._filtered(stmt, kwargs))
+        return result.all()
 
-        result = await self.db.execute(stmt)
-        return result.scalars().all()
+    @staticmethod
+    def _paginate(stmt, count: int, page: int, after: Optional[tuple[datetime, UUID]]):
+        """Order ``stmt`` by ``(created_at, id)`` and restrict it to one page."""
+
+        stmt = stmt.order_by(User.created_at, User.id)
+        if after is not None:
+            stmt = stmt.where(tuple_(User.created_at, User.id) > tuple_(*after))
+            page = 1
+        if count and count > 0:
+            stmt = stmt.limit(count).offset(max(page - 1, 0) * count)
+        return stmt
 
     async def count(self, **kwargs) -> int:
         """Return number of users that match provided filters."""
 
         # Explicitly count a user column so pylint recognizes callable usage
         # pylint: disable=not-callable
-        stmt = select(func.count(User.id)).select_from(User)
+        stmt = self._filtered(select(func.count(User.id)).select_from(User), kwargs)
+
+        result = await self.db.execute(stmt)
+        return result.scalar() or 0
+
+    async def get_by_filter_with_total(
+        self, count: int, page: int, **kwargs
+    ) -> tuple[list[User], Optional[int]]:
+        """Return a filtered page of users and the total in a single query.
+
+        The total comes from ``COUNT(*) OVER ()`` on the page rows, so it is
+        ``None`` when the page is empty (e.g. past the last page).
+        """
 
-        for key, value in kwargs.items():
+        # pylint: disable=not-callable
+        stmt = self._filtered(
+            select(User, func.count().over().label("total")), kwargs
+        ).order_by(User.created_at, User.id)
+        stmt = stmt.limit(count).offset(max(page - 1, 0) * count)
+        rows = (await self.db.execute(stmt)).all()
+        if not rows:
+            return [], None
+        return [row[0] for row in rows], int(rows[0][1])
+
+    async def estimated_count(self) -> Optional[int]:
+        """Return the planner's estimate of the number of users, if any."""
+
+        return await estimated_row_count(self.db, User.__tablename__)
+
+    @staticmethod
+    def _filtered(stmt, filters: dict[str, Any]):
+        """Apply equality filters for attributes present on the model."""
+
+        for key, value in filters.items():
             if value is None:
                 continue
             if hasattr(User, key):
                 stmt = stmt.where(getattr(User, key) == value)
-
-        result = await self.db.execute(stmt)
-        return result.scalar() or 0
+        return stmt
 
     async def create(self, user_data: dict[str, Any]) -> User:
-        """Create a new user from the provided dict and return it."""
+        """Create a new user from the provided dict and return it.
 
-        user = User(**user_data)
-        self.db.add(user)
+        The row is written and read back by one ``INSERT ... RETURNING``.
+        """
+
+        user = await self.db.scalar(insert(User).values(**user_data).returning(User))
         await self.db.commit()
-        await self.db.refresh(user)
         return user
 
     async def update(self, user_id: UUID, user_data: dict[str, Any]) -> User:
-        """Update an existing user with provided partial data."""
+        """Update an existing user with provided partial data.
 
-        user = await self.get_by_id(user_id)
+        ``None`` values and unknown keys are skipped; the change is a single
+        ``UPDATE ... RETURNING``.
+
+        Raises:
+            ValueError: if there is no user with ``user_id``.
+        """
+
+        changes = {
+            key: value
+            for key, value in user_data.items()
+            if value is not None and key in _COLUMNS
+        }
+        if not changes:
+            user = await self.get_by_id(user_id)
+        else:
+            stmt = (
+                update(User)
+                .where(User.id == user_id)
+                .values(**changes)
+                .returning(User)
+                .execution_options(populate_existing=True)
+            )
+            user = await self.db.scalar(stmt)
         if not user:
             raise ValueError("User not found")
 
-        for key, value in user_data.items():
-            if value is None:
-                continue
-            if hasattr(User, key):
-                setattr(user, key, value)
-
         await self.db.commit()
-        await self.db.refresh(user)
         return user
 
     async def delete(self, user_id: UUID) -> None:
@@ -106,3 +200,9 @@ class UserRepository:
 
         await self.db.delete(user)
         await self.db.commit()
+
+
+def _loaders(include: Sequence[str]) -> list:
+    """Return eager-load options for the relationships in ``include``."""
+
+    return [selectinload(getattr(User, name)) for name in include]
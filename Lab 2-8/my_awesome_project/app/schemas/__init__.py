@@ -1,30 +1,58 @@
 """Package exports for schema models used across the application."""
 
-from .order import OrderItemResponse, OrderListResponse, OrderQueueMessage, OrderResponse
+from .order import (
+    OrderCreateRequest,
+    OrderItemResponse,
+    OrderListResponse,
+    OrderQueueMessage,
+    OrderRequestResponse,
+    OrderResponse,
+    PartialOrderListResponse,
+)
 from .product import (
+    PartialProductListResponse,
     ProductCreate,
     ProductListResponse,
     ProductQueueMessage,
     ProductResponse,
+    ProductSearchResponse,
+    ProductSearchResult,
     ProductUpdate,
+    ProductWithOrderItemsResponse,
 )
 from .report import ReportResponse, ReportRow
-from .user import UserCreate, UserListResponse, UserResponse, UserUpdate
+from .user import (
+    PartialUserListResponse,
+    UserCreate,
+    UserListResponse,
+    UserResponse,
+    UserUpdate,
+    UserWithOrdersResponse,
+)
 
 __all__ = [
     "UserCreate",
     "UserUpdate",
     "UserResponse",
     "UserListResponse",
+    "UserWithOrdersResponse",
+    "PartialUserListResponse",
     "ProductCreate",
     "ProductUpdate",
     "ProductResponse",
     "ProductListResponse",
+    "ProductWithOrderItemsResponse",
+    "PartialProductListResponse",
+    "ProductSearchResult",
+    "ProductSearchResponse",
     "ProductQueueMessage",
     "OrderResponse",
     "OrderItemResponse",
     "OrderListResponse",
+    "PartialOrderListResponse",
     "OrderQueueMessage",
+    "OrderCreateRequest",
+    "OrderRequestResponse",
     "ReportRow",
     "ReportResponse",
 ]
@@ -4,7 +4,7 @@ from __future__ import annotations
 
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import Any, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, Field
@@ -24,6 +24,29 @@ class OrderQueueMessage(BaseModel):
     address_id: Optional[UUID] = None
     items: Optional[list[OrderItemPayload]] = None
     status: Optional[str] = None
+    # set for orders submitted with POST /orders (see OrderRequest)
+    idempotency_key: Optional[str] = None
+
+
+class OrderCreateRequest(BaseModel):
+    """Body of ``POST /orders``."""
+
+    user_id: UUID
+    address_id: UUID
+    items: list[OrderItemPayload] = Field(..., min_length=1)
+
+
+class OrderRequestResponse(BaseModel):
+    """State of an order submitted with an ``Idempotency-Key``."""
+
+    key: str
+    status: str
+    order_id: Optional[UUID] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    model_config = {"from_attributes": True}
 
 
 class OrderItemResponse(BaseModel):
@@ -50,4 +73,15 @@ class OrderResponse(BaseModel):
 
 class OrderListResponse(BaseModel):
     orders: list[OrderResponse]
-    total: int
+    # None when the client passed include_total=false
+    total: Optional[int] = None
+    # cursor for the next page (keyset pagination), None on the last page
+    next_cursor: Optional[str] = None
+
+
+class PartialOrderListResponse(BaseModel):
+    """Orders reduced to the columns requested with ``fields=`` (no items)."""
+
+    orders: list[dict[str, Any]]
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
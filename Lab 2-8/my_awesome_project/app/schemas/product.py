@@ -4,10 +4,12 @@ from __future__ import annotations
 
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import Any, Optional
 from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, SerializeAsAny
+
+from .order import OrderItemResponse
 
 
 class ProductBase(BaseModel):
@@ -40,9 +42,40 @@ class ProductResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class ProductWithOrderItemsResponse(ProductResponse):
+    """Product returned with ``include=order_items``."""
+
+    order_items: list[OrderItemResponse] = Field(default_factory=list)
+
+
 class ProductListResponse(BaseModel):
-    products: list[ProductResponse]
-    total: int
+    # SerializeAsAny keeps the fields of ProductWithOrderItemsResponse items
+    products: list[SerializeAsAny[ProductResponse]]
+    # None when the client passed include_total=false
+    total: Optional[int] = None
+    # cursor for the next page (keyset pagination), None on the last page
+    next_cursor: Optional[str] = None
+
+
+class PartialProductListResponse(BaseModel):
+    """Products reduced to the fields requested with ``fields=``."""
+
+    products: list[dict[str, Any]]
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+
+class ProductSearchResult(ProductResponse):
+    """Product matched by ``/products/search``."""
+
+    # lower is better; results are ordered by (score, id)
+    score: float
+
+
+class ProductSearchResponse(BaseModel):
+    products: list[ProductSearchResult]
+    # cursor for the next page of results, None on the last page
+    next_cursor: Optional[str] = None
 
 
 class ProductQueueMessage(BaseModel):
@@ -0,0 +1,56 @@
+"""msgspec structs for the fast list path.
+
+They mirror the pydantic response models field for field (same names, same
+order, same JSON output) but are built positionally from result rows and
+encoded by msgspec without a validation step. Repositories select the
+columns named in ``__struct_fields__``, in that order.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+from uuid import UUID
+
+import msgspec
+
+
+class ProductStruct(msgspec.Struct, gc=False):
+    id: UUID
+    name: str
+    description: Optional[str]
+    price: Decimal
+    stock_quantity: int
+    created_at: datetime
+    updated_at: Optional[datetime]
+
+
+class ProductListStruct(msgspec.Struct):
+    products: list[ProductStruct]
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+
+class OrderItemStruct(msgspec.Struct, gc=False):
+    id: UUID
+    product_id: UUID
+    quantity: int
+    unit_price: Decimal
+
+
+class OrderStruct(msgspec.Struct):
+    id: UUID
+    user_id: UUID
+    address_id: UUID
+    status: str
+    total_amount: Decimal
+    created_at: datetime
+    updated_at: Optional[datetime]
+    order_items: list[OrderItemStruct] = msgspec.field(default_factory=list)
+
+
+class OrderListStruct(msgspec.Struct):
+    orders: list[OrderStruct]
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
@@ -6,10 +6,12 @@ Contains request/response models used by controllers and services.
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
 from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, SerializeAsAny
+
+from .order import OrderResponse
 
 
 class UserBase(BaseModel):
@@ -47,8 +49,26 @@ class UserResponse(BaseModel):
     }
 
 
+class UserWithOrdersResponse(UserResponse):
+    """User returned with ``include=orders``."""
+
+    orders: list[OrderResponse] = Field(default_factory=list)
+
+
 class UserListResponse(BaseModel):
     """Response model for paginated lists of users."""
 
-    users: list[UserResponse]
-    total: int
+    # SerializeAsAny keeps the fields of UserWithOrdersResponse items
+    users: list[SerializeAsAny[UserResponse]]
+    # None when the client passed include_total=false
+    total: Optional[int] = None
+    # cursor for the next page (keyset pagination), None on the last page
+    next_cursor: Optional[str] = None
+
+
+class PartialUserListResponse(BaseModel):
+    """Paginated users holding only the fields requested with ``fields=``."""
+
+    users: list[dict[str, Any]]
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
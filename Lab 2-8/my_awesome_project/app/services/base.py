@@ -0,0 +1,51 @@
+"""Session handling shared by the service classes."""
+
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+S = TypeVar("S", bound="SessionBoundService")
+T = TypeVar("T")
+
+
+class SessionBoundService:
+    """Base for services that can rebind their repositories to a session.
+
+    Subclasses set ``session_factory`` (``None`` when every read should go
+    through the repositories they were built with) and implement
+    :meth:`_bound_to`.
+    """
+
+    session_factory: Optional[Callable[[], AsyncSession]] = None
+
+    def _bound_to(self: S, session: AsyncSession) -> S:
+        """Return a service reading through ``session`` instead."""
+
+        raise NotImplementedError
+
+    async def _in_own_session(self: S, read: Callable[[S], Awaitable[T]]) -> T:
+        """Run ``read`` on a service bound to a new session, when possible.
+
+        Cache loads are shared by every caller coalesced on the key, so they
+        must not use the request session of whichever caller started them.
+        """
+
+        async with self._own_session() as service:
+            return await read(service)
+
+    @asynccontextmanager
+    async def _own_session(self: S) -> AsyncIterator[S]:
+        """Yield a service bound to a new session, or ``self`` without a factory.
+
+        Also used by streamed exports, whose body is sent after the request
+        session has been closed.
+        """
+
+        if self.session_factory is None:
+            yield self
+            return
+        async with self.session_factory() as session:
+            yield self._bound_to(session)
@@ -11,14 +11,50 @@ order items, validate stock and update product quantities.
 
 from __future__ import annotations
 
-from typing import Any, Iterable
+from datetime import datetime
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, Sequence
+from uuid import UUID
 
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import (
+    cache_ttl,
+    get_or_load,
+    get_or_load_versioned,
+    invalidate_after_commit,
+)
+from app.database.concurrency import gather_reads
+from app.export import (
+    EXPORT_BATCH_SIZE,
+    ExportFormat,
+    csv_chunks,
+    ndjson_chunks,
+)
+from app.pagination import TotalMode, decode_cursor, next_cursor, row_key
+from app.projection import parse_fields
 from app.repositories.order_item_repository import OrderItemRepository
 from app.repositories.order_repository import OrderRepository
-from app.repositories.product_repository import ProductRepository
+from app.repositories.product_repository import (
+    InsufficientStockError,
+    ProductRepository,
+    StockShortage,
+)
+from app.schemas import OrderResponse
+from app.schemas.structs import OrderItemStruct, OrderStruct
+from app.services.base import SessionBoundService
+
+ORDERS_NAMESPACE = "orders"
+PRODUCTS_NAMESPACE = "products"
+LIST_CACHE_TTL = cache_ttl("list", 300)
+ORDER_CACHE_TTL = cache_ttl("order", 600)
+# unknown ids are remembered briefly so repeated misses skip the database
+NEGATIVE_CACHE_TTL = cache_ttl("negative", 30)
+# columns that can be requested with ``fields=`` on the order list
+ORDER_FIELDS = tuple(f for f in OrderResponse.model_fields if f != "order_items")
 
 
-class OrderService:
+class OrderService(SessionBoundService):
     """Service responsible for order creation and related operations."""
 
     def __init__(
@@ -26,28 +62,249 @@ class OrderService:
         product_repository: ProductRepository,
         order_repository: OrderRepository,
         order_item_repository: OrderItemRepository,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
     ):
         self.product_repository = product_repository
         self.order_repository = order_repository
         self.order_item_repository = order_item_repository
+        # used to run independent reads on their own connections
+        self.session_factory = session_factory
+
+    def _bound_to(self, session: AsyncSession) -> OrderService:
+        """Return a service reading through ``session`` instead."""
+
+        return OrderService(
+            ProductRepository(session),
+            OrderRepository(session),
+            OrderItemRepository(session),
+            self.session_factory,
+        )
+
+    async def get_by_id(self, order_id) -> Optional[OrderResponse]:
+        """Return order with its items, cached until the order changes."""
+
+        async def load(service: OrderService) -> Optional[OrderResponse]:
+            order = await service.order_repository.get_by_id(order_id)
+            if order is None:
+                return None
+            return OrderResponse.model_validate(order)
+
+        return await get_or_load(
+            f"order:{order_id}",
+            partial(self._in_own_session, load),
+            ex=ORDER_CACHE_TTL,
+            model=OrderResponse,
+            negative_ttl=NEGATIVE_CACHE_TTL,
+        )
+
+    async def list(self, count: int = 50, page: int = 1) -> list[OrderResponse]:
+        """Return paginated orders, cached until the next order write."""
+
+        async def load(service: OrderService) -> list[OrderResponse]:
+            orders = await service.order_repository.list(count=count, page=page)
+            return [OrderResponse.model_validate(o) for o in orders]
+
+        return await get_or_load_versioned(
+            ORDERS_NAMESPACE,
+            ("page", count, page),
+            partial(self._in_own_session, load),
+            ex=LIST_CACHE_TTL,
+            model=OrderResponse,
+        )
+
+    async def list_after(
+        self, count: int = 50, cursor: Optional[str] = None
+    ) -> list[OrderResponse]:
+        """Return the orders following ``cursor`` (keyset pagination).
+
+        An empty cursor starts from the newest order. Raises
+        :class:`app.pagination.InvalidCursorError` for malformed cursors.
+        """
+
+        after = decode_cursor(cursor, datetime, UUID) if cursor else None
+
+        async def load(service: OrderService) -> list[OrderResponse]:
+            orders = await service.order_repository.list(count=count, after=after)
+            return [OrderResponse.model_validate(o) for o in orders]
+
+        return await get_or_load_versioned(
+            ORDERS_NAMESPACE,
+            ("after", count, cursor or ""),
+            partial(self._in_own_session, load),
+            ex=LIST_CACHE_TTL,
+            model=OrderResponse,
+        )
+
+    @staticmethod
+    def next_cursor(
+        orders: list[OrderResponse] | list[dict[str, Any]], count: int
+    ) -> Optional[str]:
+        """Return the cursor continuing after ``orders``, if any."""
+
+        return next_cursor(orders, count, row_key("created_at", "id"))
+
+    async def list_page(
+        self,
+        count: int = 50,
+        page: int = 1,
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+        total_mode: TotalMode = "exact",
+        fields: Optional[str] = None,
+        fast: bool = False,
+    ) -> tuple[
+        list[OrderResponse] | list[OrderStruct] | list[dict[str, Any]], Optional[int]
+    ]:
+        """Return a page of orders (by ``page`` or ``cursor``) and the total.
+
+        The total is ``None`` unless ``include_total``; see
+        :data:`app.pagination.TotalMode` for the ways it is computed.
+        Window totals are not available for cursor pages and fall back to
+        the exact count there.
+
+        With ``fields`` (comma-separated, see :mod:`app.projection`) only
+        those columns, plus the id and the sort key, are read and the items
+        are plain dicts; such pages are not cached. With ``fast`` (and no
+        ``fields``) rows skip the ORM, pydantic and the page cache and are
+        mapped straight to :mod:`app.schemas.structs` structs.
+        """
 
-    async def get_by_id(self, order_id):
-        """Return order with its items."""
+        columns = parse_fields(fields, ORDER_FIELDS, always=("id", "created_at"))
+        if (
+            include_total
+            and total_mode == "window"
+            and cursor is None
+            and columns is None
+            and not fast
+        ):
+            orders, total = await self.order_repository.list_with_total(
+                count=count, page=page
+            )
+            if total is None:
+                total = await self.count()
+            return [OrderResponse.model_validate(o) for o in orders], total
 
-        return await self.order_repository.get_by_id(order_id)
+        if not include_total:
+            return await self._page(count, page, cursor, columns, fast), None
+        approximate = total_mode == "approx"
+        if self.session_factory is None:
+            orders = await self._page(count, page, cursor, columns, fast)
+            return orders, await self.count(approximate=approximate)
+        # page and count on separate pooled connections: the request waits
+        # for the slower query instead of both
+        orders, total = await gather_reads(
+            self.session_factory,
+            lambda session: self._bound_to(session)._page(
+                count, page, cursor, columns, fast
+            ),
+            lambda session: self._bound_to(session).count(approximate=approximate),
+        )
+        return orders, total
 
-    async def list(self, count: int = 50, page: int = 1):
-        """Return paginated orders."""
+    async def _page(
+        self,
+        count: int,
+        page: int,
+        cursor: Optional[str],
+        columns: Optional[tuple[str, ...]] = None,
+        fast: bool = False,
+    ) -> list[OrderResponse] | list[OrderStruct] | list[dict[str, Any]]:
+        if columns is None and fast:
+            after = decode_cursor(cursor, datetime, UUID) if cursor else None
+            return await self._load_structs(count, page, after)
+        if columns is not None:
+            after = decode_cursor(cursor, datetime, UUID) if cursor else None
+            rows = await self.order_repository.list_columns(
+                columns, count=count, page=page, after=after
+            )
+            return [row._asdict() for row in rows]
+        if cursor is None:
+            return await self.list(count=count, page=page)
+        return await self.list_after(count=count, cursor=cursor)
+
+    async def _load_structs(
+        self, count: int, page: int, after: Optional[tuple[datetime, UUID]]
+    ) -> list[OrderStruct]:
+        # every field but the trailing order_items is a column of orders
+        rows = await self.order_repository.list_columns(
+            OrderStruct.__struct_fields__[:-1], count=count, page=page, after=after
+        )
+        orders = [OrderStruct(*row) for row in rows]
+        by_id = {order.id: order.order_items for order in orders}
+        items = await self.order_repository.list_item_columns(
+            list(by_id), OrderItemStruct.__struct_fields__
+        )
+        for order_id, *values in items:
+            by_id[order_id].append(OrderItemStruct(*values))
+        return orders
+
+    async def count(self, approximate: bool = False) -> int:
+        """Return the number of orders.
+
+        With ``approximate`` the planner estimate is used when the database
+        provides one.
+        """
+
+        if approximate:
+            estimate = await self.order_repository.estimated_count()
+            if estimate is not None:
+                return estimate
+        return await get_or_load_versioned(
+            ORDERS_NAMESPACE,
+            ("count",),
+            partial(
+                self._in_own_session, lambda service: service.order_repository.count()
+            ),
+            ex=LIST_CACHE_TTL,
+        )
 
-        return await self.order_repository.list(count=count, page=page)
+    def export(
+        self,
+        fmt: ExportFormat = "ndjson",
+        fields: Optional[str] = None,
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ) -> AsyncIterator[bytes]:
+        """Return the encoded chunks of an export of every order, newest first.
+
+        NDJSON lines without ``fields`` carry the order items, as in the
+        order responses; CSV and ``fields`` exports hold order columns only.
+        ``fields`` is checked right away, rows are only read while the
+        returned iterator is consumed (see :mod:`app.export`).
+        """
 
-    async def count(self):
-        return await self.order_repository.count()
+        columns = parse_fields(fields, ORDER_FIELDS) or ORDER_FIELDS
+
+        async def batches() -> AsyncIterator[Sequence[Any]]:
+            async with self._own_session() as service:
+                if fmt == "ndjson" and fields is None:
+                    async for orders in _with_items(
+                        service.order_repository.stream_with_items(
+                            OrderStruct.__struct_fields__[:-1],
+                            OrderItemStruct.__struct_fields__,
+                            batch_size,
+                        )
+                    ):
+                        yield orders
+                    return
+                async for rows in service.order_repository.stream_columns(
+                    columns, batch_size
+                ):
+                    yield rows if fmt == "csv" else [row._asdict() for row in rows]
+
+        if fmt == "csv":
+            return csv_chunks(batches(), columns)
+        return ndjson_chunks(batches())
 
     async def update_status(self, order_id, status: str):
         """Update order status."""
 
-        return await self.order_repository.update_status(order_id, status)
+        order = await self.order_repository.update_status(order_id, status)
+        await invalidate_after_commit(
+            getattr(self.order_repository, "db", None),
+            [f"order:{order_id}"],
+            [ORDERS_NAMESPACE],
+        )
+        return order
 
     async def create_order(self, user_id, address_id, items: Iterable[dict[str, Any]]):
         """Create an order and its items after validating stock.
@@ -55,25 +312,51 @@ class OrderService:
         Args:
             user_id: id of user placing the order.
             address_id: id of delivery address.
-            items: iterable of dicts with keys ``product_id`` and ``quantity``.
+            items: iterable of dicts with keys ``product_id`` and ``quantity``;
+                lines repeating a product id are merged into one item.
 
         Returns:
             The created order object as returned by the order repository.
+
+        Raises:
+            InsufficientStockError: some lines exceed the stock; its
+                ``shortages`` name them and no stock was taken.
+            ValueError: a product does not exist.
         """
 
+        # one line per product: quantities of repeated product ids are summed
+        quantities: dict[UUID, int] = {}
+        for it in items or []:
+            product_id = it["product_id"]
+            if not isinstance(product_id, UUID):
+                product_id = UUID(str(product_id))
+            qty = int(it.get("quantity", 1))
+            quantities[product_id] = quantities.get(product_id, 0) + qty
+
         total = 0
-        # собираем продукты и проверяем сток
+        # загружаем все продукты одним запросом и проверяем сток в памяти
+        loaded = await self.product_repository.get_many(list(quantities))
+        found = {p.id: p for p in loaded}
         products = []
-        for it in items or []:
-            product = await self.product_repository.get_by_id(it["product_id"])
+        shortages = []
+        for product_id, qty in quantities.items():
+            product = found.get(product_id)
             if product is None:
-                raise ValueError(f"Product not found: {it['product_id']}")
-            qty = int(it.get("quantity", 1))
-            if getattr(product, "stock_quantity", 0) < qty:
-                raise ValueError(f"Insufficient stock for product {product.id}")
+                raise ValueError(f"Product not found: {product_id}")
+            available = getattr(product, "stock_quantity", 0)
+            if available < qty:
+                shortages.append(StockShortage(product.id, qty, available))
             line_total = float(getattr(product, "price", 0)) * qty
             total += line_total
             products.append((product, qty))
+        if shortages:
+            raise InsufficientStockError(shortages)
+
+        # списываем сток до записи заказа: условный UPDATE — окончательная
+        # проверка при конкурентных заказах
+        await self.product_repository.decrement_stock(
+            {product.id: qty for product, qty in products}
+        )
 
         # создаём заказ
         order_data = {
@@ -83,28 +366,52 @@ class OrderService:
         }
         order = await self.order_repository.create(order_data)
 
-        # уменьшаем сток и создаём позиции
-        for product, qty in products:
-            new_stock = int(product.stock_quantity) - qty
-            product.stock_quantity = new_stock
-            # ожидаем, что репозиторий предоставляет метод для сохранения/обновления продукта
-            if hasattr(self.product_repository, "update"):
-                await self.product_repository.update(
-                    product.id, {"stock_quantity": new_stock}
-                )
-            elif hasattr(self.product_repository, "save"):
-                await self.product_repository.save(product)
-            else:
-                # попытаемся вызвать generic метод set_stock если есть
-                if hasattr(self.product_repository, "set_stock"):
-                    await self.product_repository.set_stock(product.id, new_stock)
-
-            oi_data = {
-                "order_id": order.id,
-                "product_id": product.id,
-                "quantity": qty,
-                "unit_price": product.price,
-            }
-            await self.order_item_repository.create(oi_data)
+        # создаём позиции одним INSERT
+        order_items = await self.order_item_repository.create_many(
+            [
+                {
+                    "order_id": order.id,
+                    "product_id": product.id,
+                    "quantity": qty,
+                    "unit_price": product.price,
+                }
+                for product, qty in products
+            ]
+        )
+        # the new order's collection is not loaded; fill it without a query
+        self.order_repository.attach_items(order, order_items)
 
+        # stock changed as well: drop the cached products and product pages
+        # in one batch once the order is committed
+        await invalidate_after_commit(
+            getattr(self.order_repository, "db", None),
+            [f"order:{order.id}"]
+            + [f"product:{product.id}" for product, _ in products],
+            [ORDERS_NAMESPACE, PRODUCTS_NAMESPACE],
+        )
         return order
+
+
+async def _with_items(
+    batches: AsyncIterator[Sequence[Any]],
+) -> AsyncIterator[list[OrderStruct]]:
+    """Group streamed order/item rows into batches of complete orders.
+
+    The last order of a batch may continue in the next one, so it is held
+    back until a row of another order (or the end of the stream) arrives.
+    """
+
+    width = len(OrderStruct.__struct_fields__) - 1
+    current: Optional[OrderStruct] = None
+    async for rows in batches:
+        orders = []
+        for row in rows:
+            if current is None or current.id != row[0]:
+                if current is not None:
+                    orders.append(current)
+                current = OrderStruct(*row[:width])
+            if row[width] is not None:
+                current.order_items.append(OrderItemStruct(*row[width:]))
+        yield orders
+    if current is not None:
+        yield [current]
@@ -0,0 +1,188 @@
+"""Idempotent order submission for ``POST /orders``.
+
+Every submission carries an ``Idempotency-Key`` that is recorded in
+``order_requests`` with a fingerprint of the body. A retry with the same key
+returns the recorded outcome instead of creating another order, and the
+same key with a different body is rejected.
+
+Orders are created within the request by default. When the client prefers
+an asynchronous answer and a queue publisher is configured, the request is
+recorded as ``queued``, published to the ``order`` queue and acknowledged
+at once; the worker then creates the order with :meth:`process`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Any, NamedTuple, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from app.broker import Publisher
+from app.cache import flush_invalidation
+from app.models import OrderRequest
+from app.repositories.order_request_repository import OrderRequestRepository
+from app.schemas import OrderCreateRequest, OrderQueueMessage
+from app.services.order_service import OrderService
+
+# the only foreign keys an order can break once its products were found
+UNKNOWN_REFERENCE = "Unknown user_id or address_id"
+
+
+class IdempotencyKeyReusedError(ValueError):
+    """The Idempotency-Key was already used for a different order."""
+
+
+class OrderRequestFailedError(ValueError):
+    """The order recorded under the Idempotency-Key could not be created."""
+
+
+class OrderQueueUnavailableError(RuntimeError):
+    """The order could not be published to the queue; nothing was recorded."""
+
+
+class Submission(NamedTuple):
+    """Outcome of :meth:`OrderSubmissionService.submit`."""
+
+    request: OrderRequest
+    # the created order (ORM object or cached response); None while queued
+    order: Optional[Any]
+    # True when the key was seen before and nothing new was done
+    replayed: bool
+
+
+class OrderSubmissionService:
+    """Creates or enqueues orders at most once per Idempotency-Key."""
+
+    def __init__(
+        self,
+        order_service: OrderService,
+        order_request_repository: OrderRequestRepository,
+        publisher: Optional[Publisher] = None,
+    ):
+        self.order_service = order_service
+        self.order_request_repository = order_request_repository
+        self.publisher = publisher
+
+    @property
+    def db(self):
+        return self.order_request_repository.db
+
+    async def submit(
+        self, key: str, data: OrderCreateRequest, respond_async: bool = False
+    ) -> Submission:
+        """Create (or enqueue) the order in ``data`` unless ``key`` was used.
+
+        With ``respond_async`` and a publisher the order is queued and
+        ``Submission.order`` is ``None``; without a publisher the order is
+        created right away.
+
+        Raises:
+            IdempotencyKeyReusedError: ``key`` was used with another body.
+            OrderRequestFailedError: the order under ``key`` failed.
+            OrderQueueUnavailableError: publishing failed; retry later.
+            ValueError: the order is invalid (see
+                :meth:`OrderService.create_order`); nothing was recorded.
+        """
+
+        fingerprint = _fingerprint(data)
+        existing = await self.order_request_repository.get(key)
+        if existing is not None:
+            return await self._replay(existing, fingerprint)
+        try:
+            if respond_async and self.publisher is not None:
+                return await self._enqueue(key, fingerprint, data)
+            return await self._create(key, fingerprint, data)
+        except IntegrityError as exc:
+            # a concurrent request with the same key won, or a bad reference
+            await self.db.rollback()
+            existing = await self.order_request_repository.get(key)
+            if existing is None:
+                raise ValueError(UNKNOWN_REFERENCE) from exc
+            return await self._replay(existing, fingerprint)
+
+    async def process(self, message: OrderQueueMessage):
+        """Create an order taken from the queue, at most once per key.
+
+        Returns the order, or ``None`` when the request was already handled
+        (e.g. a redelivered message). An invalid order is recorded as
+        ``failed`` and the error re-raised; other errors leave the request
+        ``queued`` so a redelivery can retry it.
+        """
+
+        key = message.idempotency_key
+        if await self.order_request_repository.claim(key) is None:
+            return None
+        items = [
+            {"product_id": item.product_id, "quantity": item.quantity}
+            for item in message.items or []
+        ]
+        try:
+            order = await self.order_service.create_order(
+                message.user_id, message.address_id, items
+            )
+            await self.order_request_repository.complete(key, order.id)
+            await self._commit()
+        except (ValueError, IntegrityError) as exc:
+            await self.db.rollback()
+            error = UNKNOWN_REFERENCE if isinstance(exc, IntegrityError) else str(exc)
+            await self.order_request_repository.fail(key, error)
+            await self._commit()
+            raise
+        return order
+
+    async def _commit(self) -> None:
+        # the cache is invalidated before the outcome is returned
+        await self.db.commit()
+        await flush_invalidation(self.db)
+
+    async def _create(
+        self, key: str, fingerprint: str, data: OrderCreateRequest
+    ) -> Submission:
+        # the key is inserted first: a concurrent duplicate blocks on it
+        # before taking any stock
+        await self.order_request_repository.create(key, fingerprint, "processing")
+        order = await self.order_service.create_order(
+            data.user_id, data.address_id, [item.model_dump() for item in data.items]
+        )
+        request = await self.order_request_repository.complete(key, order.id)
+        await self._commit()
+        return Submission(request, order, replayed=False)
+
+    async def _enqueue(
+        self, key: str, fingerprint: str, data: OrderCreateRequest
+    ) -> Submission:
+        # committed before publishing so the worker always finds the record
+        request = await self.order_request_repository.create(key, fingerprint, "queued")
+        await self._commit()
+        message = OrderQueueMessage(
+            action="create",
+            user_id=data.user_id,
+            address_id=data.address_id,
+            items=data.items,
+            idempotency_key=key,
+        )
+        try:
+            await self.publisher.publish(message)
+        except Exception as exc:
+            # nothing will process the request: forget it so a retry can
+            await self.order_request_repository.delete(key)
+            await self._commit()
+            raise OrderQueueUnavailableError("Order queue is unavailable") from exc
+        return Submission(request, None, replayed=False)
+
+    async def _replay(self, request: OrderRequest, fingerprint: str) -> Submission:
+        if request.fingerprint != fingerprint:
+            raise IdempotencyKeyReusedError(
+                "Idempotency-Key was already used for a different order"
+            )
+        if request.status == "failed":
+            raise OrderRequestFailedError(request.error or "Order was not created")
+        order = None
+        if request.status == "completed":
+            order = await self.order_service.get_by_id(request.order_id)
+        return Submission(request, order, replayed=True)
+
+
+def _fingerprint(data: OrderCreateRequest) -> str:
+    return hashlib.sha256(data.model_dump_json().encode()).hexdigest()
@@ -2,68 +2,447 @@
 
 from __future__ import annotations
 
-from typing import Any, Optional
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Optional, Sequence
 from uuid import UUID
 
-from app.repositories.product_repository import ProductRepository
-from app.cache import get_cached, set_cached, delete_cached
-from app.schemas import ProductResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import (
+    cache_ttl,
+    filter_key,
+    get_or_load,
+    get_or_load_versioned,
+    invalidate_after_commit,
+    set_many,
+)
+from app.database.concurrency import gather_reads
+from app.export import (
+    EXPORT_BATCH_SIZE,
+    ExportFormat,
+    csv_chunks,
+    ndjson_chunks,
+)
+from app.pagination import TotalMode, decode_cursor, next_cursor, row_key
+from app.projection import InvalidFieldsError, parse_fields, parse_include
+from app.repositories.product_repository import (
+    SORT_TYPES,
+    ProductRepository,
+    ProductSort,
+)
+from app.schemas import (
+    ProductResponse,
+    ProductSearchResult,
+    ProductWithOrderItemsResponse,
+)
+from app.schemas.structs import ProductStruct
+from app.services.base import SessionBoundService
 
-class ProductService:
+PRODUCTS_NAMESPACE = "products"
+# single products are served from cache for PRODUCT_CACHE_TTL seconds; after
+# PRODUCT_STALE_AFTER they are refreshed in the background when possible
+PRODUCT_CACHE_TTL = cache_ttl("product", 1800)
+PRODUCT_STALE_AFTER = cache_ttl("product_stale", 600)
+# unknown ids are remembered briefly so repeated misses skip the database
+NEGATIVE_CACHE_TTL = cache_ttl("negative", 30)
+# list pages are also invalidated on every write, the TTL only bounds memory
+LIST_CACHE_TTL = cache_ttl("list", 300)
+# fields that can be requested with ``fields=`` on list endpoints
+PRODUCT_FIELDS = tuple(ProductResponse.model_fields)
+# relationships that can be requested with ``include=``
+PRODUCT_INCLUDES = ("order_items",)
+
+
+class ProductService(SessionBoundService):
     """High-level operations for products."""
 
-    def __init__(self, product_repository: ProductRepository):
+    def __init__(
+        self,
+        product_repository: ProductRepository,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+    ):
         self.product_repository = product_repository
+        # used to refresh stale cache entries outside of the request session
+        self.session_factory = session_factory
+
+    async def get_by_id(
+        self, product_id: UUID, include: Optional[str] = None
+    ) -> Optional[ProductResponse]:
+        """Return the product response, loading it once per key on a miss.
 
-    async def get_by_id(self, product_id: UUID):
-        cache_key = f"product:{product_id}"
-        cached = await get_cached(cache_key)
-        if cached is not None:
-            return cached
+        Entries older than ``PRODUCT_STALE_AFTER`` are still returned and
+        refreshed in the background when a session factory is configured.
+        ``include=order_items`` reads the product and its order items from
+        the database, bypassing the cache.
+        """
 
-        product = await self.product_repository.get_by_id(product_id)
+        relations = parse_include(include, PRODUCT_INCLUDES)
+        if relations:
+            product = await self.product_repository.get_by_id(
+                product_id, include=relations
+            )
+            if product is None:
+                return None
+            return ProductWithOrderItemsResponse.model_validate(product)
+
+        loader = partial(self._load, self.product_repository, product_id)
+        refresher = None
+        if self.session_factory is not None:
+            # the load is shared by coalesced callers: it uses its own session
+            loader = refresher = partial(self._refresh, product_id)
+        return await get_or_load(
+            f"product:{product_id}",
+            loader,
+            ex=PRODUCT_CACHE_TTL,
+            model=ProductResponse,
+            stale_after=PRODUCT_STALE_AFTER,
+            refresher=refresher,
+            negative_ttl=NEGATIVE_CACHE_TTL,
+        )
+
+    @staticmethod
+    async def _load(
+        repository: ProductRepository, product_id: UUID
+    ) -> Optional[ProductResponse]:
+        product = await repository.get_by_id(product_id)
         if product is None:
             return None
+        return ProductResponse.model_validate(product)
 
-        try:
-            payload = ProductResponse.model_validate(product).model_dump()
-            await set_cached(cache_key, payload, ex=600)
-        except Exception:
-            pass
-        return product
+    async def _refresh(self, product_id: UUID) -> Optional[ProductResponse]:
+        async with self.session_factory() as session:
+            return await self._load(ProductRepository(session), product_id)
+
+    def _bound_to(self, session: AsyncSession) -> ProductService:
+        """Return a service reading through ``session`` instead."""
+
+        return ProductService(ProductRepository(session), self.session_factory)
+
+    async def list(
+        self, count: int = 50, page: int = 1, sort: ProductSort = "name", **filters
+    ) -> list[ProductResponse]:
+        """Return a page of products, cached until the next product write.
 
-    async def list(self, count: int = 50, page: int = 1):
-        products = await self.product_repository.list(count=count, page=page)
-        # cache individual products for faster subsequent single-item lookup
+        ``sort`` and ``filters`` are passed to :meth:`ProductRepository.list`.
+        """
+
+        return await get_or_load_versioned(
+            PRODUCTS_NAMESPACE,
+            ("page", count, page, sort, filter_key(filters)),
+            partial(
+                self._in_own_session,
+                lambda service: service._load_page(
+                    count, page, sort=sort, filters=filters
+                ),
+            ),
+            ex=LIST_CACHE_TTL,
+            model=ProductResponse,
+        )
+
+    async def list_after(
+        self,
+        count: int = 50,
+        cursor: Optional[str] = None,
+        sort: ProductSort = "name",
+        **filters,
+    ) -> list[ProductResponse]:
+        """Return the page following ``cursor`` (keyset pagination).
+
+        An empty cursor starts from the first product. Raises
+        :class:`app.pagination.InvalidCursorError` for malformed cursors or
+        cursors issued for another ``sort``.
+        """
+
+        after = _decode_after(cursor, sort)
+        return await get_or_load_versioned(
+            PRODUCTS_NAMESPACE,
+            ("after", count, cursor or "", sort, filter_key(filters)),
+            partial(
+                self._in_own_session,
+                lambda service: service._load_page(
+                    count, after=after, sort=sort, filters=filters
+                ),
+            ),
+            ex=LIST_CACHE_TTL,
+            model=ProductResponse,
+        )
+
+    @staticmethod
+    def next_cursor(
+        products: list[ProductResponse] | list[dict[str, Any]],
+        count: int,
+        sort: ProductSort = "name",
+    ) -> Optional[str]:
+        """Return the cursor continuing after ``products``, if any."""
+
+        return next_cursor(products, count, row_key(sort.lstrip("-"), "id"))
+
+    async def _load_page(
+        self,
+        count: int,
+        page: int = 1,
+        after: Optional[tuple[Any, UUID]] = None,
+        sort: ProductSort = "name",
+        filters: Optional[dict[str, Any]] = None,
+    ) -> list[ProductResponse]:
+        products = await self.product_repository.list(
+            count=count, page=page, after=after, sort=sort, **(filters or {})
+        )
+        responses = [ProductResponse.model_validate(p) for p in products]
+        # cache individual products for faster subsequent single-item lookup;
+        # the whole page goes to Redis in one pipelined round trip
         try:
-            for p in products:
-                try:
-                    cache_key = f"product:{p.id}"
-                    payload = ProductResponse.model_validate(p).model_dump()
-                    await set_cached(cache_key, payload, ex=600)
-                except Exception:
-                    continue
+            await set_many(
+                {f"product:{p.id}": p for p in responses},
+                ex=PRODUCT_CACHE_TTL,
+                stale_after=PRODUCT_STALE_AFTER,
+            )
         except Exception:
             pass
-        return products
+        return responses
+
+    async def list_page(
+        self,
+        count: int = 50,
+        page: int = 1,
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+        total_mode: TotalMode = "exact",
+        fields: Optional[str] = None,
+        fast: bool = False,
+        include: Optional[str] = None,
+        sort: ProductSort = "name",
+        **filters,
+    ) -> tuple[
+        list[ProductResponse] | list[ProductStruct] | list[dict[str, Any]],
+        Optional[int],
+    ]:
+        """Return a page of products (by ``page`` or ``cursor``) and the total.
+
+        The total is ``None`` unless ``include_total``; see
+        :data:`app.pagination.TotalMode` for the ways it is computed.
+        Window totals are not available for cursor pages and fall back to
+        the exact count there.
+
+        With ``fields`` (comma-separated, see :mod:`app.projection`) only
+        those columns, plus the id and the sort key, are read and the items
+        are plain dicts; such pages are not cached. With ``fast`` (and no
+        ``fields``) rows skip the ORM, pydantic and the page cache and are
+        mapped straight to :mod:`app.schemas.structs` structs.
+        ``include=order_items`` adds each product's order items (uncached).
+
+        Pages are ordered by ``sort`` and narrowed by ``filters`` (see
+        :meth:`ProductRepository.list`); the total counts filtered products.
+        """
 
-    async def count(self) -> int:
-        return await self.product_repository.count()
+        columns = parse_fields(fields, PRODUCT_FIELDS, always=("id", sort.lstrip("-")))
+        relations = parse_include(include, PRODUCT_INCLUDES)
+        if relations and (columns is not None or fast):
+            raise InvalidFieldsError("include cannot be combined with fields or fast")
+        if (
+            include_total
+            and total_mode == "window"
+            and cursor is None
+            and columns is None
+            and not (fast or relations)
+        ):
+            products, total = await self.product_repository.list_with_total(
+                count=count, page=page, sort=sort, **filters
+            )
+            if total is None:
+                total = await self.count(**filters)
+            return [ProductResponse.model_validate(p) for p in products], total
+
+        read_page = partial(
+            ProductService._page,
+            count=count,
+            page=page,
+            cursor=cursor,
+            columns=columns,
+            fast=fast,
+            relations=relations,
+            sort=sort,
+            filters=filters,
+        )
+        if not include_total:
+            return await read_page(self), None
+        approximate = total_mode == "approx"
+        if self.session_factory is None:
+            products = await read_page(self)
+            return products, await self.count(approximate=approximate, **filters)
+        # page and count on separate pooled connections: the request waits
+        # for the slower query instead of both
+        products, total = await gather_reads(
+            self.session_factory,
+            lambda session: read_page(self._bound_to(session)),
+            lambda session: self._bound_to(session).count(
+                approximate=approximate, **filters
+            ),
+        )
+        return products, total
+
+    async def _page(
+        self,
+        count: int,
+        page: int,
+        cursor: Optional[str],
+        columns: Optional[tuple[str, ...]] = None,
+        fast: bool = False,
+        relations: tuple[str, ...] = (),
+        sort: ProductSort = "name",
+        filters: Optional[dict[str, Any]] = None,
+    ) -> list[ProductResponse] | list[ProductStruct] | list[dict[str, Any]]:
+        filters = filters or {}
+        if columns is None and not fast and not relations:
+            if cursor is None:
+                return await self.list(count=count, page=page, sort=sort, **filters)
+            return await self.list_after(
+                count=count, cursor=cursor, sort=sort, **filters
+            )
+
+        # the other shapes are read straight from the database
+        after = _decode_after(cursor, sort)
+        if columns is not None:
+            rows = await self.product_repository.list_columns(
+                columns, count=count, page=page, after=after, sort=sort, **filters
+            )
+            return [row._asdict() for row in rows]
+        if fast:
+            return await self._load_structs(count, page, after, sort, filters)
+        products = await self.product_repository.list(
+            count=count,
+            page=page,
+            after=after,
+            include=relations,
+            sort=sort,
+            **filters,
+        )
+        return [ProductWithOrderItemsResponse.model_validate(p) for p in products]
+
+    async def _load_structs(
+        self,
+        count: int,
+        page: int,
+        after: Optional[tuple[Any, UUID]],
+        sort: ProductSort = "name",
+        filters: Optional[dict[str, Any]] = None,
+    ) -> list[ProductStruct]:
+        rows = await self.product_repository.list_columns(
+            ProductStruct.__struct_fields__,
+            count=count,
+            page=page,
+            after=after,
+            sort=sort,
+            **(filters or {}),
+        )
+        return [ProductStruct(*row) for row in rows]
+
+    async def count(self, approximate: bool = False, **filters) -> int:
+        """Return the number of products matching ``filters``.
+
+        With ``approximate`` (and no filters) the planner estimate is used
+        when the database provides one.
+        """
+
+        key = filter_key(filters)
+        if approximate and not key:
+            estimate = await self.product_repository.estimated_count()
+            if estimate is not None:
+                return estimate
+        return await get_or_load_versioned(
+            PRODUCTS_NAMESPACE,
+            ("count", key) if key else ("count",),
+            partial(
+                self._in_own_session,
+                lambda service: service.product_repository.count(**filters),
+            ),
+            ex=LIST_CACHE_TTL,
+        )
+
+    async def search(
+        self, query: str, count: int = 50, cursor: Optional[str] = None
+    ) -> tuple[list[ProductSearchResult], Optional[str]]:
+        """Return products matching ``query``, best first, and the next cursor.
+
+        See :meth:`ProductRepository.search` for the matching rules. Results
+        are read from the full-text index on every call, not from the cache.
+        """
+
+        after = decode_cursor(cursor, float, UUID) if cursor else None
+        rows = await self.product_repository.search(query, count=count, after=after)
+        results = [
+            ProductSearchResult(
+                **ProductResponse.model_validate(product).model_dump(), score=score
+            )
+            for product, score in rows
+        ]
+        return results, next_cursor(results, count, row_key("score", "id"))
+
+    def export(
+        self,
+        fmt: ExportFormat = "ndjson",
+        fields: Optional[str] = None,
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ) -> AsyncIterator[bytes]:
+        """Return the encoded chunks of an export of every product.
+
+        ``fields`` selects columns as on the list endpoint and is checked
+        right away (:class:`InvalidFieldsError`); rows are only read while
+        the returned iterator is consumed, see :mod:`app.export`.
+        """
+
+        columns = parse_fields(fields, PRODUCT_FIELDS) or PRODUCT_FIELDS
+
+        async def batches() -> AsyncIterator[Sequence[Any]]:
+            async with self._own_session() as service:
+                async for rows in service.product_repository.stream_columns(
+                    columns, batch_size
+                ):
+                    if fmt == "csv":
+                        yield rows
+                    elif columns == ProductStruct.__struct_fields__:
+                        yield [ProductStruct(*row) for row in rows]
+                    else:
+                        yield [row._asdict() for row in rows]
+
+        if fmt == "csv":
+            return csv_chunks(batches(), columns)
+        return ndjson_chunks(batches())
 
     async def create_product(self, product_data: dict[str, Any]):
-        return await self.product_repository.create(product_data)
+        product = await self.product_repository.create(product_data)
+        # drop a possible "not found" entry for this id once it is committed
+        await invalidate_after_commit(
+            getattr(self.product_repository, "db", None),
+            [f"product:{product.id}"],
+            [PRODUCTS_NAMESPACE],
+        )
+        return product
 
     async def update_product(self, product_id: UUID, data: dict[str, Any]):
         product = await self.product_repository.update(product_id, data)
-        # update cache entry for this product
-        try:
-            cache_key = f"product:{product_id}"
-            payload = ProductResponse.model_validate(product).model_dump()
-            await set_cached(cache_key, payload, ex=600)
-        except Exception:
-            pass
+        # nothing is cached before the commit: a rollback must not leave the
+        # uncommitted row behind, and readers must not re-cache the old one
+        await invalidate_after_commit(
+            getattr(self.product_repository, "db", None),
+            [f"product:{product_id}"],
+            [PRODUCTS_NAMESPACE],
+        )
         return product
 
     async def mark_out_of_stock(self, product_id: UUID):
-        return await self.product_repository.mark_out_of_stock(product_id)
+        product = await self.product_repository.mark_out_of_stock(product_id)
+        await invalidate_after_commit(
+            getattr(self.product_repository, "db", None),
+            [f"product:{product_id}"],
+            [PRODUCTS_NAMESPACE],
+        )
+        return product
+
+
+def _decode_after(cursor: Optional[str], sort: ProductSort) -> Optional[tuple]:
+    """Decode a ``(sort value, id)`` cursor for ``sort``."""
+
+    if not cursor:
+        return None
+    return decode_cursor(cursor, SORT_TYPES[sort.lstrip("-")], UUID)
@@ -7,52 +7,253 @@ business rules or transactional coordination in one place.
 
 from __future__ import annotations
 
-from typing import Any, Optional
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Optional
 from uuid import UUID
 
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import (
+    bump_namespace,
+    cache_ttl,
+    delete_cached,
+    filter_key,
+    get_or_load,
+    get_or_load_versioned,
+    set_cached,
+)
+from app.database.concurrency import gather_reads
 from app.models import User
+from app.pagination import TotalMode, decode_cursor, next_cursor, row_key
+from app.projection import InvalidFieldsError, parse_fields, parse_include
 from app.repositories.user_repository import UserRepository
-from app.cache import get_cached, set_cached, delete_cached
-from app.schemas import UserResponse
+from app.schemas import UserResponse, UserWithOrdersResponse
+from app.services.base import SessionBoundService
+
+USERS_NAMESPACE = "users"
+LIST_CACHE_TTL = cache_ttl("list", 300)
+# single users are served from cache for USER_CACHE_TTL seconds; after
+# USER_STALE_AFTER they are refreshed in the background when possible
+USER_CACHE_TTL = cache_ttl("user", 7200)
+USER_STALE_AFTER = cache_ttl("user_stale", 3600)
+# unknown ids are remembered briefly so repeated misses skip the database;
+# creating a user overwrites the entry with the real payload
+NEGATIVE_CACHE_TTL = cache_ttl("negative", 30)
+# fields that can be requested with ``fields=`` on the user list
+USER_FIELDS = tuple(UserResponse.model_fields)
+# relationships that can be requested with ``include=``
+USER_INCLUDES = ("orders",)
 
 
-class UserService:
+class UserService(SessionBoundService):
     """Facade over user repository exposing high-level user operations."""
 
-    def __init__(self, user_repository: UserRepository):
+    def __init__(
+        self,
+        user_repository: UserRepository,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+    ):
         self.user_repository = user_repository
+        # used to refresh stale cache entries outside of the request session
+        self.session_factory = session_factory
+
+    def _bound_to(self, session: AsyncSession) -> UserService:
+        """Return a service reading through ``session`` instead."""
+
+        return UserService(UserRepository(session), self.session_factory)
+
+    async def get_by_id(
+        self, user_id: UUID, include: Optional[str] = None
+    ) -> Optional[UserResponse]:
+        """Return a user response by id or ``None`` when not found.
 
-    async def get_by_id(self, user_id: UUID) -> Optional[User]:
-        """Return a user by id or ``None`` when not found."""
-        cache_key = f"user:{user_id}"
-        cached = await get_cached(cache_key)
-        if cached is not None:
-            return cached
+        Concurrent cache misses for the same id share a single repository
+        load. After 1 hour the cached entry is stale: it is still returned
+        while a background task reloads it through a fresh session.
+        ``include=orders`` loads the user with orders from the database
+        instead.
+        """
 
-        user = await self.user_repository.get_by_id(user_id)
+        relations = parse_include(include, USER_INCLUDES)
+        if relations:
+            user = await self.user_repository.get_by_id(user_id, include=relations)
+            if user is None:
+                return None
+            return UserWithOrdersResponse.model_validate(user)
+
+        loader = partial(self._load, self.user_repository, user_id)
+        refresher = None
+        if self.session_factory is not None:
+            # the load is shared by coalesced callers: it uses its own session
+            loader = refresher = partial(self._refresh, user_id)
+        return await get_or_load(
+            f"user:{user_id}",
+            loader,
+            ex=USER_CACHE_TTL,
+            model=UserResponse,
+            stale_after=USER_STALE_AFTER,
+            refresher=refresher,
+            negative_ttl=NEGATIVE_CACHE_TTL,
+        )
+
+    @staticmethod
+    async def _load(
+        repository: UserRepository, user_id: UUID
+    ) -> Optional[UserResponse]:
+        user = await repository.get_by_id(user_id)
         if user is None:
             return None
+        return UserResponse.model_validate(user)
 
-        # serialise to dict via pydantic and store in cache for 1 hour
-        try:
-            payload = UserResponse.model_validate(user).model_dump()
-            await set_cached(cache_key, payload, ex=3600)
-        except Exception:
-            # if serialisation fails, skip caching
-            pass
-        return user
+    async def _refresh(self, user_id: UUID) -> Optional[UserResponse]:
+        async with self.session_factory() as session:
+            return await self._load(UserRepository(session), user_id)
+
+    async def get_by_filter(
+        self, count: int, page: int, cursor: Optional[str] = None, **kwargs
+    ) -> list[UserResponse]:
+        """Return paginated users matching provided filters.
 
-    async def get_by_filter(self, count: int, page: int, **kwargs) -> list[User]:
-        """Return paginated users matching provided filters."""
+        With ``cursor`` (``""`` for the first page) the page is read with
+        keyset pagination and ``page`` is ignored; malformed cursors raise
+        :class:`app.pagination.InvalidCursorError`. Pages are cached under
+        the ``users`` namespace and dropped on the next user write.
+        """
 
-        return await self.user_repository.get_by_filter(
-            count=count, page=page, **kwargs
+        after = decode_cursor(cursor, datetime, UUID) if cursor else None
+
+        async def load(service: UserService) -> list[UserResponse]:
+            users = await service.user_repository.get_by_filter(
+                count=count, page=page, after=after, **kwargs
+            )
+            return [UserResponse.model_validate(u) for u in users]
+
+        if cursor is None:
+            parts = ("page", count, page, filter_key(kwargs))
+        else:
+            parts = ("after", count, cursor, filter_key(kwargs))
+        return await get_or_load_versioned(
+            USERS_NAMESPACE,
+            parts,
+            partial(self._in_own_session, load),
+            ex=LIST_CACHE_TTL,
+            model=UserResponse,
         )
 
-    async def count(self, **kwargs) -> int:
-        """Return number of users matching provided filters."""
+    @staticmethod
+    def next_cursor(
+        users: list[UserResponse] | list[dict[str, Any]], count: int
+    ) -> Optional[str]:
+        """Return the cursor continuing after ``users``, if any."""
+
+        return next_cursor(users, count, row_key("created_at", "id"))
+
+    async def list_page(
+        self,
+        count: int = 50,
+        page: int = 1,
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+        total_mode: TotalMode = "exact",
+        fields: Optional[str] = None,
+        include: Optional[str] = None,
+        **kwargs,
+    ) -> tuple[list[UserResponse] | list[dict[str, Any]], Optional[int]]:
+        """Return a filtered page of users and the total.
 
-        return await self.user_repository.count(**kwargs)
+        The total is ``None`` unless ``include_total``; see
+        :data:`app.pagination.TotalMode` for the ways it is computed.
+        Window totals are not available for cursor pages and fall back to
+        the exact count there.
+
+        With ``fields`` (comma-separated, see :mod:`app.projection`) only
+        those columns, plus the id and the sort key, are read and the items
+        are plain dicts; such pages are not cached. ``include=orders`` adds
+        each user's orders, also uncached.
+        """
+
+        columns = parse_fields(fields, USER_FIELDS, always=("id", "created_at"))
+        relations = parse_include(include, USER_INCLUDES)
+        if relations and columns is not None:
+            raise InvalidFieldsError("include cannot be combined with fields")
+        if (
+            include_total
+            and total_mode == "window"
+            and cursor is None
+            and columns is None
+            and not relations
+        ):
+            users, total = await self.user_repository.get_by_filter_with_total(
+                count=count, page=page, **kwargs
+            )
+            if total is None:
+                total = await self.count(**kwargs)
+            return [UserResponse.model_validate(u) for u in users], total
+
+        approximate = total_mode == "approx"
+        if not include_total or self.session_factory is None:
+            users = await self._page(count, page, cursor, columns, relations, **kwargs)
+            if not include_total:
+                return users, None
+            return users, await self.count(approximate=approximate, **kwargs)
+        # page and count on separate pooled connections: the request waits
+        # for the slower query instead of both
+        users, total = await gather_reads(
+            self.session_factory,
+            lambda session: self._bound_to(session)._page(
+                count, page, cursor, columns, relations, **kwargs
+            ),
+            lambda session: self._bound_to(session).count(
+                approximate=approximate, **kwargs
+            ),
+        )
+        return users, total
+
+    async def _page(
+        self,
+        count: int,
+        page: int,
+        cursor: Optional[str],
+        columns: Optional[tuple[str, ...]] = None,
+        relations: tuple[str, ...] = (),
+        **kwargs,
+    ) -> list[UserResponse] | list[dict[str, Any]]:
+        if columns is None and not relations:
+            return await self.get_by_filter(count, page, cursor, **kwargs)
+
+        # the other shapes are read straight from the database
+        after = decode_cursor(cursor, datetime, UUID) if cursor else None
+        if relations:
+            users = await self.user_repository.get_by_filter(
+                count, page, after=after, include=relations, **kwargs
+            )
+            return [UserWithOrdersResponse.model_validate(u) for u in users]
+        rows = await self.user_repository.get_columns_by_filter(
+            columns, count, page, after=after, **kwargs
+        )
+        return [row._asdict() for row in rows]
+
+    async def count(self, approximate: bool = False, **kwargs) -> int:
+        """Return number of users matching provided filters.
+
+        With ``approximate`` and no filters the planner estimate is used
+        when the database provides one.
+        """
+
+        if approximate and all(v is None for v in kwargs.values()):
+            estimate = await self.user_repository.estimated_count()
+            if estimate is not None:
+                return estimate
+        return await get_or_load_versioned(
+            USERS_NAMESPACE,
+            ("count", filter_key(kwargs)),
+            partial(
+                self._in_own_session,
+                lambda service: service.user_repository.count(**kwargs),
+            ),
+            ex=LIST_CACHE_TTL,
+        )
 
     async def create(self, user_data: dict[str, Any]) -> User:
         """Create and return a new user from `user_data`."""
@@ -60,10 +261,13 @@ class UserService:
         # populate cache for the created user
         try:
             cache_key = f"user:{user.id}"
-            payload = UserResponse.model_validate(user).model_dump()
-            await set_cached(cache_key, payload, ex=3600)
+            payload = UserResponse.model_validate(user)
+            await set_cached(
+                cache_key, payload, ex=USER_CACHE_TTL, stale_after=USER_STALE_AFTER
+            )
         except Exception:
             pass
+        await self._invalidate_lists()
         return user
 
     async def update(self, user_id: UUID, user_data: dict[str, Any]) -> User:
@@ -75,6 +279,7 @@ class UserService:
             await delete_cached(cache_key)
         except Exception:
             pass
+        await self._invalidate_lists()
         return user
 
     async def delete(self, user_id: UUID) -> None:
@@ -85,3 +290,12 @@ class UserService:
             await delete_cached(cache_key)
         except Exception:
             pass
+        await self._invalidate_lists()
+
+    async def _invalidate_lists(self) -> None:
+        """Drop every cached user page and count in one step."""
+
+        try:
+            await bump_namespace(USERS_NAMESPACE)
+        except Exception:
+            pass
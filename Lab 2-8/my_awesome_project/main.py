@@ -3,16 +3,20 @@ from __future__ import annotations
 import os
 from typing import AsyncIterator
 
+from app.broker import close_publishers, get_order_publisher
+from app.controllers.metrics_controller import MetricsController
 from app.controllers.order_controller import OrderController
 from app.controllers.product_controller import ProductController
 from app.controllers.report_controller import ReportController
 from app.controllers.user_controller import UserController
 from app.repositories.order_item_repository import OrderItemRepository
 from app.repositories.order_repository import OrderRepository
+from app.repositories.order_request_repository import OrderRequestRepository
 from app.repositories.report_repository import ReportRepository
 from app.repositories.product_repository import ProductRepository
 from app.repositories.user_repository import UserRepository
 from app.services.order_service import OrderService
+from app.services.order_submission_service import OrderSubmissionService
 from app.services.product_service import ProductService
 from app.services.report_service import ReportService
 from app.services.user_service import UserService
@@ -60,7 +64,7 @@ async def provide_user_repository(db_session: AsyncSession) -> UserRepository:
 
 async def provide_user_service(user_repository: UserRepository) -> UserService:
     """Провайдер сервиса пользователей"""
-    return UserService(user_repository)
+    return UserService(user_repository, async_session_factory)
 
 
 async def provide_product_repository(db_session: AsyncSession) -> ProductRepository:
@@ -77,6 +81,12 @@ async def provide_order_item_repository(
     return OrderItemRepository(db_session)
 
 
+async def provide_order_request_repository(
+    db_session: AsyncSession,
+) -> OrderRequestRepository:
+    return OrderRequestRepository(db_session)
+
+
 async def provide_report_repository(db_session: AsyncSession) -> ReportRepository:
     return ReportRepository(db_session)
 
@@ -84,7 +94,7 @@ async def provide_report_repository(db_session: AsyncSession) -> ReportRepositor
 async def provide_product_service(
     product_repository: ProductRepository,
 ) -> ProductService:
-    return ProductService(product_repository)
+    return ProductService(product_repository, async_session_factory)
 
 
 async def provide_order_service(
@@ -92,7 +102,21 @@ async def provide_order_service(
     order_repository: OrderRepository,
     order_item_repository: OrderItemRepository,
 ) -> OrderService:
-    return OrderService(product_repository, order_repository, order_item_repository)
+    return OrderService(
+        product_repository,
+        order_repository,
+        order_item_repository,
+        async_session_factory,
+    )
+
+
+async def provide_order_submission_service(
+    order_service: OrderService,
+    order_request_repository: OrderRequestRepository,
+) -> OrderSubmissionService:
+    return OrderSubmissionService(
+        order_service, order_request_repository, get_order_publisher()
+    )
 
 
 async def provide_report_service(
@@ -102,7 +126,13 @@ async def provide_report_service(
 
 
 app = Litestar(
-    route_handlers=[UserController, ProductController, OrderController, ReportController],
+    route_handlers=[
+        UserController,
+        ProductController,
+        OrderController,
+        ReportController,
+        MetricsController,
+    ],
     dependencies={
         "db_session": Provide(provide_db_session),
         "user_repository": Provide(provide_user_repository),
@@ -112,9 +142,12 @@ app = Litestar(
         "order_repository": Provide(provide_order_repository),
         "order_item_repository": Provide(provide_order_item_repository),
         "order_service": Provide(provide_order_service),
+        "order_request_repository": Provide(provide_order_request_repository),
+        "order_submission_service": Provide(provide_order_submission_service),
         "report_repository": Provide(provide_report_repository),
         "report_service": Provide(provide_report_service),
     },
+    on_shutdown=[close_publishers],
     debug=True,
 )
 
@@ -0,0 +1,74 @@
+"""Micro-benchmark for the cache codecs in :mod:`app.cache`.
+
+Compares the historical path (``json.dumps(default=str)`` on write,
+``json.loads`` + ``ProductResponse.model_validate`` on read) with the
+codecs used by the cache today.
+
+Usage:
+    ./.venv/bin/python scripts/bench_cache_codec.py [iterations]
+"""
+
+from __future__ import annotations
+
+import json
+import pathlib
+import sys
+import timeit
+from datetime import datetime
+from decimal import Decimal
+from uuid import uuid4
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from app.cache import JsonCodec, MsgpackCodec
+from app.schemas import ProductResponse
+
+PRODUCT = ProductResponse(
+    id=uuid4(),
+    name="Benchmark product",
+    description="A reasonably sized description " * 4,
+    price=Decimal("1234.50"),
+    stock_quantity=42,
+    created_at=datetime.now(),
+    updated_at=datetime.now(),
+)
+
+
+def legacy_roundtrip() -> ProductResponse:
+    raw = json.dumps(PRODUCT.model_dump(), default=str)
+    return ProductResponse.model_validate(json.loads(raw))
+
+
+def codec_roundtrip(codec) -> ProductResponse:
+    return codec.decode(codec.encode(PRODUCT), ProductResponse)
+
+
+def main() -> None:
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    json_codec, msgpack_codec = JsonCodec(), MsgpackCodec()
+    legacy_raw = json.dumps(PRODUCT.model_dump(), default=str)
+    msgpack_raw = msgpack_codec.encode(PRODUCT)
+
+    cases = {
+        "legacy json encode": lambda: json.dumps(PRODUCT.model_dump(), default=str),
+        "legacy json decode+validate": lambda: ProductResponse.model_validate(
+            json.loads(legacy_raw)
+        ),
+        "legacy json roundtrip": legacy_roundtrip,
+        "JsonCodec roundtrip": lambda: codec_roundtrip(json_codec),
+        "MsgpackCodec encode": lambda: msgpack_codec.encode(PRODUCT),
+        "MsgpackCodec decode (typed)": lambda: msgpack_codec.decode(
+            msgpack_raw, ProductResponse
+        ),
+        "MsgpackCodec roundtrip": lambda: codec_roundtrip(msgpack_codec),
+    }
+
+    print(f"payload size: json={len(legacy_raw)}B msgpack={len(msgpack_raw)}B")
+    print(f"{'case':32} {'us/op':>8}")
+    for name, fn in cases.items():
+        seconds = min(timeit.repeat(fn, number=number, repeat=3))
+        print(f"{name:32} {seconds / number * 1e6:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Benchmark list pages: ORM + pydantic path vs. rows straight to structs.
+
+The ORM path is what a list request costs on a cache miss: load entities,
+``model_validate`` every row, wrap the page in the list response and encode
+it the way Litestar's pydantic plugin does (``model_dump(mode="json")`` and
+then msgspec). The fast path is ``list_page(fast=True)``: a column-only
+select mapped to :mod:`app.schemas.structs` and encoded by msgspec in one
+pass. Both run against a throwaway SQLite file.
+
+Usage:
+    ./.venv/bin/python scripts/bench_list_fast_path.py [iterations]
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import pathlib
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+import msgspec
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Address, Base, Order, OrderItem, Product, User
+from app.repositories.order_item_repository import OrderItemRepository
+from app.repositories.order_repository import OrderRepository
+from app.repositories.product_repository import ProductRepository
+from app.schemas import (
+    OrderListResponse,
+    OrderResponse,
+    ProductListResponse,
+    ProductResponse,
+)
+from app.schemas.structs import OrderListStruct, ProductListStruct
+from app.services.order_service import OrderService
+from app.services.product_service import ProductService
+
+ROWS = 1000
+ITEMS_PER_ORDER = 3
+PAGE_SIZES = (50, 1000)
+
+
+def encode_pydantic(response) -> bytes:
+    return msgspec.json.encode(response, enc_hook=lambda m: m.model_dump(mode="json"))
+
+
+async def seed(factory) -> None:
+    async with factory() as session:
+        user = User(username="bench", email="bench@example.com")
+        session.add(user)
+        await session.flush()
+        address = Address(user_id=user.id, street="1", city="Bench", country="B")
+        products = [
+            Product(
+                name=f"Product {i:04}",
+                description="A reasonably sized description " * 8,
+                price=Decimal("19.90"),
+                stock_quantity=100,
+            )
+            for i in range(ROWS)
+        ]
+        session.add(address)
+        session.add_all(products)
+        await session.flush()
+        for i in range(ROWS):
+            order = Order(
+                user_id=user.id, address_id=address.id, total_amount=Decimal("59.70")
+            )
+            session.add(order)
+            await session.flush()
+            session.add_all(
+                OrderItem(
+                    order_id=order.id,
+                    product_id=products[(i + j) % ROWS].id,
+                    quantity=1,
+                    unit_price=Decimal("19.90"),
+                )
+                for j in range(ITEMS_PER_ORDER)
+            )
+        await session.commit()
+
+
+async def products_orm(session: AsyncSession, count: int) -> bytes:
+    products = await ProductRepository(session).list(count=count)
+    items = [ProductResponse.model_validate(p) for p in products]
+    return encode_pydantic(ProductListResponse(products=items, total=None))
+
+
+async def products_fast(session: AsyncSession, count: int) -> bytes:
+    service = ProductService(ProductRepository(session))
+    items, _ = await service.list_page(count=count, include_total=False, fast=True)
+    return msgspec.json.encode(ProductListStruct(products=items))
+
+
+async def orders_orm(session: AsyncSession, count: int) -> bytes:
+    orders = await OrderRepository(session).list(count=count)
+    items = [OrderResponse.model_validate(o) for o in orders]
+    return encode_pydantic(OrderListResponse(orders=items, total=None))
+
+
+async def orders_fast(session: AsyncSession, count: int) -> bytes:
+    service = OrderService(
+        ProductRepository(session),
+        OrderRepository(session),
+        OrderItemRepository(session),
+    )
+    items, _ = await service.list_page(count=count, include_total=False, fast=True)
+    return msgspec.json.encode(OrderListStruct(orders=items))
+
+
+async def measure(factory, fn, count: int, number: int) -> float:
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(number):
+            # a fresh session per request, as in the application
+            async with factory() as session:
+                await fn(session, count)
+        best = min(best, time.perf_counter() - started)
+    return best / number
+
+
+async def main() -> None:
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'b.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        await seed(factory)
+
+        print(f"{'case':28} {'ms/page':>9} {'speedup':>8}")
+        for count in PAGE_SIZES:
+            for name, orm, fast in (
+                ("products", products_orm, products_fast),
+                ("orders", orders_orm, orders_fast),
+            ):
+                slow = await measure(factory, orm, count, number)
+                quick = await measure(factory, fast, count, number)
+                print(f"{name} x{count} orm+pydantic".ljust(28), f"{slow * 1e3:9.2f}")
+                print(
+                    f"{name} x{count} fast".ljust(28),
+                    f"{quick * 1e3:9.2f} {slow / quick:7.1f}x",
+                )
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+"""Benchmark order item insertion: per-item create vs. create_many.
+
+``create`` adds, flushes and refreshes every item (two round trips per
+line); ``create_many`` sends all items of an order as one multi-row
+``INSERT ... RETURNING``. Each measured run inserts the items of one order
+in a fresh session and rolls back, so the table does not grow.
+
+The database defaults to a throwaway SQLite file; pass a URL to measure
+another one, e.g. PostgreSQL (the tables are created if missing and the
+seed rows are removed afterwards).
+
+Usage:
+    ./.venv/bin/python scripts/bench_order_items.py [iterations] [database_url]
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import pathlib
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Address, Base, Order, Product, User
+from app.repositories.order_item_repository import OrderItemRepository
+
+ITEM_COUNTS = (1, 10, 100)
+
+
+async def seed(factory) -> tuple[list, Order]:
+    async with factory() as session:
+        user = User(username="bench_items", email="bench_items@example.com")
+        session.add(user)
+        await session.flush()
+        address = Address(user_id=user.id, street="1", city="Bench", country="B")
+        products = [
+            Product(name=f"Item bench {i:03}", price=Decimal("1.00"), stock_quantity=1)
+            for i in range(max(ITEM_COUNTS))
+        ]
+        session.add(address)
+        session.add_all(products)
+        await session.flush()
+        order = Order(user_id=user.id, address_id=address.id)
+        session.add(order)
+        await session.commit()
+        return products, order
+
+
+async def cleanup(factory, products, order) -> None:
+    async with factory() as session:
+        await session.execute(delete(Order).where(Order.id == order.id))
+        await session.execute(
+            delete(Product).where(Product.id.in_([p.id for p in products]))
+        )
+        await session.execute(delete(Address).where(Address.id == order.address_id))
+        await session.execute(delete(User).where(User.id == order.user_id))
+        await session.commit()
+
+
+async def one_by_one(repository: OrderItemRepository, rows) -> None:
+    for row in rows:
+        await repository.create(row)
+
+
+async def create_many(repository: OrderItemRepository, rows) -> None:
+    await repository.create_many(rows)
+
+
+async def measure(factory, fn, rows, number: int) -> float:
+    best = float("inf")
+    for _ in range(3):
+        elapsed = 0.0
+        for _ in range(number):
+            async with factory() as session:
+                repository = OrderItemRepository(session)
+                started = time.perf_counter()
+                await fn(repository, rows)
+                elapsed += time.perf_counter() - started
+                await session.rollback()
+        best = min(best, elapsed)
+    return best / number
+
+
+async def run(url: str, number: int) -> None:
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    products, order = await seed(factory)
+    try:
+        print(f"{engine.dialect.name}")
+        print(f"{'items':>6} {'create ms':>10} {'create_many ms':>15} {'speedup':>8}")
+        for count in ITEM_COUNTS:
+            rows = [
+                {
+                    "order_id": order.id,
+                    "product_id": product.id,
+                    "quantity": 1,
+                    "unit_price": product.price,
+                }
+                for product in products[:count]
+            ]
+            slow = await measure(factory, one_by_one, rows, number)
+            quick = await measure(factory, create_many, rows, number)
+            print(
+                f"{count:6d} {slow * 1e3:10.2f} {quick * 1e3:15.2f} "
+                f"{slow / quick:7.1f}x"
+            )
+    finally:
+        await cleanup(factory, products, order)
+        await engine.dispose()
+
+
+async def main() -> None:
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    if len(sys.argv) > 2:
+        await run(sys.argv[2], number)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        await run(f"sqlite+aiosqlite:///{os.path.join(tmp, 'b.db')}", number)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
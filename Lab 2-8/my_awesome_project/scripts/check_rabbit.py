@@ -18,12 +18,15 @@ from faststream.rabbit import RabbitBroker
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
+from app.cache import flush_invalidation
 from app.repositories.order_item_repository import OrderItemRepository
 from app.repositories.order_repository import OrderRepository
+from app.repositories.order_request_repository import OrderRequestRepository
 from app.repositories.product_repository import ProductRepository
 from app.schemas.order import OrderQueueMessage
 from app.schemas.product import ProductQueueMessage
 from app.services.order_service import OrderService
+from app.services.order_submission_service import OrderSubmissionService
 from app.services.product_service import ProductService
 
 logging.basicConfig(level=logging.INFO)
@@ -84,6 +87,7 @@ async def subscribe_product(message: ProductQueueMessage) -> None:
                 logger.warning("Unknown product action: %s", message.action)
                 return
             await session.commit()
+            await flush_invalidation(session)
             logger.info("Processed product message action=%s id=%s", action, message.id)
         except Exception:
             await session.rollback()
@@ -102,11 +106,25 @@ async def subscribe_order(message: OrderQueueMessage) -> None:
             if action == "create":
                 if not message.user_id or not message.address_id:
                     raise ValueError("user_id and address_id are required to create order")
-                items = [
-                    {"product_id": item.product_id, "quantity": item.quantity}
-                    for item in message.items or []
-                ]
-                await service.create_order(message.user_id, message.address_id, items)
+                if message.idempotency_key:
+                    # submitted with POST /orders: at most one order per key
+                    submissions = OrderSubmissionService(
+                        service, OrderRequestRepository(session)
+                    )
+                    if await submissions.process(message) is None:
+                        logger.info(
+                            "Skipped order request %s: already processed",
+                            message.idempotency_key,
+                        )
+                        return
+                else:
+                    items = [
+                        {"product_id": item.product_id, "quantity": item.quantity}
+                        for item in message.items or []
+                    ]
+                    await service.create_order(
+                        message.user_id, message.address_id, items
+                    )
             elif action == "update_status":
                 if not message.order_id or not message.status:
                     raise ValueError("order_id and status are required to update status")
@@ -115,6 +133,7 @@ async def subscribe_order(message: OrderQueueMessage) -> None:
                 logger.warning("Unknown order action: %s", message.action)
                 return
             await session.commit()
+            await flush_invalidation(session)
             logger.info("Processed order message action=%s", action)
         except Exception:
             await session.rollback()
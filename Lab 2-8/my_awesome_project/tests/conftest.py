@@ -1,8 +1,13 @@
+from contextlib import contextmanager
+
 import pytest
 import pytest_asyncio
+import app.cache as cache
+from app.cache import MemoryBackend
 from app.models import Base
 from app.repositories.user_repository import UserRepository
 from litestar.testing import TestClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
@@ -42,6 +47,47 @@ async def db_session(async_session_maker, tables) -> AsyncSession:
         yield session
 
 
+@pytest.fixture
+def memory_cache(monkeypatch):
+    """Serve the application cache from memory for the duration of a test."""
+    backend = MemoryBackend()
+    monkeypatch.setattr(cache, "_backend", backend)
+    return backend
+
+
+class CapturedSQL(list):
+    """SQL statements run on the test engine; ``parameters`` holds theirs."""
+
+    def __init__(self):
+        super().__init__()
+        self.parameters = []
+
+
+@pytest.fixture
+def captured_sql(engine):
+    """Return a context manager capturing the SQL executed on ``engine``.
+
+    ``with captured_sql() as statements:`` collects every statement run
+    inside the block, in order.
+    """
+
+    @contextmanager
+    def capture_sql():
+        statements = CapturedSQL()
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+            statements.parameters.append(parameters)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", capture)
+        try:
+            yield statements
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    return capture_sql
+
+
 @pytest.fixture
 def user_repository(db_session):
     return UserRepository(db_session)
@@ -0,0 +1,41 @@
+import asyncio
+from uuid import uuid4
+
+import app.cache as cache
+from app.models import User
+
+
+def test_cache_metrics_endpoint(client, async_session_maker, memory_cache, monkeypatch):
+    """Проверяет, что эндпоинт метрик считает попадания и промахи по префиксам."""
+
+    async def seed():
+        # пользователь создаётся мимо API, чтобы его не было в кеше
+        async with async_session_maker() as session:
+            user = User(username="metrics_user", email="metrics_user@example.com")
+            session.add(user)
+            await session.commit()
+            return user.id
+
+    user_id = asyncio.run(seed())
+    monkeypatch.setattr(cache, "_metrics", cache.CacheMetrics())
+
+    # промах, затем попадание в запись «не найден»
+    missing = uuid4()
+    for _ in range(2):
+        resp = client.get(f"/users/{missing}")
+        assert resp.status_code == 200
+        assert resp.json() is None
+    # промах с загрузкой из БД, затем попадание
+    assert client.get(f"/users/{user_id}").status_code == 200
+    assert client.get(f"/users/{user_id}").status_code == 200
+
+    resp = client.get("/metrics/cache")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert set(data) == {"backend", "circuit", "l1", "prefixes"}
+    assert data["backend"] == "MemoryBackend"
+    assert set(data["prefixes"]) == {"user"}
+    user = data["prefixes"]["user"]
+    assert (user["hits"], user["negative_hits"], user["misses"]) == (2, 1, 2)
+    assert user["hit_ratio"] == 0.5
+    assert user["writes"] == 2
@@ -0,0 +1,204 @@
+import asyncio
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+from sqlalchemy import delete, func, select
+
+import app.broker as broker
+from app.models import Address, Order, OrderItem, OrderRequest, Product, User
+from app.repositories.order_item_repository import OrderItemRepository
+from app.repositories.order_repository import OrderRepository
+from app.repositories.order_request_repository import OrderRequestRepository
+from app.repositories.product_repository import ProductRepository
+from app.schemas import OrderCreateRequest
+from app.services.order_service import OrderService
+from app.services.order_submission_service import OrderSubmissionService
+from app.services.product_service import ProductService
+
+
+class FakePublisher:
+    def __init__(self):
+        self.messages = []
+
+    async def publish(self, message):
+        self.messages.append(message)
+
+
+@pytest.fixture
+def order_body(async_session_maker, request):
+    """Создаёт пользователя, адрес и товар; возвращает тело заказа.
+
+    Созданные заказы удаляются после теста, чтобы не влиять на отчёты.
+    """
+
+    name = request.node.name
+
+    async def seed():
+        async with async_session_maker() as session:
+            user = User(username=name, email=f"{name}@example.com")
+            session.add(user)
+            await session.flush()
+            address = Address(user_id=user.id, street="S", city="C", country="X")
+            product = Product(name=name, price=Decimal("4.00"), stock_quantity=5)
+            session.add_all([address, product])
+            await session.commit()
+            return user.id, {
+                "user_id": str(user.id),
+                "address_id": str(address.id),
+                "items": [{"product_id": str(product.id), "quantity": 2}],
+            }
+
+    async def cleanup(user_id):
+        async with async_session_maker() as session:
+            orders = select(Order.id).where(Order.user_id == user_id)
+            await session.execute(
+                delete(OrderRequest).where(OrderRequest.order_id.in_(orders))
+            )
+            await session.execute(
+                delete(OrderItem).where(OrderItem.order_id.in_(orders))
+            )
+            await session.execute(delete(Order).where(Order.user_id == user_id))
+            await session.commit()
+
+    user_id, body = asyncio.run(seed())
+    yield body
+    asyncio.run(cleanup(user_id))
+
+
+def stock_and_orders(async_session_maker, body):
+    async def run():
+        async with async_session_maker() as session:
+            stock = await session.scalar(
+                select(Product.stock_quantity).where(
+                    Product.id == UUID(body["items"][0]["product_id"])
+                )
+            )
+            orders = await session.scalar(
+                select(func.count(Order.id)).where(
+                    Order.user_id == UUID(body["user_id"])
+                )
+            )
+            return stock, orders
+
+    return asyncio.run(run())
+
+
+def test_create_order_is_idempotent(
+    client, async_session_maker, order_body, memory_cache
+):
+    """Тестирует POST /orders: повтор с тем же ключом не создаёт второй заказ."""
+    body = order_body
+    headers = {"Idempotency-Key": "sync-1"}
+
+    resp = client.post("/orders", json=body, headers=headers)
+    assert resp.status_code == 201
+    order = resp.json()
+    assert resp.headers["location"] == f"/orders/{order['id']}"
+    assert [i["quantity"] for i in order["order_items"]] == [2]
+    assert Decimal(order["total_amount"]) == Decimal("8.00")
+
+    # повтор возвращает тот же заказ
+    resp = client.post("/orders", json=body, headers=headers)
+    assert resp.status_code == 201
+    assert resp.headers["idempotent-replayed"] == "true"
+    assert resp.json()["id"] == order["id"]
+    assert stock_and_orders(async_session_maker, body) == (3, 1)
+
+    # тот же ключ с другим телом отклоняется
+    other = {**body, "items": [{**body["items"][0], "quantity": 1}]}
+    resp = client.post("/orders", json=other, headers=headers)
+    assert resp.status_code == 422
+
+    # ключ обязателен и состоит из символов, допустимых в URL
+    assert client.post("/orders", json=body).status_code == 400
+    resp = client.post("/orders", json=body, headers={"Idempotency-Key": "a/b"})
+    assert resp.status_code == 400
+
+    # нехватка товара — 409, и ключ не запоминается
+    big = {**body, "items": [{**body["items"][0], "quantity": 10}]}
+    resp = client.post("/orders", json=big, headers={"Idempotency-Key": "sync-2"})
+    assert resp.status_code == 409
+    assert client.get("/orders/requests/sync-2").status_code == 404
+
+
+def test_create_order_async_handoff(
+    client, async_session_maker, order_body, memory_cache, monkeypatch
+):
+    """Тестирует Prefer: respond-async — 202, адрес статуса и обработку воркером."""
+    publisher = FakePublisher()
+    monkeypatch.setattr(broker, "_order_publisher", publisher)
+    body = order_body
+    headers = {"Idempotency-Key": "async-1", "Prefer": "respond-async"}
+
+    resp = client.post("/orders", json=body, headers=headers)
+    assert resp.status_code == 202
+    assert resp.headers["preference-applied"] == "respond-async"
+    status_url = resp.headers["location"]
+    assert status_url == "/orders/requests/async-1"
+    assert resp.json()["status"] == "queued"
+    assert client.get(status_url).json()["status"] == "queued"
+
+    # повтор до обработки: снова 202, сообщение не публикуется второй раз
+    resp = client.post("/orders", json=body, headers=headers)
+    assert resp.status_code == 202
+    assert len(publisher.messages) == 1
+    message = publisher.messages[0]
+    assert message.idempotency_key == "async-1"
+
+    # воркер создаёт заказ один раз, даже если сообщение пришло повторно
+    async def process():
+        async with async_session_maker() as session:
+            service = OrderService(
+                ProductRepository(session),
+                OrderRepository(session),
+                OrderItemRepository(session),
+            )
+            submissions = OrderSubmissionService(
+                service, OrderRequestRepository(session)
+            )
+            return await submissions.process(message)
+
+    order = asyncio.run(process())
+    assert order is not None
+    assert asyncio.run(process()) is None
+    assert stock_and_orders(async_session_maker, body) == (3, 1)
+
+    status = client.get(status_url).json()
+    assert status["status"] == "completed"
+    assert status["order_id"] == str(order.id)
+    resp = client.post("/orders", json=body, headers=headers)
+    assert resp.status_code == 201
+    assert resp.json()["id"] == str(order.id)
+
+
+# Тест проверяет, что кеш товара сброшен к моменту, когда submit вернул заказ,
+# а не фоновой задачей после ответа
+@pytest.mark.asyncio
+async def test_submit_invalidates_cache_before_returning(
+    db_session, order_body, memory_cache, monkeypatch
+):
+    delete_many = memory_cache.delete_many
+
+    async def slow_delete_many(keys):
+        # как у Redis: удаление занимает сетевой запрос
+        await asyncio.sleep(0.05)
+        await delete_many(keys)
+
+    monkeypatch.setattr(memory_cache, "delete_many", slow_delete_many)
+    product_id = UUID(order_body["items"][0]["product_id"])
+    products = ProductService(ProductRepository(db_session))
+    assert (await products.get_by_id(product_id)).stock_quantity == 5
+    submissions = OrderSubmissionService(
+        OrderService(
+            ProductRepository(db_session),
+            OrderRepository(db_session),
+            OrderItemRepository(db_session),
+        ),
+        OrderRequestRepository(db_session),
+    )
+
+    await submissions.submit("cached-1", OrderCreateRequest(**order_body))
+
+    assert await memory_cache.get(f"product:{product_id}") is None
+    assert (await products.get_by_id(product_id)).stock_quantity == 3
@@ -48,3 +48,63 @@ def test_list_users_pagination(client):
     data = resp.json()
     assert "users" in data
     assert "total" in data
+
+
+def test_list_users_sparse_fields(client):
+    """Тестирует выбор полей через fields=: остальные колонки не возвращаются."""
+    payload = {
+        "username": "sparse_user",
+        "email": "sparse_user@example.com",
+        "description": "x" * 1000,
+    }
+    assert client.post("/users", json=payload).status_code in (200, 201)
+
+    resp = client.get("/users", params={"fields": "username", "count": 100})
+    assert resp.status_code == 200
+    users = resp.json()["users"]
+    # id и ключ сортировки (created_at) нужны для курсора и добавляются всегда
+    assert all(set(u) == {"id", "created_at", "username"} for u in users)
+    assert "sparse_user" in [u["username"] for u in users]
+
+    resp = client.get("/users", params={"fields": "username", "cursor": "", "count": 1})
+    assert resp.status_code == 200
+    assert resp.json()["next_cursor"]
+
+    resp = client.get("/users", params={"fields": "password"})
+    assert resp.status_code == 400
+
+
+def test_get_user_include(client):
+    """Тестирует параметр include: заказы отдаются только по запросу."""
+    payload = {"username": "include_user", "email": "include_user@example.com"}
+    user_id = client.post("/users", json=payload).json()["id"]
+
+    assert "orders" not in client.get(f"/users/{user_id}").json()
+    resp = client.get(f"/users/{user_id}", params={"include": "orders"})
+    assert resp.status_code == 200
+    assert resp.json()["orders"] == []
+
+    listing = client.get("/users", params={"include": "orders", "count": 100}).json()
+    assert all("orders" in u for u in listing["users"])
+
+    resp = client.get(f"/users/{user_id}", params={"include": "addresses"})
+    assert resp.status_code == 400
+
+
+def test_get_user_etag(client, captured_sql, memory_cache):
+    """Тестирует ETag: 304 из кэша без запросов к БД, новый ETag после изменения."""
+    payload = {"username": "etag_user", "email": "etag_user@example.com"}
+    user_id = client.post("/users", json=payload).json()["id"]
+    etag = client.get(f"/users/{user_id}").headers["etag"]
+
+    with captured_sql() as statements:
+        resp = client.get(f"/users/{user_id}", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.content == b""
+    assert resp.headers["etag"] == etag
+    assert statements == []
+
+    client.put(f"/users/{user_id}", json={**payload, "description": "changed"})
+    resp = client.get(f"/users/{user_id}", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != etag
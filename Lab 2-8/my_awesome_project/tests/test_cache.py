@@ -0,0 +1,356 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import text
+import app.cache as cache
+from app.cache import (
+    CacheUnavailableError,
+    CircuitBreaker,
+    LocalCache,
+    MsgpackCodec,
+    SingleFlight,
+    _decode_entry,
+    _encode,
+    _with_stale_header,
+)
+from app.schemas import ProductResponse
+
+
+# Тест проверяет вытеснение самых давно использованных ключей при переполнении
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" становится самым свежим
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["size"] == 2
+
+
+# Тест проверяет истечение TTL и подсчёт попаданий/промахов
+def test_local_cache_ttl_and_hit_ratio():
+    cache = LocalCache(maxsize=10, ttl=60)
+    cache.set("k", "v", ttl=0.01)
+    assert cache.get("k") == "v"
+    time.sleep(0.02)
+    assert cache.get("k") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["expirations"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+# Тест проверяет явную инвалидацию ключа
+def test_local_cache_invalidate():
+    cache = LocalCache(maxsize=10, ttl=60)
+    cache.set("k", {"id": 1})
+    cache.invalidate("k")
+    cache.invalidate("missing")
+    assert cache.get("k") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+# Тест проверяет, что инвалидации публикуются и без своего L1-кеша
+# (их читают другие процессы), но не при пустом канале
+def test_redis_backend_announces_without_local_cache(monkeypatch):
+    backend = cache.RedisBackend("redis://localhost:6379/0")
+    monkeypatch.setattr(cache, "_local", None)
+
+    pipe = backend.client.pipeline(transaction=False)
+    backend._announce(pipe, ["product:1"])
+    assert len(pipe.command_stack) == 1
+
+    backend.channel = ""
+    pipe = backend.client.pipeline(transaction=False)
+    backend._announce(pipe, ["product:1"])
+    assert pipe.command_stack == []
+
+
+# Тест проверяет, что параллельные промахи по одному ключу выполняют загрузку один раз
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_loads():
+    flight = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"id": 1}
+
+    results = await asyncio.gather(*(flight.do("product:1", load) for _ in range(10)))
+
+    assert calls == 1
+    assert all(r == {"id": 1} for r in results)
+    assert len(flight) == 0
+
+
+# Тест проверяет, что ошибку загрузки получают все ожидающие, а ключ освобождается
+@pytest.mark.asyncio
+async def test_single_flight_propagates_errors():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("db down")
+
+    results = await asyncio.gather(
+        flight.do("user:1", fail), flight.do("user:1", fail), return_exceptions=True
+    )
+    assert all(isinstance(r, ValueError) for r in results)
+
+    async def ok():
+        return 42
+
+    assert await flight.do("user:1", ok) == 42
+
+
+def _product_response():
+    return ProductResponse(
+        id=uuid4(),
+        name="Codec",
+        description=None,
+        price=Decimal("19.90"),
+        stock_quantity=3,
+        created_at=datetime(2025, 1, 2, 3, 4, 5, 678901),
+        updated_at=None,
+    )
+
+
+# Тест проверяет, что msgpack-кодек восстанавливает модель ответа с исходными типами
+def test_msgpack_codec_rehydrates_response_model():
+    codec = MsgpackCodec()
+    product = _product_response()
+
+    raw = codec.encode(product)
+    restored = codec.decode(raw, ProductResponse)
+
+    assert isinstance(restored, ProductResponse)
+    assert restored == product
+    assert isinstance(restored.price, Decimal)
+    # без модели возвращаются обычные структуры
+    assert codec.decode(raw)["name"] == "Codec"
+
+
+# Тест проверяет чтение записей, сохранённых в старом JSON-формате
+def test_msgpack_codec_reads_legacy_json_entries():
+    product = _product_response()
+    legacy = json.dumps(product.model_dump(), default=str)
+
+    restored = MsgpackCodec().decode(legacy.encode(), ProductResponse)
+
+    assert restored == product
+
+
+# Тест проверяет, что запись с мягким TTL хранит момент устаревания рядом со значением
+def test_stale_header_roundtrip():
+    product = _product_response()
+    before = time.time()
+
+    raw = _with_stale_header(_encode(product), 60)
+    value, stale_at = _decode_entry(raw, ProductResponse)
+
+    assert value == product
+    assert before + 60 <= stale_at <= time.time() + 60
+    # записи без мягкого TTL читаются как раньше
+    assert _decode_entry(_encode(product), ProductResponse) == (product, None)
+
+
+# Тест проверяет, что после серии ошибок выключатель пропускает кеш до конца паузы
+@pytest.mark.asyncio
+async def test_circuit_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            async with breaker:
+                raise ConnectionError("redis down")
+    assert breaker.state == "open"
+    with pytest.raises(CacheUnavailableError):
+        async with breaker:
+            pass
+
+    await asyncio.sleep(0.06)
+    assert breaker.state == "half-open"
+    async with breaker:  # пробный запрос проходит и закрывает цепь
+        pass
+    assert breaker.state == "closed"
+
+
+# Тест проверяет работу кеша поверх бэкенда в памяти
+@pytest.mark.asyncio
+async def test_memory_backend_get_or_load(memory_cache):
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        return _product_response()
+
+    first = await cache.get_or_load("product:1", load, ex=60, model=ProductResponse)
+    second = await cache.get_or_load("product:1", load, ex=60, model=ProductResponse)
+    assert calls == 1
+    assert second == first
+
+    await cache.bump_namespace("products")
+    assert await cache.namespace_version("products") == 1
+    await cache.delete_many(["product:1"])
+    assert await cache.get_cached("product:1") is None
+
+
+# Тест проверяет пакетные операции: попадания, промахи и порядок ключей
+@pytest.mark.asyncio
+async def test_batched_operations(monkeypatch, memory_cache):
+    monkeypatch.setattr(cache, "_local", LocalCache(maxsize=10, ttl=60))
+    await cache.set_many({"product:1": 1, "product:2": 2, "product:3": 3}, ex=60)
+    # product:2 читается из бэкенда, остальные — из L1
+    cache._local.invalidate("product:2")
+
+    found = await cache.get_many(
+        ["product:3", "product:9", "product:2", "product:1", "product:3"]
+    )
+    assert list(found.items()) == [("product:3", 3), ("product:2", 2), ("product:1", 1)]
+
+    await cache.delete_many(["product:1", "product:3", "product:9"])
+    assert await cache.get_many(["product:1", "product:2", "product:3"]) == {
+        "product:2": 2
+    }
+    assert await cache.get_many([]) == {}
+
+
+# Тест проверяет stale-while-revalidate: устаревшая запись отдаётся сразу,
+# фоновое обновление запускается один раз и заменяет запись
+@pytest.mark.asyncio
+async def test_stale_entry_is_refreshed_once_in_background(memory_cache):
+    stale = _product_response()
+    fresh = stale.model_copy(update={"stock_quantity": 0})
+    await cache.set_cached("product:1", stale, ex=60, stale_after=0.01)
+    await asyncio.sleep(0.02)
+    release = asyncio.Event()
+    refreshes = 0
+
+    async def load():
+        raise AssertionError("a stale entry must not be loaded synchronously")
+
+    async def refresh():
+        nonlocal refreshes
+        refreshes += 1
+        await release.wait()
+        return fresh
+
+    def read():
+        return cache.get_or_load(
+            "product:1",
+            load,
+            ex=60,
+            model=ProductResponse,
+            stale_after=60,
+            refresher=refresh,
+        )
+
+    assert await asyncio.gather(read(), read(), read()) == [stale, stale, stale]
+    await asyncio.sleep(0)
+    assert refreshes == 1
+
+    release.set()
+    await asyncio.gather(*cache._background_tasks)
+    assert refreshes == 1
+    assert await read() == fresh
+    assert refreshes == 1
+
+
+# Тест проверяет, что пакетная запись хранит мягкий TTL, а L1 не держит запись дольше
+@pytest.mark.asyncio
+async def test_batched_entries_keep_soft_ttl(monkeypatch, memory_cache):
+    monkeypatch.setattr(cache, "_local", LocalCache(maxsize=10, ttl=60))
+    product = _product_response()
+
+    await cache.set_many({"product:1": product}, ex=60, stale_after=0.05)
+    value, stale_at = _decode_entry(
+        await memory_cache.get("product:1"), ProductResponse
+    )
+    assert value == product and stale_at is not None
+
+    cache._local.clear()
+    found = await cache.get_many(["product:1"], model=ProductResponse)
+    assert found == {"product:1": product}
+    assert cache._local.get("product:1") == product
+    await asyncio.sleep(0.06)
+    # устаревшая запись не отдаётся из L1, но остаётся в бэкенде до жёсткого TTL
+    assert cache._local.get("product:1") is None
+    assert await cache.get_many(["product:1"], model=ProductResponse) == found
+
+
+# Тест проверяет, что инвалидация отправляется только после коммита транзакции
+# и выполняется при вызове flush_invalidation, а не фоновой задачей
+@pytest.mark.asyncio
+async def test_invalidate_on_commit(memory_cache, db_session):
+    await cache.set_many({"product:1": 1, "product:2": 2})
+
+    await db_session.execute(text("SELECT 1"))  # открываем транзакцию
+    cache.invalidate_on_commit(db_session, keys=["product:1"])
+    await db_session.rollback()
+    cache.invalidate_on_commit(db_session, keys=["product:2"], namespaces=["products"])
+    assert await cache.get_cached("product:2") == 2  # до коммита ничего не меняется
+
+    await db_session.commit()
+    await cache.flush_invalidation(db_session)
+
+    # ключ из отменённой транзакции остаётся в кеше
+    assert await cache.get_many(["product:1", "product:2"]) == {"product:1": 1}
+    assert await cache.namespace_version("products") == 1
+
+
+# Тест проверяет кеширование отсутствующих сущностей и сброс записи при создании
+@pytest.mark.asyncio
+async def test_negative_entries(memory_cache):
+    calls = 0
+
+    async def load_missing():
+        nonlocal calls
+        calls += 1
+        return None
+
+    for _ in range(3):
+        assert await cache.get_or_load("user:42", load_missing, negative_ttl=30) is None
+    assert calls == 1
+    # отрицательная запись не видна обычным чтениям
+    assert await cache.get_cached("user:42") is None
+    assert await cache.get_many(["user:42"]) == {}
+
+    await cache.set_cached("user:42", {"id": 42})  # сущность создана
+    assert await cache.get_or_load("user:42", load_missing, negative_ttl=30) == {
+        "id": 42
+    }
+    assert calls == 1
+
+
+# Тест проверяет сбор метрик по префиксам ключей
+@pytest.mark.asyncio
+async def test_metrics_per_prefix(monkeypatch, memory_cache):
+    monkeypatch.setattr(cache, "_metrics", cache.CacheMetrics())
+
+    await cache.set_cached("product:1", {"id": 1})
+    await cache.get_cached("product:1")
+    await cache.get_cached("product:2")
+    await cache.get_many(["user:1", "product:1"])
+
+    prefixes = cache.metrics_snapshot()["prefixes"]
+    product = prefixes["product"]
+    assert (product["hits"], product["misses"], product["writes"]) == (2, 1, 1)
+    assert product["hit_ratio"] == 2 / 3
+    assert product["payload_bytes"]["write"]["count"] == 1
+    assert product["latency_seconds"]["get"]["count"] == 2
+    assert prefixes["user"]["misses"] == 1
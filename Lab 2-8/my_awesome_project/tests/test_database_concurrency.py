@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import text
+
+from app.database.concurrency import ReadBudgetExceededError, gather_reads
+
+
+# Тест проверяет, что чтения идут параллельно в отдельных сессиях
+@pytest.mark.asyncio
+async def test_gather_reads_runs_on_separate_sessions(async_session_maker, tables):
+    sessions = []
+
+    async def read(session):
+        sessions.append(session)
+        await asyncio.sleep(0.1)
+        return (await session.execute(text("SELECT 1"))).scalar_one()
+
+    started = time.perf_counter()
+    results = await gather_reads(async_session_maker, read, read)
+
+    assert results == [1, 1]
+    assert sessions[0] is not sessions[1]
+    # время ответа — как у самого медленного запроса, а не сумма
+    assert time.perf_counter() - started < 0.19
+
+
+# Тест проверяет отмену остальных чтений при ошибке и превышении бюджета
+@pytest.mark.asyncio
+async def test_gather_reads_cancels_on_error_and_budget(async_session_maker, tables):
+    cancelled = []
+
+    async def slow(session):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def fail(session):
+        raise ValueError("bad cursor")
+
+    with pytest.raises(ValueError):
+        await gather_reads(async_session_maker, slow, fail)
+    with pytest.raises(ReadBudgetExceededError):
+        await gather_reads(async_session_maker, slow, budget=0.01)
+    assert cancelled == [True, True]
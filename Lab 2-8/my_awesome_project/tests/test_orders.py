@@ -1,8 +1,18 @@
 from datetime import datetime
 from decimal import Decimal
+from uuid import uuid4
 
 import pytest
 from app.models import Address, Order, OrderItem, Product, User
+from app.repositories.order_item_repository import OrderItemRepository
+from app.repositories.order_repository import OrderRepository
+from app.repositories.product_repository import (
+    InsufficientStockError,
+    ProductRepository,
+    StockShortage,
+)
+from app.services.order_service import OrderService
+from sqlalchemy import select
 
 
 @pytest.mark.asyncio
@@ -68,3 +78,177 @@ async def test_create_order_with_multiple_products(db_session):
     await db_session.refresh(order)
     assert len(order.order_items) == 2
     assert order.total_amount == Decimal("40.00")
+
+
+# Тест проверяет, что товары заказа читаются одним запросом, а повторяющиеся
+# товары объединяются в одну позицию
+@pytest.mark.asyncio
+async def test_create_order_loads_products_in_one_query(db_session, captured_sql):
+    user = User(username="bulk_user", email="bulk@example.com")
+    db_session.add(user)
+    await db_session.flush()
+    address = Address(user_id=user.id, street="B", city="C", country="X")
+    p1 = Product(name="Bulk A", price=Decimal("2.00"), stock_quantity=5)
+    p2 = Product(name="Bulk B", price=Decimal("3.00"), stock_quantity=5)
+    db_session.add_all([address, p1, p2])
+    await db_session.commit()
+    db_session.expunge_all()
+
+    service = OrderService(
+        ProductRepository(db_session),
+        OrderRepository(db_session),
+        OrderItemRepository(db_session),
+    )
+    with captured_sql() as statements:
+        order = await service.create_order(
+            user.id,
+            address.id,
+            [
+                {"product_id": p1.id, "quantity": 2},
+                {"product_id": str(p2.id), "quantity": 1},
+                {"product_id": p1.id, "quantity": 3},
+            ],
+        )
+
+    # до создания заказа — ровно одно чтение товаров
+    before_write = statements[
+        : next(i for i, s in enumerate(statements) if s.startswith("INSERT"))
+    ]
+    reads = [s for s in before_write if s.startswith("SELECT")]
+    assert len([s for s in reads if "FROM products" in s]) == 1
+    items = (
+        (
+            await db_session.execute(
+                select(OrderItem).where(OrderItem.order_id == order.id)
+            )
+        )
+        .scalars()
+        .all()
+    )
+    assert sorted((i.product_id, i.quantity) for i in items) == sorted(
+        [(p1.id, 5), (p2.id, 1)]
+    )
+    assert order.total_amount == Decimal("13.00")
+    assert (await db_session.get(Product, p1.id)).stock_quantity == 0
+
+    # 5 + 1 шт. при остатке 5 — ошибка, хотя каждая строка по отдельности проходит
+    with pytest.raises(ValueError):
+        await service.create_order(
+            user.id,
+            address.id,
+            [
+                {"product_id": p2.id, "quantity": 3},
+                {"product_id": p2.id, "quantity": 3},
+            ],
+        )
+
+
+# Тест проверяет атомарное списание: один UPDATE на все строки, при нехватке
+# хотя бы одной строки ни одна строка не меняется (и updated_at тоже),
+# а ошибка называет эти строки
+@pytest.mark.asyncio
+async def test_decrement_stock_is_all_or_nothing(db_session):
+    a = Product(name="Stock A", price=Decimal("1.00"), stock_quantity=5)
+    b = Product(name="Stock B", price=Decimal("1.00"), stock_quantity=1)
+    db_session.add_all([a, b])
+    await db_session.commit()
+    repo = ProductRepository(db_session)
+    unknown = uuid4()
+    updated_at = (a.updated_at, b.updated_at)
+
+    with pytest.raises(InsufficientStockError) as exc_info:
+        await repo.decrement_stock({a.id: 2, b.id: 3, unknown: 1})
+    assert exc_info.value.shortages == [
+        StockShortage(b.id, 3, 1),
+        StockShortage(unknown, 1, None),
+    ]
+    await db_session.commit()
+    await db_session.refresh(a)
+    await db_session.refresh(b)
+    assert (a.stock_quantity, b.stock_quantity) == (5, 1)
+    assert (a.updated_at, b.updated_at) == updated_at
+
+    assert await repo.decrement_stock({a.id: 2, b.id: 1}) == {a.id: 3, b.id: 0}
+    # объекты в сессии обновлены без повторного чтения
+    assert a.stock_quantity == 3 and b.stock_quantity == 0
+
+
+# Тест проверяет, что позиции заказа вставляются одним INSERT без refresh
+@pytest.mark.asyncio
+async def test_create_many_order_items_in_one_statement(db_session, captured_sql):
+    user = User(username="items_user", email="items@example.com")
+    db_session.add(user)
+    await db_session.flush()
+    address = Address(user_id=user.id, street="I", city="C", country="X")
+    product = Product(name="Items", price=Decimal("2.50"))
+    db_session.add_all([address, product])
+    await db_session.flush()
+    order = Order(user_id=user.id, address_id=address.id)
+    db_session.add(order)
+    await db_session.flush()
+
+    rows = [
+        {
+            "order_id": order.id,
+            "product_id": product.id,
+            "quantity": q,
+            "unit_price": product.price,
+        }
+        for q in range(1, 6)
+    ]
+    with captured_sql() as statements:
+        items = await OrderItemRepository(db_session).create_many(rows)
+
+    assert len(statements) == 1 and statements[0].startswith("INSERT")
+    assert [i.quantity for i in items] == [1, 2, 3, 4, 5]
+    assert all(i.id is not None and i.order_id == order.id for i in items)
+    await db_session.commit()
+
+
+# Тест проверяет, что create/update выполняются одним запросом с RETURNING
+@pytest.mark.asyncio
+async def test_repository_writes_use_returning(db_session, captured_sql):
+    user = User(username="returning_user", email="returning@example.com")
+    db_session.add(user)
+    await db_session.flush()
+    address = Address(user_id=user.id, street="R", city="C", country="X")
+    db_session.add(address)
+    await db_session.flush()
+
+    def own(statements):
+        # записи в products_fts (индекс поиска SQLite) не считаем
+        return [s for s in statements if "products_fts" not in s]
+
+    products = ProductRepository(db_session)
+    orders = OrderRepository(db_session)
+    with captured_sql() as created:
+        product = await products.create({"name": "Returning", "price": Decimal("2.5")})
+    created, created_price = own(created), product.price
+    with captured_sql() as product_update:
+        updated = await products.update(product.id, {"price": 3, "name": None})
+    product_update = own(product_update)
+    with captured_sql() as order_create:
+        order = await orders.create({"user_id": user.id, "address_id": address.id})
+    created_status = order.status
+    assert order.order_items == []
+    with captured_sql() as status_update:
+        paid = await orders.update_status(order.id, "paid")
+
+    assert len(created) == 1 and created[0].startswith("INSERT")
+    # значения приходят из RETURNING в том виде, в каком их сохранила БД
+    assert created_price == Decimal("2.50") and product.stock_quantity == 0
+    assert len(product_update) == 1 and product_update[0].startswith("UPDATE")
+    assert updated is product
+    assert product.price == Decimal("3.00") and product.name == "Returning"
+    assert product.updated_at >= product.created_at
+
+    assert len(order_create) == 1 and order_create[0].startswith("INSERT")
+    assert created_status == "pending"
+    # UPDATE и загрузка позиций, без отдельного SELECT заказа
+    assert status_update[0].startswith("UPDATE")
+    assert not any("FROM orders" in s for s in status_update)
+    assert paid is order and order.status == "paid"
+
+    assert await products.update(uuid4(), {"price": 1}) is None
+    assert await orders.update_status(uuid4(), "paid") is None
+    await db_session.commit()
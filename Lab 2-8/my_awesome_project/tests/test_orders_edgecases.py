@@ -4,6 +4,7 @@ import pytest
 from app.models import Address, Order, OrderItem, Product, User
 from app.services.order_service import OrderService
 from sqlalchemy import select
+from sqlalchemy.orm.attributes import set_committed_value
 
 
 @pytest.mark.asyncio
@@ -27,11 +28,14 @@ async def test_create_order_empty_items(db_session):
         async def get_by_id(self, pid):
             return await self.session.get(Product, pid)
 
-        async def update(self, pid, data):
-            obj = await self.session.get(Product, pid)
-            for k, v in data.items():
-                setattr(obj, k, v)
-            self.session.add(obj)
+        async def get_many(self, pids):
+            products = [await self.session.get(Product, pid) for pid in pids]
+            return [p for p in products if p is not None]
+
+        async def decrement_stock(self, quantities):
+            for pid, qty in quantities.items():
+                obj = await self.session.get(Product, pid)
+                obj.stock_quantity -= qty
             await self.session.flush()
 
     class OR:
@@ -44,6 +48,9 @@ async def test_create_order_empty_items(db_session):
             await self.session.flush()
             return o
 
+        def attach_items(self, order, items):
+            set_committed_value(order, "order_items", list(items))
+
     class OIR:
         def __init__(self, session):
             self.session = session
@@ -54,6 +61,9 @@ async def test_create_order_empty_items(db_session):
             await self.session.flush()
             return oi
 
+        async def create_many(self, rows):
+            return [await self.create(row) for row in rows]
+
     svc = OrderService(PR(db_session), OR(db_session), OIR(db_session))
 
     # пустой список товаров => создаст заказ с total 0 и без позиций
@@ -94,11 +104,14 @@ async def test_create_order_insufficient_stock(db_session):
         async def get_by_id(self, pid):
             return await self.session.get(Product, pid)
 
-        async def update(self, pid, data):
-            obj = await self.session.get(Product, pid)
-            for k, v in data.items():
-                setattr(obj, k, v)
-            self.session.add(obj)
+        async def get_many(self, pids):
+            products = [await self.session.get(Product, pid) for pid in pids]
+            return [p for p in products if p is not None]
+
+        async def decrement_stock(self, quantities):
+            for pid, qty in quantities.items():
+                obj = await self.session.get(Product, pid)
+                obj.stock_quantity -= qty
             await self.session.flush()
 
     class OR:
@@ -111,6 +124,9 @@ async def test_create_order_insufficient_stock(db_session):
             await self.session.flush()
             return o
 
+        def attach_items(self, order, items):
+            set_committed_value(order, "order_items", list(items))
+
     class OIR:
         def __init__(self, session):
             self.session = session
@@ -121,6 +137,9 @@ async def test_create_order_insufficient_stock(db_session):
             await self.session.flush()
             return oi
 
+        async def create_many(self, rows):
+            return [await self.create(row) for row in rows]
+
     svc = OrderService(PR(db_session), OR(db_session), OIR(db_session))
 
     # попытаемся заказать 2 штуки при наличии 1 => ожидаем ValueError
@@ -146,6 +165,9 @@ async def test_create_order_product_not_found(db_session):
         async def get_by_id(self, pid):
             return None
 
+        async def get_many(self, pids):
+            return []
+
     class OR:
         async def create(self, data):
             o = Order(**data)
@@ -153,6 +175,9 @@ async def test_create_order_product_not_found(db_session):
             await db_session.flush()
             return o
 
+        def attach_items(self, order, items):
+            set_committed_value(order, "order_items", list(items))
+
     class OIR:
         async def create(self, data):
             oi = OrderItem(**data)
@@ -160,6 +185,9 @@ async def test_create_order_product_not_found(db_session):
             await db_session.flush()
             return oi
 
+        async def create_many(self, rows):
+            return [await self.create(row) for row in rows]
+
     svc = OrderService(PR(), OR(), OIR())
 
     with pytest.raises(ValueError):
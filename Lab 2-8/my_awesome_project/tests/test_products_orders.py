@@ -1,5 +1,14 @@
+import asyncio
+
+import msgspec
 import pytest
+from app.cache import flush_invalidation
 from app.models import Address, Order, OrderItem, Product, User
+from app.repositories.order_item_repository import OrderItemRepository
+from app.repositories.order_repository import OrderRepository
+from app.repositories.product_repository import ProductRepository
+from app.services.order_service import OrderService
+from app.services.product_service import ProductService
 from sqlalchemy import select
 
 
@@ -148,3 +157,199 @@ async def test_get_and_delete_order(db_session):
 
     should_be_none = await db_session.get(Order, order.id)
     assert should_be_none is None
+
+
+async def _cached_prices(service, name, product_id):
+    """Цены товара из закешированного списка и из записи товара."""
+    # запись читается первой: загрузка списка перезаписывает записи товаров
+    product = await service.get_by_id(product_id)
+    listed = await service.list(name_prefix=name)
+    return [float(p.price) for p in listed], float(product.price)
+
+
+# Тест проверяет, что изменение товара попадает в закешированные список и запись
+# после коммита, но не раньше
+@pytest.mark.asyncio
+async def test_update_product_refreshes_cached_list(memory_cache, db_session):
+    service = ProductService(ProductRepository(db_session))
+    product_id = (await service.create_product({"name": "Cached one", "price": 2})).id
+    await db_session.commit()
+    await flush_invalidation(db_session)
+    assert await _cached_prices(service, "Cached one", product_id) == ([2.0], 2.0)
+
+    await service.update_product(product_id, {"price": 3})
+    assert await _cached_prices(service, "Cached one", product_id) == ([2.0], 2.0)
+    await db_session.commit()
+    await flush_invalidation(db_session)
+    assert await _cached_prices(service, "Cached one", product_id) == ([3.0], 3.0)
+
+
+# Тест проверяет, что откат изменения товара не оставляет в кеше
+# незакоммиченных данных
+@pytest.mark.asyncio
+async def test_rolled_back_product_update_keeps_cache(memory_cache, db_session):
+    service = ProductService(ProductRepository(db_session))
+    product_id = (await service.create_product({"name": "Cached two", "price": 2})).id
+    await db_session.commit()
+    await flush_invalidation(db_session)
+    assert await _cached_prices(service, "Cached two", product_id) == ([2.0], 2.0)
+
+    await service.update_product(product_id, {"price": 5})
+    await service.mark_out_of_stock(product_id)
+    await db_session.rollback()
+    await flush_invalidation(db_session)
+    assert await _cached_prices(service, "Cached two", product_id) == ([2.0], 2.0)
+
+
+# Тест проверяет, что быстрый путь (строки -> msgspec) отдаёт тот же JSON, что и ORM-путь
+@pytest.mark.asyncio
+async def test_fast_list_path_matches_orm_path(memory_cache, db_session):
+    user = User(username="fast_user", email="fast_user@example.com")
+    db_session.add(user)
+    await db_session.flush()
+    address = Address(user_id=user.id, street="Fast", city="Town", country="Land")
+    product = Product(name="Fast", description="Long text", price=4.25)
+    db_session.add_all([address, product])
+    await db_session.flush()
+    order = Order(user_id=user.id, address_id=address.id, total_amount=8.5)
+    db_session.add(order)
+    await db_session.flush()
+    db_session.add(
+        OrderItem(order_id=order.id, product_id=product.id, quantity=2, unit_price=4.25)
+    )
+    await db_session.commit()
+    db_session.expire_all()  # ORM-путь должен перечитать order_items из БД
+
+    def as_json(items):
+        return msgspec.json.decode(
+            msgspec.json.encode(
+                items,
+                enc_hook=lambda m: m.model_dump(mode="json"),
+            )
+        )
+
+    products = ProductService(ProductRepository(db_session))
+    orm, _ = await products.list_page(count=100, include_total=False)
+    fast, _ = await products.list_page(count=100, include_total=False, fast=True)
+    assert as_json(fast) == as_json(orm)
+
+    orders = OrderService(
+        ProductRepository(db_session),
+        OrderRepository(db_session),
+        OrderItemRepository(db_session),
+    )
+    orm, _ = await orders.list_page(count=100, include_total=False)
+    fast, _ = await orders.list_page(count=100, include_total=False, fast=True)
+    assert as_json(fast) == as_json(orm)
+    assert any(o.order_items for o in fast)
+
+
+# Тест проверяет потоковый экспорт: NDJSON совпадает со страницей списка,
+# заказы собираются с позициями даже на границе пакетов, CSV — плоский
+@pytest.mark.asyncio
+async def test_streaming_export_matches_list(memory_cache, db_session):
+    user = User(username="export_user", email="export_user@example.com")
+    db_session.add(user)
+    await db_session.flush()
+    address = Address(user_id=user.id, street="Export", city="Town", country="Land")
+    product = Product(name="Export", price=1.5)
+    db_session.add_all([address, product])
+    await db_session.flush()
+    for quantity in (1, 2, 3):
+        order = Order(user_id=user.id, address_id=address.id, total_amount=quantity)
+        db_session.add(order)
+        await db_session.flush()
+        db_session.add_all(
+            OrderItem(
+                order_id=order.id, product_id=product.id, quantity=q, unit_price=1.5
+            )
+            for q in range(quantity)
+        )
+    await db_session.commit()
+
+    async def collect(chunks):
+        return b"".join([chunk async for chunk in chunks])
+
+    products = ProductService(ProductRepository(db_session))
+    body = await collect(products.export("ndjson", batch_size=2))
+    listed, _ = await products.list_page(count=10000, include_total=False, fast=True)
+    assert body == b"".join(msgspec.json.encode(p) + b"\n" for p in listed)
+
+    orders = OrderService(
+        ProductRepository(db_session),
+        OrderRepository(db_session),
+        OrderItemRepository(db_session),
+    )
+
+    def by_item_id(order):
+        # порядок позиций внутри заказа не определён ни в одном из путей
+        order["order_items"].sort(key=lambda item: item["id"])
+        return order
+
+    body = await collect(orders.export("ndjson", batch_size=2))
+    listed, _ = await orders.list_page(count=10000, include_total=False, fast=True)
+    assert [by_item_id(msgspec.json.decode(line)) for line in body.splitlines()] == [
+        by_item_id(msgspec.json.decode(msgspec.json.encode(o))) for o in listed
+    ]
+
+    lines = (await collect(orders.export("csv", fields="total_amount"))).splitlines()
+    assert lines[0] == b"id,total_amount"
+    assert len(lines) == len(listed) + 1
+
+
+def test_export_endpoints(client):
+    resp = client.get("/products/export", params={"format": "csv", "fields": "name"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    assert resp.text.splitlines()[0] == "id,name"
+
+    resp = client.get("/orders/export")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    for line in resp.text.splitlines():
+        assert "order_items" in msgspec.json.decode(line)
+
+    assert client.get("/orders/export", params={"fields": "nope"}).status_code == 400
+
+
+# Тест проверяет, что общая загрузка при промахе кеша идёт через свою сессию
+# и завершается для остальных, даже если первый запрос отменён
+@pytest.mark.asyncio
+async def test_coalesced_load_survives_cancelled_leader(
+    monkeypatch, memory_cache, db_session, async_session_maker
+):
+    product = Product(name="Shared", price=3.00, stock_quantity=4)
+    db_session.add(product)
+    await db_session.commit()
+
+    started, release = asyncio.Event(), asyncio.Event()
+    sessions = []
+    load = ProductService._load
+
+    async def slow_load(repository, product_id):
+        sessions.append(repository.db)
+        started.set()
+        await release.wait()
+        return await load(repository, product_id)
+
+    monkeypatch.setattr(ProductService, "_load", staticmethod(slow_load))
+
+    async def get(session):
+        service = ProductService(ProductRepository(session), async_session_maker)
+        return await service.get_by_id(product.id)
+
+    async with async_session_maker() as leader_session:
+        leader = asyncio.create_task(get(leader_session))
+        await started.wait()
+        follower = asyncio.create_task(get(db_session))
+        await asyncio.sleep(0)
+        leader.cancel()
+    # сессия первого запроса закрыта, пока остальные ещё ждут загрузку
+    release.set()
+
+    assert (await follower).name == "Shared"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert len(sessions) == 1
+    assert sessions[0] is not leader_session
+    assert sessions[0] is not db_session
@@ -1,5 +1,11 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from uuid import UUID
+
 import pytest
 from app.models import Product
+from app.pagination import decode_cursor
+from app.repositories.product_repository import ProductRepository
 from sqlalchemy import func, select
 
 # Тесты проверяют поведение пагинации товаров на уровне БД (limit/offset).
@@ -91,3 +97,151 @@ async def test_products_pagination_total_and_bounds(db_session):
     res = await db_session.execute(stmt)
     items = res.scalars().all()
     assert items == []
+
+
+@pytest.mark.asyncio
+async def test_products_keyset_pagination(db_session):
+    # курсорная пагинация: каждая следующая страница начинается после
+    # пары (name, id) последнего элемента предыдущей страницы
+    names = [f"Keyset {i:02}" for i in range(7)]
+    for n in names:
+        db_session.add(Product(name=n, price=1.0))
+    await db_session.commit()
+
+    repo = ProductRepository(db_session)
+    after = ("Keyset", UUID(int=0))
+    seen = []
+    while True:
+        items = await repo.list(count=3, after=after)
+        matching = [p.name for p in items if p.name.startswith("Keyset ")]
+        seen.extend(matching)
+        if len(items) < 3 or len(matching) < len(items):
+            break
+        after = (items[-1].name, items[-1].id)
+
+    assert seen == names
+
+
+def test_products_cursor_roundtrip_and_invalid_cursor(client):
+    resp = client.get("/products", params={"count": 1, "cursor": ""})
+    assert resp.status_code == 200
+    data = resp.json()
+    if data["products"]:
+        cursor = data["next_cursor"]
+        assert decode_cursor(cursor, str, UUID)[1] == UUID(data["products"][0]["id"])
+
+    resp = client.get("/products", params={"cursor": "not-a-cursor"})
+    assert resp.status_code == 400
+
+
+def test_products_total_modes(client):
+    exact = client.get("/products", params={"count": 2}).json()
+    assert isinstance(exact["total"], int)
+
+    # общее количество можно не считать вовсе
+    resp = client.get("/products", params={"count": 2, "include_total": "false"})
+    assert resp.status_code == 200
+    assert resp.json()["total"] is None
+
+    # оконный COUNT(*) OVER () возвращает ту же страницу и то же количество
+    window = client.get("/products", params={"count": 2, "total_mode": "window"}).json()
+    assert window["total"] == exact["total"]
+    assert [p["id"] for p in window["products"]] == [p["id"] for p in exact["products"]]
+
+    # на SQLite статистики планировщика нет, поэтому approx даёт точное значение
+    approx = client.get("/products", params={"total_mode": "approx"}).json()
+    assert approx["total"] == exact["total"]
+
+    resp = client.get("/products", params={"total_mode": "guess"})
+    assert resp.status_code == 400
+
+
+def test_products_filters_api(client):
+    params = {"sort": "-price", "min_price": "0", "in_stock": "true", "count": 2}
+    data = client.get("/products", params=params).json()
+    prices = [Decimal(p["price"]) for p in data["products"]]
+    assert prices == sorted(prices, reverse=True)
+    if data["next_cursor"]:
+        price, _ = decode_cursor(data["next_cursor"], Decimal, UUID)
+        assert price == prices[-1]
+        resp = client.get("/products", params={**params, "cursor": data["next_cursor"]})
+        assert resp.status_code == 200
+
+    resp = client.get("/products", params={"sort": "stock_quantity"})
+    assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_products_filters_and_sort(db_session):
+    # фильтры по цене, наличию, префиксу имени и дате изменения + сортировка
+    now = datetime.now()
+    for i in range(6):
+        db_session.add(
+            Product(
+                name=f"Filter {i}",
+                price=Decimal(10 * (6 - i)),
+                stock_quantity=i % 2,
+                updated_at=now - timedelta(days=i),
+            )
+        )
+    # символы шаблона GLOB в префиксе не должны работать как шаблон
+    db_session.add(Product(name="Filter* x", price=Decimal(1)))
+    await db_session.commit()
+
+    repo = ProductRepository(db_session)
+    names = lambda items: [p.name for p in items]
+
+    by_price = await repo.list(count=10, sort="price", name_prefix="Filter ")
+    assert names(by_price) == [f"Filter {i}" for i in reversed(range(6))]
+    desc = await repo.list(count=10, sort="-price", name_prefix="Filter ")
+    assert names(desc) == [f"Filter {i}" for i in range(6)]
+
+    ranged = await repo.list(
+        count=10, name_prefix="Filter ", min_price=Decimal(20), max_price=Decimal(40)
+    )
+    assert names(ranged) == ["Filter 2", "Filter 3", "Filter 4"]
+    in_stock = await repo.list(count=10, name_prefix="Filter ", in_stock=True)
+    assert names(in_stock) == ["Filter 1", "Filter 3", "Filter 5"]
+    recent = await repo.list(
+        count=10, name_prefix="Filter ", updated_since=now - timedelta(days=1, hours=1)
+    )
+    assert names(recent) == ["Filter 0", "Filter 1"]
+    assert names(await repo.list(count=10, name_prefix="Filter*")) == ["Filter* x"]
+    assert await repo.count(name_prefix="Filter ", in_stock=True) == 3
+
+    # курсор по (price, id) продолжает страницу в порядке убывания цены
+    first = await repo.list(count=2, sort="-price", name_prefix="Filter ")
+    rest = await repo.list(
+        count=10,
+        sort="-price",
+        name_prefix="Filter ",
+        after=(first[-1].price, first[-1].id),
+    )
+    assert names(first + rest) == names(desc)
+
+
+@pytest.mark.asyncio
+async def test_products_filters_use_indexes(db_session, captured_sql):
+    # план запроса SQLite должен использовать индексы из миграции
+    repo = ProductRepository(db_session)
+    cases = [
+        (
+            dict(sort="price", min_price=Decimal(1), max_price=Decimal(5)),
+            "ix_products_price_id",
+        ),
+        (dict(sort="name", in_stock=True), "ix_products_in_stock_name_id"),
+        (
+            dict(sort="-updated_at", updated_since=datetime(2020, 1, 1)),
+            "ix_products_updated_at_id",
+        ),
+        (dict(sort="name", name_prefix="Filter"), "ix_products_name_id"),
+    ]
+    for params, index in cases:
+        with captured_sql() as statements:
+            await repo.list(count=10, **params)
+        statement, parameters = statements[-1], statements.parameters[-1]
+        conn = await db_session.connection()
+        plan = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        details = " ".join(row[-1] for row in plan)
+        assert index in details, (params, details)
+        assert "USE TEMP B-TREE FOR ORDER BY" not in details
@@ -0,0 +1,84 @@
+import asyncio
+from uuid import UUID
+
+import pytest
+from app.pagination import decode_cursor
+from app.repositories.product_repository import ProductRepository
+
+
+# Тест проверяет поиск: ранжирование, префикс, синхронизацию индекса и курсор
+@pytest.mark.asyncio
+async def test_products_search_ranking_sync_and_paging(db_session):
+    repo = ProductRepository(db_session)
+    in_name = await repo.create(
+        {"name": "Zephyrite lamp", "description": "Desk light", "price": 10}
+    )
+    in_description = await repo.create(
+        {"name": "Desk light", "description": "Made of zephyrite glass", "price": 12}
+    )
+    other = await repo.create({"name": "Plain lamp", "price": 5})
+    await db_session.commit()
+
+    # совпадение в названии выше совпадения в описании; последнее слово — префикс
+    rows = await repo.search("ZEPHYR")
+    assert [row.Product.id for row in rows] == [in_name.id, in_description.id]
+    assert rows[0].score < rows[1].score
+    assert [row.Product.id for row in await repo.search("zephyrite lam")] == [
+        in_name.id
+    ]
+
+    # индекс обновляется вместе с товаром
+    await repo.update(other.id, {"description": "zephyrite shade"})
+    await repo.update(in_name.id, {"name": "Table lamp"})
+    await db_session.commit()
+    ids = {row.Product.id for row in await repo.search("zephyrite")}
+    assert ids == {in_description.id, other.id}
+
+    # вторая страница начинается после пары (score, id)
+    first = await repo.search("zephyrite", count=1)
+    rest = await repo.search("zephyrite", after=(first[0].score, first[0].Product.id))
+    assert {first[0].Product.id, *(row.Product.id for row in rest)} == ids
+
+    # символы синтаксиса FTS в запросе не ломают поиск
+    assert await repo.search('"*(:-') == []
+
+
+@pytest.mark.asyncio
+async def test_products_search_uses_fts_index(db_session, captured_sql):
+    with captured_sql() as statements:
+        await ProductRepository(db_session).search("lamp")
+    statement, parameters = statements[-1], statements.parameters[-1]
+    assert "LIKE" not in statement
+    conn = await db_session.connection()
+    plan = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+    details = " ".join(row[-1] for row in plan)
+    # поиск идёт по виртуальной таблице FTS5, товары — по первичному ключу
+    assert "VIRTUAL TABLE INDEX" in details
+    assert "SEARCH products USING INDEX" in details
+
+
+def test_products_search_api(client, async_session_maker):
+    async def seed():
+        async with async_session_maker() as session:
+            repo = ProductRepository(session)
+            for name in ("Quokkaberry jam", "Quokkaberry tea"):
+                await repo.create({"name": name, "price": 3})
+            await session.commit()
+
+    asyncio.run(seed())
+
+    resp = client.get("/products/search", params={"q": "quokkaberry", "count": 1})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert len(data["products"]) == 1
+    score, product_id = decode_cursor(data["next_cursor"], float, UUID)
+    assert product_id == UUID(data["products"][0]["id"])
+
+    resp = client.get(
+        "/products/search",
+        params={"q": "quokkaberry", "cursor": data["next_cursor"]},
+    )
+    names = {data["products"][0]["name"], *(p["name"] for p in resp.json()["products"])}
+    assert names == {"Quokkaberry jam", "Quokkaberry tea"}
+
+    assert client.get("/products/search").status_code == 400
@@ -1,5 +1,6 @@
 import pytest
-from sqlalchemy import select
+from sqlalchemy import inspect
+from app.models import Address, Order
 
 
 # Тест проверяет создание пользователя и возвращаемые поля (id, username, email)
@@ -78,3 +79,26 @@ async def test_list_users(user_repository):
 
     results = await user_repository.get_by_filter(count=10, page=1)
     assert len(results) >= 3
+
+
+# Тест проверяет, что заказы пользователя загружаются только по запросу (include)
+@pytest.mark.asyncio
+async def test_user_orders_loaded_only_on_include(db_session, user_repository):
+    user = await user_repository.create(
+        {"username": "incl", "email": "incl@example.com"}
+    )
+    address = Address(user_id=user.id, street="1", city="Town", country="Land")
+    db_session.add(address)
+    await db_session.flush()
+    db_session.add(Order(user_id=user.id, address_id=address.id, total_amount=1))
+    await db_session.commit()
+    db_session.expunge_all()
+
+    plain = await user_repository.get_by_id(user.id)
+    assert "orders" in inspect(plain).unloaded
+    listed = await user_repository.get_by_filter(count=10, page=1, id=user.id)
+    assert "orders" in inspect(listed[0]).unloaded
+
+    db_session.expunge_all()
+    with_orders = await user_repository.get_by_id(user.id, include=("orders",))
+    assert len(with_orders.orders) == 1